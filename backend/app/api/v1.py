@@ -2,233 +2,543 @@
 API v1 endpoints for Plant Monitor
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+import asyncio
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 import logging
-from ..services.dynamodb import DynamoDBService
+import numpy as np
+from ..services.downsample import downsample
+from ..services.series import format_timestamps
+from ..services.columnar import (
+    BINARY_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE, encode_binary, to_columnar_json
+)
+from ..services.cache import aligned_now, normalize_time
+from ..models import (
+    Alert, BatchDataRequest, BatchDataResponse, DataSummary, Plant, SensorPoint, SeriesRequest
+)
+from ..responses import FastJSONResponse, dumps
+from ..metrics import timed
 from ..config import settings
+from ..dependencies import ServiceProvider, get_connected_services, get_services
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/v1", tags=["v1"])
+router = APIRouter(prefix="/api/v1", tags=["v1"], default_response_class=FastJSONResponse)
 
-# DynamoDBサービスのインスタンス
-try:
-    dynamodb_service = DynamoDBService()
-    logger.info("DynamoDBサービスが初期化されました")
-except Exception as e:
-    logger.error(f"DynamoDB初期化エラー: {str(e)}")
-    dynamodb_service = None
+# 系列ごとに共通のメタデータ（固定値）
+SERIES_META = {"device_id": "sensor_001", "location": "温室A"}
 
-@router.get("/data")
+# ストリーミング形式ごとのContent-Type
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json-stream": "application/json"}
+
+# 集計期間ごとのデフォルト表示日数
+SUMMARY_DEFAULT_DAYS = {"hour": 7, "day": 365, "week": 365, "month": 365}
+
+
+def _resolve_range(
+    start_time: Optional[str], end_time: Optional[str], default_days: int
+) -> Tuple[str, str]:
+    """
+    ISO形式の開始・終了時刻をDynamoDBのクエリ形式に変換
+
+    未指定の場合は現在時刻（キャッシュ粒度に切り上げ）からdefault_days日前までとする
+    """
+    if not start_time or not end_time:
+        end_dt = aligned_now(settings.cache_range_granularity_seconds)
+        start_dt = end_dt - timedelta(days=default_days)
+        start_time = start_dt.strftime("%Y-%m-%d %H:%M:%S")
+        end_time = end_dt.strftime("%Y-%m-%d %H:%M:%S")
+        logger.debug(f"デフォルト時間範囲を使用: {start_time} - {end_time}")
+    else:
+        start_time = normalize_time(start_time)
+        end_time = normalize_time(end_time)
+        logger.debug(f"指定時間範囲: {start_time} - {end_time}")
+    return start_time, end_time
+
+
+def _to_point(item: dict) -> dict:
+    """DynamoDBのアイテムをフロントエンド用の形式に変換"""
+    return {
+        "timestamp": item["insert_date"].replace(" ", "T") + "Z",  # ISO形式に変換
+        "value": float(item["avg_value"]),
+        **SERIES_META
+    }
+
+async def _load_arrays(
+    services: ServiceProvider,
+    data_type: str,
+    start_time: str,
+    end_time: str,
+    limit: int,
+    max_points: Optional[int] = None,
+    method: str = "lttb"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """1系列分のデータをエポックミリ秒・値の配列として取得（max_points指定時は間引く）"""
+    if max_points:
+        with timed("query"):
+            timestamps, values = await services.data_service.get_arrays(data_type, start_time, end_time)
+        count = len(values)
+        logger.info(f"ストレージから{count}件のデータを取得: data_type={data_type}")
+        with timed("transform"):
+            timestamps, values = downsample(timestamps, values, max_points, method)
+        logger.info(f"{count}件を{method}で{len(values)}件に間引き: data_type={data_type}")
+        return timestamps, values
+    
+    with timed("query"):
+        timestamps, values = await services.data_service.get_arrays(
+            data_type, start_time, end_time, limit=limit
+        )
+    logger.info(f"ストレージから{len(values)}件のデータを取得: data_type={data_type}")
+    return timestamps, values
+
+
+async def _load_series(
+    services: ServiceProvider,
+    data_type: str,
+    start_time: str,
+    end_time: str,
+    limit: int,
+    max_points: Optional[int] = None,
+    method: str = "lttb"
+) -> List[dict]:
+    """
+    1系列分のデータを取得してフロントエンド用の形式に変換
+
+    start_time/end_timeはDynamoDBのクエリ形式で渡す。
+    limitと昇順ソートはクエリ側、max_points指定時の間引きは配列のまま行い、
+    出力する点だけを辞書に変換する
+    """
+    timestamps, values = await _load_arrays(
+        services, data_type, start_time, end_time, limit, max_points, method
+    )
+    with timed("transform"):
+        return [
+            {"timestamp": timestamp, "value": value, **SERIES_META}
+            for timestamp, value in zip(format_timestamps(timestamps), values.tolist())
+        ]
+
+
+def _negotiate_format(format: Optional[str], accept: str) -> str:
+    """formatパラメータ、なければAcceptヘッダーからレスポンス形式を決める"""
+    if format:
+        return format
+    if BINARY_MEDIA_TYPE in accept:
+        return "binary"
+    if COLUMNAR_JSON_MEDIA_TYPE in accept:
+        return "columnar"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    return "json"
+
+
+async def _stream_series(
+    services: ServiceProvider,
+    data_type: str,
+    start_time: str,
+    end_time: str,
+    limit: Optional[int],
+    format: str
+) -> AsyncIterator[bytes]:
+    """
+    DynamoDBのページ単位でデータを逐次出力する
+
+    保持するのは常に1ページ分だけなので、期間の長さに関係なくメモリ使用量は一定
+    """
+    count = 0
+    if format == "json-stream":
+        yield b"["
+    try:
+        async for page in services.async_dynamodb.iter_pages(data_type, start_time, end_time, limit=limit):
+            rows = [dumps(_to_point(item)) for item in page]
+            if format == "ndjson":
+                yield b"\n".join(rows) + b"\n"
+            else:
+                yield (b"," if count else b"") + b",".join(rows)
+            count += len(rows)
+    except Exception as e:
+        # ヘッダー送信後のため接続を切断してクライアントに失敗を伝える
+        logger.error(f"ストリーミング中のデータ取得エラー: data_type={data_type}, error={str(e)}")
+        raise
+    if format == "json-stream":
+        yield b"]"
+    logger.info(f"センサーデータのストリーミング完了: data_type={data_type}, {count}件")
+
+
+async def _load_batch(services: ServiceProvider, request: BatchDataRequest) -> dict:
+    """複数系列のクエリを並行して実行し、リクエスト順にまとめて返す"""
+    async def load(series: SeriesRequest) -> dict:
+        start_time, end_time = _resolve_range(
+            series.start_time or request.start_time,
+            series.end_time or request.end_time,
+            365
+        )
+        data = await _load_series(
+            services,
+            series.data_type,
+            start_time,
+            end_time,
+            series.limit or request.limit,
+            series.max_points or request.max_points,
+            series.method or request.method
+        )
+        return {
+            "data_type": series.data_type,
+            "start_time": start_time,
+            "end_time": end_time,
+            "data": data
+        }
+    
+    results = await asyncio.gather(*(load(series) for series in request.series))
+    return {"series": list(results)}
+
+@router.get("/data", response_model=List[SensorPoint])
 async def get_sensor_data(
     data_type: str = Query(..., description="データタイプ (temperature, pH)"),
     start_time: Optional[str] = Query(None, description="開始時刻 (ISO format)"),
     end_time: Optional[str] = Query(None, description="終了時刻 (ISO format)"),
-    limit: int = Query(1000, description="最大取得件数")
+    limit: Optional[int] = Query(None, ge=1, description="最大取得件数（json形式のデフォルトは1000、ストリーミング形式は無制限）"),
+    max_points: Optional[int] = Query(None, ge=3, description="ダウンサンプリング後の最大点数（指定時は期間全体を間引く）"),
+    method: str = Query("lttb", pattern="^(lttb|minmax|avg)$", description="ダウンサンプリング手法 (lttb, minmax, avg)"),
+    format: Optional[str] = Query(
+        None,
+        pattern="^(json|ndjson|json-stream|columnar|binary)$",
+        description="レスポンス形式 (json, ndjson, json-stream, columnar, binary)。未指定時はAcceptヘッダーで判定"
+    ),
+    accept: str = Header("", include_in_schema=False),
+    services: ServiceProvider = Depends(get_connected_services)
 ):
     """
     センサーデータを取得
+
+    max_pointsを指定した場合はlimitで打ち切らずに期間全体を取得し、
+    サーバー側でmax_points点まで間引いて返す。
+    format=ndjson / json-stream の場合はDynamoDBのページが届くたびに
+    時刻順で逐次送信する（長期間のエクスポート向け）。
+    format=columnar / binary（またはAcceptヘッダー）の場合は
+    時刻と値を配列で返す列指向形式になる
     """
-    if not dynamodb_service:
-        raise HTTPException(status_code=500, detail="DynamoDB service not available")
+    format = _negotiate_format(format, accept)
+    if format in STREAM_MEDIA_TYPES and max_points:
+        raise HTTPException(status_code=400, detail="ストリーミング形式ではmax_pointsを指定できません")
+    
+    # デフォルトの時間範囲は過去1年間（どの形式でも応答を始める前に検証する）
+    try:
+        start_time, end_time = _resolve_range(start_time, end_time, 365)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"時刻の形式が不正です: {str(e)}")
+    
+    if format in STREAM_MEDIA_TYPES:
+        logger.info(f"センサーデータのストリーミング開始: data_type={data_type}, format={format}, limit={limit}")
+        return StreamingResponse(
+            _stream_series(services, data_type, start_time, end_time, limit, format),
+            media_type=STREAM_MEDIA_TYPES[format],
+            # 形式はAcceptヘッダーでも決まるため、共有キャッシュが形式を取り違えないようにする
+            headers={"Vary": "Accept"}
+        )
     
+    limit = limit or 1000
     try:
         logger.info(f"センサーデータ取得開始: data_type={data_type}, limit={limit}")
         
-        # デフォルトの時間範囲を設定（過去1年間）
-        if not start_time or not end_time:
-            end_dt = datetime.now()
-            start_dt = end_dt - timedelta(days=365)
-            start_time = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-            end_time = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-            logger.debug(f"デフォルト時間範囲を使用: {start_time} - {end_time}")
-        else:
-            # ISO形式からDynamoDB形式に変換
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            start_time = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-            end_time = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-            logger.debug(f"指定時間範囲: {start_time} - {end_time}")
-        
-        # DynamoDBからデータを取得
-        raw_data = dynamodb_service.get_data(data_type, start_time, end_time)
-        logger.info(f"DynamoDBから{len(raw_data)}件のデータを取得")
+        if format in ("columnar", "binary"):
+            timestamps, values = await _load_arrays(
+                services, data_type, start_time, end_time, limit, max_points, method
+            )
+            meta = {"data_type": data_type, **SERIES_META}
+            logger.info(f"センサーデータ取得完了: {len(values)}件のデータを{format}形式で返却")
+            if format == "binary":
+                with timed("serialize"):
+                    content = encode_binary(meta, timestamps, values)
+                return Response(
+                    content=content,
+                    media_type=BINARY_MEDIA_TYPE,
+                    headers={"Vary": "Accept"}
+                )
+            return FastJSONResponse(
+                to_columnar_json(meta, timestamps, values),
+                media_type=COLUMNAR_JSON_MEDIA_TYPE,
+                headers={"Vary": "Accept"}
+            )
         
-        # フロントエンド用の形式に変換
-        result = []
-        for item in raw_data[:limit]:  # limitを適用
-            result.append({
-                "timestamp": item["insert_date"] + "Z",  # ISO形式に変換
-                "value": float(item["avg_value"]),
-                "device_id": "sensor_001",  # 固定値
-                "location": "温室A"  # 固定値
-            })
-        
-        # 時刻順にソート
-        result.sort(key=lambda x: x["timestamp"])
+        result = await _load_series(
+            services, data_type, start_time, end_time, limit, max_points, method
+        )
         
         logger.info(f"センサーデータ取得完了: {len(result)}件のデータを返却")
-        return result
+        return FastJSONResponse(result, headers={"Vary": "Accept"})
         
     except Exception as e:
         logger.error(f"データ取得エラー: {str(e)}")
         raise HTTPException(status_code=500, detail=f"データ取得に失敗しました: {str(e)}")
 
-@router.get("/data/latest")
+@router.get("/data/batch", response_model=BatchDataResponse)
+async def get_sensor_data_batch(
+    data_types: str = Query(..., description="データタイプ (カンマ区切り、例: temperature,pH)"),
+    start_time: Optional[str] = Query(None, description="開始時刻 (ISO format)"),
+    end_time: Optional[str] = Query(None, description="終了時刻 (ISO format)"),
+    limit: int = Query(1000, description="系列ごとの最大取得件数"),
+    max_points: Optional[int] = Query(None, ge=3, description="系列ごとのダウンサンプリング後の最大点数"),
+    method: str = Query("lttb", pattern="^(lttb|minmax|avg)$", description="ダウンサンプリング手法 (lttb, minmax, avg)"),
+    services: ServiceProvider = Depends(get_connected_services)
+):
+    """
+    複数のデータタイプを同じ期間でまとめて取得
+    """
+    types = [t.strip() for t in data_types.split(",") if t.strip()]
+    if not types:
+        raise HTTPException(status_code=400, detail="data_typesを指定してください")
+    try:
+        request = BatchDataRequest(
+            series=[SeriesRequest(data_type=t) for t in types],
+            start_time=start_time,
+            end_time=end_time,
+            limit=limit,
+            max_points=max_points,
+            method=method
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await post_sensor_data_batch(request, services)
+
+@router.post("/data/batch", response_model=BatchDataResponse)
+async def post_sensor_data_batch(
+    request: BatchDataRequest,
+    services: ServiceProvider = Depends(get_connected_services)
+):
+    """
+    複数系列のセンサーデータを一括取得
+
+    系列ごとに期間・件数・ダウンサンプリングを指定でき、
+    各系列のクエリは並行して実行される
+    """
+    try:
+        logger.info(f"一括データ取得開始: data_types={[s.data_type for s in request.series]}")
+        result = await _load_batch(services, request)
+        logger.info(f"一括データ取得完了: {sum(len(s['data']) for s in result['series'])}件のデータを返却")
+        return FastJSONResponse(result)
+        
+    except Exception as e:
+        logger.error(f"一括データ取得エラー: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"一括データ取得に失敗しました: {str(e)}")
+
+@router.get("/data/latest", response_model=Union[SensorPoint, Dict[str, Optional[SensorPoint]], None])
 async def get_latest_data(
-    data_type: str = Query(..., description="データタイプ (temperature, pH)")
+    data_type: Optional[str] = Query(None, description="データタイプ (temperature, pH)"),
+    data_types: Optional[str] = Query(None, description="複数のデータタイプ (カンマ区切り、例: temperature,pH)"),
+    services: ServiceProvider = Depends(get_connected_services)
 ):
     """
     最新のセンサーデータを取得
+
+    data_typesを指定した場合は {data_type: データ} の形式でまとめて返す
     """
-    if not dynamodb_service:
-        raise HTTPException(status_code=500, detail="DynamoDB service not available")
+    if not data_type and not data_types:
+        raise HTTPException(status_code=400, detail="data_typeまたはdata_typesを指定してください")
     
     try:
-        logger.info(f"最新データ取得開始: data_type={data_type}")
-        
-        # 過去1年間のデータを取得
-        end_dt = datetime.now()
-        start_dt = end_dt - timedelta(days=365)
-        start_time = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-        end_time = end_dt.strftime("%Y-%m-%d %H:%M:%S")
+        if data_types:
+            types = [t.strip() for t in data_types.split(",") if t.strip()]
+            logger.info(f"最新データ一括取得開始: data_types={types}")
+            with timed("query"):
+                latest_items = await services.async_dynamodb.run(
+                    services.latest_cache.get_many, types
+                )
+            return FastJSONResponse({
+                t: _to_point(item) if item else None
+                for t, item in latest_items.items()
+            })
         
-        raw_data = dynamodb_service.get_data(data_type, start_time, end_time)
+        logger.info(f"最新データ取得開始: data_type={data_type}")
+        with timed("query"):
+            latest = await services.async_dynamodb.run(services.latest_cache.get, data_type)
         
-        if not raw_data:
+        if not latest:
             logger.warning(f"最新データが見つかりません: data_type={data_type}")
-            return None
+            return FastJSONResponse(None)
         
-        # 最新のデータを取得
-        latest = max(raw_data, key=lambda x: x["insert_date"])
-        
-        result = {
-            "timestamp": latest["insert_date"] + "Z",
-            "value": float(latest["avg_value"]),
-            "device_id": "sensor_001",
-            "location": "温室A"
-        }
+        result = _to_point(latest)
         
         logger.info(f"最新データ取得完了: timestamp={result['timestamp']}, value={result['value']}")
-        return result
+        return FastJSONResponse(result)
         
     except Exception as e:
         logger.error(f"最新データ取得エラー: {str(e)}")
         raise HTTPException(status_code=500, detail=f"最新データ取得に失敗しました: {str(e)}")
 
-@router.get("/data/summary")
+async def _live_events(
+    services: ServiceProvider, data_types: List[str], heartbeat_seconds: float
+) -> AsyncIterator[bytes]:
+    """
+    新着データをServer-Sent Eventsとして逐次出力する
+
+    接続が切れるとジェネレーターが終了し、購読が解除される
+    """
+    queue = services.live_hub.subscribe(data_types)
+    logger.info(f"ライブ配信開始: data_types={data_types}, 購読者数={services.live_hub.subscriber_count}")
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            try:
+                data_type, item = await asyncio.wait_for(queue.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                # プロキシにアイドル接続を切られないようコメント行を送る
+                yield b": keep-alive\n\n"
+                continue
+            event_id = f"{data_type}/{item['insert_date']}".encode()
+            payload = dumps({"data_type": data_type, **_to_point(item)})
+            yield b"event: reading\nid: " + event_id + b"\ndata: " + payload + b"\n\n"
+    finally:
+        services.live_hub.unsubscribe(data_types, queue)
+        logger.info(f"ライブ配信終了: data_types={data_types}")
+
+@router.get("/stream")
+async def stream_latest_data(
+    data_type: Optional[str] = Query(None, description="データタイプ (temperature, pH)"),
+    data_types: Optional[str] = Query(None, description="複数のデータタイプ (カンマ区切り、例: temperature,pH)"),
+    services: ServiceProvider = Depends(get_connected_services)
+):
+    """
+    新着センサーデータをServer-Sent Events (text/event-stream) で配信
+
+    接続直後に各data_typeの最新値を、以降は新着データを `reading` イベントとして送る。
+    新着の確認はワーカー内でdata_typeごとに1つだけ行うため、接続数が増えても
+    ストレージへの読み込みは増えない
+    """
+    types = [t.strip() for t in (data_types or data_type or "").split(",") if t.strip()]
+    if not types:
+        raise HTTPException(status_code=400, detail="data_typeまたはdata_typesを指定してください")
+    return StreamingResponse(
+        _live_events(services, types, settings.live_heartbeat_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/data/summary", response_model=DataSummary)
 async def get_data_summary(
     data_type: str = Query(..., description="データタイプ (temperature, pH)"),
-    period: str = Query("day", description="集計期間"),
+    period: str = Query("day", pattern="^(hour|day|week|month)$", description="集計期間 (hour, day, week, month)"),
     start_time: Optional[str] = Query(None, description="開始時刻 (ISO format)"),
-    end_time: Optional[str] = Query(None, description="終了時刻 (ISO format)")
+    end_time: Optional[str] = Query(None, description="終了時刻 (ISO format)"),
+    threshold: Optional[float] = Query(None, description="しきい値（超えていた時間を集計する）"),
+    services: ServiceProvider = Depends(get_connected_services)
 ):
     """
     データサマリーを取得
+
+    全体の平均・最小・最大・標準偏差・p5/p50/p95に加えて、集計期間ごとのバケット
+    （count/sum/min/max など）を返す。thresholdを指定すると、値がしきい値を超えていた時間も返す
     """
-    if not dynamodb_service:
-        raise HTTPException(status_code=500, detail="DynamoDB service not available")
-    
     try:
         logger.info(f"データサマリー取得開始: data_type={data_type}, period={period}")
         
-        # デフォルトの時間範囲を設定（データが古いため、広い範囲で検索）
-        if not start_time or not end_time:
-            end_dt = datetime.now()
-            if period == "day":
-                start_dt = end_dt - timedelta(days=365)  # 1年間に拡張
-            elif period == "week":
-                start_dt = end_dt - timedelta(days=365)  # 1年間に拡張
-            elif period == "month":
-                start_dt = end_dt - timedelta(days=365)  # 1年間に拡張
-            else:
-                start_dt = end_dt - timedelta(days=365)
-            
-            start_time = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-            end_time = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-            logger.debug(f"デフォルト時間範囲を使用: {start_time} - {end_time}")
-        else:
-            # ISO形式からDynamoDB形式に変換
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-            start_time = start_dt.strftime("%Y-%m-%d %H:%M:%S")
-            end_time = end_dt.strftime("%Y-%m-%d %H:%M:%S")
-            logger.debug(f"指定時間範囲: {start_time} - {end_time}")
+        start_time, end_time = _resolve_range(start_time, end_time, SUMMARY_DEFAULT_DAYS[period])
         
-        raw_data = dynamodb_service.get_data(data_type, start_time, end_time)
+        # 差分更新されたロールアップから集計済みバケットを読む
+        with timed("query"):
+            result = await services.query_cache.get_or_load(
+                f"summary:{data_type}:{period}:{start_time}:{end_time}:{threshold}",
+                lambda: services.async_dynamodb.run(
+                    services.rollup_service.summarize,
+                    data_type, period, start_time, end_time, threshold
+                ),
+                end_time
+            )
         
-        if not raw_data:
+        if not result["count"]:
             logger.warning(f"サマリー用データが見つかりません: data_type={data_type}")
-            return {
-                "average": 0,
-                "minimum": 0,
-                "maximum": 0,
-                "count": 0,
-                "period": period
-            }
+            return FastJSONResponse(result)
         
-        values = [float(item["avg_value"]) for item in raw_data]
-        
-        result = {
-            "average": sum(values) / len(values),
-            "minimum": min(values),
-            "maximum": max(values),
-            "count": len(values),
-            "period": period
-        }
-        
-        logger.info(f"データサマリー取得完了: count={result['count']}, avg={result['average']:.2f}")
-        return result
+        logger.info(
+            f"データサマリー取得完了: count={result['count']}, avg={result['average']:.2f}, "
+            f"buckets={len(result['buckets'])}"
+        )
+        return FastJSONResponse(result)
         
     except Exception as e:
         logger.error(f"サマリー取得エラー: {str(e)}")
         raise HTTPException(status_code=500, detail=f"サマリー取得に失敗しました: {str(e)}")
 
-@router.get("/plants")
-async def get_plants():
+@router.get("/alerts", response_model=List[Alert])
+async def get_alerts(
+    plant_id: Optional[str] = Query(None, description="植物IDで絞り込み"),
+    active_only: bool = Query(False, description="継続中（未解決）のアラートのみ"),
+    limit: int = Query(100, ge=1, le=1000, description="最大取得件数"),
+    services: ServiceProvider = Depends(get_connected_services)
+):
     """
-    植物情報を取得
+    閾値アラートを取得
+
+    前回の評価以降に届いたデータだけを評価してから、開始時刻の新しい順に返す
     """
-    import json
-    import os
-    
     try:
-        # JSONファイルから植物データを読み込み
-        json_path = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'plant.json')
-        with open(json_path, 'r', encoding='utf-8') as f:
-            plant_data = json.load(f)
-        
-        # 更新時刻を現在時刻に設定
-        plant_data["updated_at"] = datetime.now().isoformat() + "Z"
-        
-        return [plant_data]
+        with timed("query"):
+            alerts = await services.async_dynamodb.run(
+                services.alert_engine.list, plant_id, active_only, limit
+            )
+        return FastJSONResponse(alerts)
     except Exception as e:
-        # フォールバック用のデフォルトデータ
-        return [
-            {
-                "id": "plant-001",
-                "name": "バジル",
-                "species": "Ocimum basilicum",
-                "location": "温室A",
-                "device_id": "sensor_001",
-                "created_at": "2025-01-01T00:00:00Z",
-                "updated_at": datetime.now().isoformat() + "Z",
-                "thresholds": {
-                    "temperature": {"min": 18, "max": 28},
-                    "pH": {"min": 6.0, "max": 7.5}
-                }
-            }
-        ]
+        logger.error(f"アラート取得エラー: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"アラート取得に失敗しました: {str(e)}")
+
+@router.get("/alerts/{alert_id}", response_model=Alert)
+async def get_alert(alert_id: str, services: ServiceProvider = Depends(get_connected_services)):
+    """
+    閾値アラートを1件取得
+    """
+    alert = await services.async_dynamodb.run(services.alert_engine.get, alert_id)
+    if alert is None:
+        raise HTTPException(status_code=404, detail=f"アラートが見つかりません: {alert_id}")
+    return FastJSONResponse(alert)
+
+@router.post("/alerts/{alert_id}/acknowledge", response_model=Alert)
+async def acknowledge_alert(alert_id: str, services: ServiceProvider = Depends(get_connected_services)):
+    """
+    閾値アラートを確認済みにする
+    """
+    alert = await services.async_dynamodb.run(services.alert_engine.acknowledge, alert_id)
+    if alert is None:
+        raise HTTPException(status_code=404, detail=f"アラートが見つかりません: {alert_id}")
+    logger.info(f"アラートを確認済みにしました: {alert_id}")
+    return FastJSONResponse(alert)
+
+@router.get("/plants", response_model=List[Plant])
+async def get_plants(
+    location: Optional[str] = Query(None, description="設置場所で絞り込み"),
+    device_id: Optional[str] = Query(None, description="デバイスIDで絞り込み"),
+    offset: int = Query(0, ge=0, description="取得開始位置"),
+    limit: int = Query(100, ge=1, le=1000, description="最大取得件数"),
+    services: ServiceProvider = Depends(get_services)
+):
+    """
+    植物情報を取得
+
+    総件数はX-Total-Countヘッダーで返す
+    """
+    plants, total = services.plant_registry.list(
+        location=location, device_id=device_id, offset=offset, limit=limit
+    )
+    return FastJSONResponse(plants, headers={"X-Total-Count": str(total)})
+
+@router.get("/plants/{plant_id}", response_model=Plant)
+async def get_plant(plant_id: str, services: ServiceProvider = Depends(get_services)):
+    """
+    植物情報を1件取得
+    """
+    plant = services.plant_registry.get(plant_id)
+    if plant is None:
+        raise HTTPException(status_code=404, detail=f"植物が見つかりません: {plant_id}")
+    return FastJSONResponse(plant)
 
 @router.get("/health")
-async def health_check():
+async def health_check(services: ServiceProvider = Depends(get_services)):
     """
     ヘルスチェック
     """
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat() + "Z",
-        "dynamodb": "connected" if dynamodb_service else "disconnected"
+        "dynamodb": "connected" if services.connected else "disconnected"
     }
\ No newline at end of file
@@ -2,25 +2,67 @@
 アプリケーション設定管理
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 import logging
 
 
 class Settings(BaseSettings):
     """アプリケーション設定"""
     
-    # AWS設定
-    aws_access_key_id: str
-    aws_secret_access_key: str
+    # AWS設定（STORAGE_BACKEND=local では不要）
+    aws_access_key_id: str = ""
+    aws_secret_access_key: str = ""
     aws_region: str = "ap-northeast-1"
     
     # DynamoDB設定
     dynamodb_table_name: str = "aggdata_table"
+    dynamodb_max_concurrency: int = 16  # ワーカーあたりの同時クエリ数
+    dynamodb_connect_timeout: float = 5.0
+    dynamodb_read_timeout: float = 30.0
+    warm_up_on_startup: bool = True  # 起動後にバックグラウンドで接続しておく
+    
+    # ストレージ設定
+    storage_backend: str = "dynamodb"  # dynamodb / local / replica
+    local_store_path: str = "data/series"  # ローカル列ストアのディレクトリ
+    local_store_sync_interval_seconds: float = 30.0  # replica時のDynamoDBからの同期間隔
+    # 直近期間をメモリに保持するホットウィンドウ（localでは使わない）
+    hot_window_days: int = 30  # 保持する日数（0で無効）
+    hot_window_max_points: int = 100000  # data_typeごとの最大点数（1点16バイト）
+    hot_window_max_series: int = 16  # 保持する最大系列数
+    hot_window_refresh_interval_seconds: float = 10.0  # 新着データの取り込み間隔
+    hot_window_shared_path: str = ""  # 指定するとワーカー間で共有（例: /dev/shm/plant-monitor）
+    hot_window_shared_idle_seconds: float = 3600.0  # どのワーカーも読んでいない系列を破棄するまでの秒数
     
     # アプリケーション設定
     default_data_type: str = "temperature"
     default_period_days: int = 7
     environment: str = "development"
+    plant_registry_path: Optional[str] = None  # 未指定時は data/plant.json
+    
+    # キャッシュ設定
+    latest_cache_ttl_seconds: float = 30.0
+    cache_backend: str = "memory"  # memory / redis / none
+    redis_url: str = "redis://localhost:6379/0"
+    cache_max_entries: int = 64
+    cache_recent_ttl_seconds: float = 30.0  # 現在を含む範囲
+    cache_historical_ttl_seconds: float = 86400.0  # 確定済みの過去の範囲
+    cache_stale_ttl_seconds: float = 600.0  # 期限切れ後に古い値を返してよい時間
+    cache_settle_seconds: float = 900.0  # これより前に終わる範囲は確定済みとみなす
+    cache_range_granularity_seconds: int = 60  # デフォルト範囲の終了時刻の丸め単位
+    
+    # ロールアップ設定
+    rollup_db_path: str = "data/rollups.sqlite3"
+    rollup_refresh_interval_seconds: float = 60.0
+    
+    # ライブ配信（SSE）設定
+    live_poll_interval_seconds: float = 10.0  # data_typeごとの新着確認の間隔
+    live_heartbeat_seconds: float = 15.0  # 新着がない間のkeep-aliveの間隔
+    live_max_queue: int = 100  # 接続ごとに保持する未送信データの上限
+    
+    # アラート設定
+    alert_db_path: str = "data/alerts.sqlite3"
+    alert_evaluation_interval_seconds: float = 60.0  # 新着データを評価する間隔
+    alert_bootstrap_days: int = 30  # 初回評価で遡る日数
     
     # API設定
     api_title: str = "Plant Monitor API"
@@ -31,8 +73,18 @@ class Settings(BaseSettings):
     log_level: str = "INFO"
     log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     enable_request_logging: bool = True
+    request_log_sample_rate: float = 1.0  # リクエストログの出力割合（0.0〜1.0）
+    # パスごとの出力割合（ポーリングされるパスを間引く）。環境変数ではJSONで指定
+    request_log_sample_rates: Dict[str, float] = {
+        "/api/v1/health": 0.0,
+        "/api/v1/data/latest": 0.1,
+    }
+    request_log_slow_threshold_seconds: float = 1.0  # これより遅いリクエストは必ず出力
     log_to_file: bool = False
     
+    # メトリクス設定（/metrics と Server-Timing ヘッダー）
+    enable_metrics: bool = True
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -42,15 +94,32 @@ class Settings(BaseSettings):
 settings = Settings()
 
 
+# ログ出力を別スレッドで行うリスナー（setup_loggingで開始）
+_log_listener = None
+
+
 def setup_logging():
-    """ログ設定を初期化"""
+    """
+    ログ設定を初期化
+
+    コンソール・ファイルへの書き込みはQueueListenerのスレッドで行い、
+    リクエスト処理中のスレッド（イベントループ）ではキューに積むだけにする。
+    """
+    import atexit
     import os
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+    
+    global _log_listener
+    if _log_listener is not None:
+        return
     
     # ログディレクトリを作成
     log_dir = "logs"
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
     
+    formatter = logging.Formatter(settings.log_format)
     handlers = [
         logging.StreamHandler(),  # コンソール出力
     ]
@@ -63,15 +132,20 @@ def setup_logging():
             maxBytes=10*1024*1024,  # 10MB
             backupCount=5
         )
-        file_handler.setFormatter(logging.Formatter(settings.log_format))
         handlers.append(file_handler)
     
-    logging.basicConfig(
-        level=getattr(logging, settings.log_level.upper()),
-        format=settings.log_format,
-        handlers=handlers
-    )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+    
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, settings.log_level.upper()))
+    root_logger.addHandler(QueueHandler(log_queue))
     
     # uvicornのログレベルも設定
     logging.getLogger("uvicorn").setLevel(getattr(logging, settings.log_level.upper()))
-    logging.getLogger("uvicorn.access").setLevel(getattr(logging, settings.log_level.upper()))
\ No newline at end of file
+    logging.getLogger("uvicorn.access").setLevel(getattr(logging, settings.log_level.upper()))
@@ -0,0 +1,241 @@
+"""
+共有サービスのプロバイダー
+
+ストレージ（DynamoDBService / ローカル列ストア）とそれに依存するサービスは
+プロセス全体で1つだけ生成し、最初に必要になった時点で接続する。pandas/plotlyを使うグラフ生成サービスも
+初回利用時にimportするため、アプリの起動時にはネットワーク接続も重いimportも行わない。
+
+ルーターは `Depends(get_services)` / `Depends(get_connected_services)` で
+プロバイダーを受け取るので、テストでは `app.dependency_overrides` で差し替えられる。
+"""
+import logging
+import os
+import threading
+import time
+from functools import cached_property
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from .config import Settings, settings
+from .services.cache import CachedDataService, QueryCache, create_cache_backend
+from .services.plants import PlantRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceProvider:
+    """アプリケーション全体で共有するサービスを遅延生成して保持する"""
+
+    def __init__(self, settings: Settings, retry_interval_seconds: float = 30.0):
+        self._settings = settings
+        self._retry_interval = retry_interval_seconds
+        self._lock = threading.Lock()
+        self._failed_at: Optional[float] = None
+        self.dynamodb = None
+        self.storage = None
+        self.hot_window = None
+        self.async_dynamodb = None
+        self.latest_cache = None
+        self.rollup_service = None
+        self.alert_engine = None
+        self.live_hub = None
+        self.data_service: Optional[CachedDataService] = None
+
+    @property
+    def connected(self) -> bool:
+        """ストレージに接続済みかどうか"""
+        return self.data_service is not None
+
+    def connect(self, dynamodb=None) -> bool:
+        """
+        ストレージに接続し、依存するサービスを生成する（ブロッキング）
+
+        接続に失敗した場合はretry_interval_seconds経過するまで再試行しない。
+
+        Args:
+            dynamodb: 生成済みのDynamoDBService（ベンチマーク・テストでスタンドインを使う場合）
+
+        Returns:
+            接続済みならTrue
+        """
+        with self._lock:
+            if self.connected:
+                return True
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self._retry_interval:
+                return False
+
+            # 依存サービスのimportも初回接続時まで遅らせる（boto3はDynamoDBを使う場合のみ）
+            from .services.alerts import AlertEngine, AlertStore
+            from .services.async_dynamodb import AsyncDynamoDBService
+            from .services.latest import LatestValueCache
+            from .services.live import LiveHub
+            from .services.rollup import RollupService, RollupStore
+
+            try:
+                dynamodb, storage = self._create_storage(dynamodb)
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                logger.error(f"ストレージ初期化エラー: {str(e)}")
+                return False
+            hot_window = None
+            if self._settings.hot_window_days > 0 and self._settings.storage_backend != "local":
+                # 直近期間のクエリはメモリから返し、新着分だけをバックグラウンドで取り込む
+                hot_window = storage = self._create_hot_window(storage)
+                hot_window.start()
+
+            # イベントループをブロックしないよう、クエリは専用スレッドプールで実行
+            self.async_dynamodb = AsyncDynamoDBService(
+                storage, max_concurrency=self._settings.dynamodb_max_concurrency
+            )
+            # 最新値キャッシュ（ダッシュボードのポーリング用）
+            self.latest_cache = LatestValueCache(
+                storage.get_latest, ttl_seconds=self._settings.latest_cache_ttl_seconds
+            )
+            # 期間別サマリー用のロールアップ
+            self.rollup_service = RollupService(
+                storage,
+                RollupStore(self._settings.rollup_db_path),
+                refresh_interval_seconds=self._settings.rollup_refresh_interval_seconds
+            )
+            # 新着データのライブ配信（data_typeごとに1つのポーリングを共有）
+            self.live_hub = LiveHub(
+                self.async_dynamodb,
+                poll_interval_seconds=self._settings.live_poll_interval_seconds,
+                max_queue=self._settings.live_max_queue
+            )
+            # 植物ごとの閾値アラート
+            self.alert_engine = AlertEngine(
+                storage,
+                self.plant_registry,
+                AlertStore(self._settings.alert_db_path),
+                evaluation_interval_seconds=self._settings.alert_evaluation_interval_seconds,
+                bootstrap_days=self._settings.alert_bootstrap_days
+            )
+            self.dynamodb = dynamodb
+            self.storage = storage
+            self.hot_window = hot_window
+            self.data_service = CachedDataService(self.async_dynamodb, self.query_cache)
+            self._failed_at = None
+            logger.info(f"ストレージが初期化されました: backend={self._settings.storage_backend}")
+            return True
+
+    def _create_storage(self, dynamodb=None):
+        """
+        設定（storage_backend）に応じたストレージを生成
+
+        Returns:
+            (DynamoDBService（localの場合はNone）, APIが使うストレージ) のタプル
+        """
+        backend = self._settings.storage_backend
+        if backend not in ("dynamodb", "local", "replica"):
+            raise ValueError(f"未対応のストレージです: {backend}")
+        if backend != "dynamodb":
+            from .services.local_store import LocalReplica, LocalSeriesStore
+
+            local = LocalSeriesStore(self._settings.local_store_path)
+            if backend == "local":
+                return None, local
+
+        from .services.dynamodb import DynamoDBService
+
+        dynamodb = dynamodb or DynamoDBService(
+            max_pool_connections=self._settings.dynamodb_max_concurrency,
+            connect_timeout=self._settings.dynamodb_connect_timeout,
+            read_timeout=self._settings.dynamodb_read_timeout,
+            table_name=self._settings.dynamodb_table_name
+        )
+        if backend == "replica":
+            return dynamodb, LocalReplica(
+                dynamodb, local, sync_interval_seconds=self._settings.local_store_sync_interval_seconds
+            )
+        return dynamodb, dynamodb
+
+    def _create_hot_window(self, storage):
+        """
+        ホットウィンドウを生成
+
+        hot_window_shared_pathを指定した場合はワーカー間で共有するセグメントに置く
+        （ファイルロックが使えない環境ではワーカーごとのメモリに保持する）。
+        """
+        from .services.hot_window import HotWindowStore
+
+        options = dict(
+            window_days=self._settings.hot_window_days,
+            max_points=self._settings.hot_window_max_points,
+            max_series=self._settings.hot_window_max_series,
+            refresh_interval_seconds=self._settings.hot_window_refresh_interval_seconds
+        )
+        if self._settings.hot_window_shared_path:
+            from .services.shared_window import SharedHotWindowStore
+
+            try:
+                return SharedHotWindowStore(
+                    storage,
+                    self._settings.hot_window_shared_path,
+                    idle_seconds=self._settings.hot_window_shared_idle_seconds,
+                    **options
+                )
+            except Exception as e:
+                logger.warning(f"共有ホットウィンドウを使えないため、ワーカーごとに保持します: {str(e)}")
+        return HotWindowStore(storage, **options)
+
+    @cached_property
+    def query_cache(self) -> QueryCache:
+        """ルーターとDynamoDBの間のクエリキャッシュ"""
+        return QueryCache(
+            create_cache_backend(self._settings),
+            recent_ttl_seconds=self._settings.cache_recent_ttl_seconds,
+            historical_ttl_seconds=self._settings.cache_historical_ttl_seconds,
+            stale_ttl_seconds=self._settings.cache_stale_ttl_seconds,
+            settle_seconds=self._settings.cache_settle_seconds
+        )
+
+    @cached_property
+    def plant_registry(self) -> PlantRegistry:
+        """植物情報レジストリ（ファイル更新時のみ再読み込み）"""
+        return PlantRegistry(
+            self._settings.plant_registry_path
+            or os.path.join(os.path.dirname(__file__), '..', 'data', 'plant.json')
+        )
+
+    @cached_property
+    def graph_service(self):
+        """グラフ生成サービス（plotlyは初回利用時にimportする）"""
+        from .services.graph import GraphService
+
+        return GraphService()
+
+    def warm_up(self) -> None:
+        """起動直後にバックグラウンドで接続しておき、最初のリクエストの待ち時間を減らす"""
+        start = time.perf_counter()
+        self.connect()
+        logger.info(f"サービスのウォームアップ完了: {time.perf_counter() - start:.2f}s")
+
+    def shutdown(self) -> None:
+        """スレッドプールなどのリソースを解放"""
+        if self.live_hub is not None:
+            self.live_hub.close()
+        if self.hot_window is not None:
+            self.hot_window.close()
+        if self.async_dynamodb is not None:
+            self.async_dynamodb.shutdown()
+
+
+# プロセス全体で共有するプロバイダー
+provider = ServiceProvider(settings)
+
+
+def get_services() -> ServiceProvider:
+    """共有サービスのプロバイダーを返す（DynamoDBへの接続は行わない）"""
+    return provider
+
+
+async def get_connected_services(
+    services: ServiceProvider = Depends(get_services),
+) -> ServiceProvider:
+    """DynamoDBに接続済みのプロバイダーを返す（未接続ならスレッドプールで接続する）"""
+    if not services.connected and not await run_in_threadpool(services.connect):
+        raise HTTPException(status_code=500, detail="DynamoDB service not available")
+    return services
@@ -1,29 +1,56 @@
-from fastapi import FastAPI, Request, HTTPException, Query
+from fastapi import Depends, FastAPI, Request, HTTPException, Query, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime, timedelta
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from datetime import timedelta
 import os
 import logging
+import threading
 from .config import settings, setup_logging
-from .services.dynamodb import DynamoDBService
-from .services.graph import GraphService
+from .dependencies import ServiceProvider, get_services, provider
+from .services.cache import aligned_now
 from .api.v1 import router as api_v1_router
-from .middleware import RequestLoggingMiddleware
+from .metrics import (
+    registry, render_cache_stats, render_dynamodb_stats, render_live_stats, render_single_flight_stats
+)
+from .middleware import MetricsMiddleware, RequestLoggingMiddleware
 
 # ログ設定を初期化
 setup_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.warm_up_on_startup:
+        # 起動をブロックしないよう、DynamoDBへの接続はバックグラウンドで行う
+        threading.Thread(target=provider.warm_up, name="warm-up", daemon=True).start()
+    yield
+    provider.shutdown()
+
+
 app = FastAPI(
     title=settings.api_title,
     description=settings.api_description,
-    version=settings.api_version
+    version=settings.api_version,
+    lifespan=lifespan
 )
 
 # リクエストログミドルウェアを追加（有効な場合のみ）
 if settings.enable_request_logging:
-    app.add_middleware(RequestLoggingMiddleware)
+    app.add_middleware(
+        RequestLoggingMiddleware,
+        sample_rates=settings.request_log_sample_rates,
+        default_sample_rate=settings.request_log_sample_rate,
+        slow_threshold_seconds=settings.request_log_slow_threshold_seconds
+    )
+
+# メトリクス集計ミドルウェアを追加（リクエストログより外側で全体の時間を計測）
+if settings.enable_metrics:
+    app.add_middleware(MetricsMiddleware)
 
 # CORS設定
 app.add_middleware(
@@ -32,6 +59,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # /plants の総件数をフロントエンドから読めるようにする
+    expose_headers=["X-Total-Count"],
 )
 
 # API v1ルーターを追加
@@ -42,43 +71,83 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 templates = Jinja2Templates(directory=os.path.join(current_dir, "templates"))
 app.mount("/static", StaticFiles(directory=os.path.join(current_dir, "static")), name="static")
 
-try:
-    dynamodb_service = DynamoDBService()
-    graph_service = GraphService()
-    logger.info("アプリケーションの初期化が完了しました")
-except Exception as e:
-    logger.error(f"初期化エラー: {str(e)}")
-    raise
+logger.info("アプリケーションの初期化が完了しました")
+
+@app.get("/assets/plotly.min.js", include_in_schema=False)
+async def plotly_asset(request: Request):
+    """同梱のplotly.jsを長期キャッシュ可能な静的ファイルとして配信"""
+    from .services.graph import plotly_js
+
+    body, gzipped, etag = await run_in_threadpool(plotly_js)
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": etag,
+        "Vary": "Accept-Encoding",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        body = gzipped
+    return Response(body, media_type="application/javascript", headers=headers)
+
+@app.get("/metrics", include_in_schema=False, response_class=PlainTextResponse)
+async def metrics(services: ServiceProvider = Depends(get_services)):
+    """Prometheusのテキスト形式でメトリクスを出力"""
+    if not settings.enable_metrics:
+        raise HTTPException(status_code=404, detail="Not Found")
+    lines = registry.render()
+    caches = {"query": services.query_cache.stats}
+    if services.connected:
+        if services.dynamodb is not None:
+            lines += render_dynamodb_stats(services.dynamodb.stats)
+        caches["latest"] = services.latest_cache.stats
+        if services.hot_window is not None:
+            caches["hot_window"] = services.hot_window.stats
+        lines += render_single_flight_stats(services.async_dynamodb.single_flight.stats)
+        lines += render_live_stats(services.live_hub.subscriber_count, services.live_hub.stats)
+    lines += render_cache_stats(caches)
+    return PlainTextResponse(
+        "\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 @app.get("/")
 async def home(
     request: Request,
     data_type: str = Query(default=settings.default_data_type, description="データの種類"),
-    days: int = Query(default=settings.default_period_days, description="表示する日数")
+    days: int = Query(default=settings.default_period_days, description="表示する日数"),
+    services: ServiceProvider = Depends(get_services)
 ):
     try:
+        if not services.connected and not await run_in_threadpool(services.connect):
+            raise RuntimeError("DynamoDB service not available")
+        
         # 指定された日数前からのデータを表示
-        end_date = datetime.now()
+        end_date = aligned_now(settings.cache_range_granularity_seconds)
         start_date = end_date - timedelta(days=days)
         
         logger.info(f"データ取得開始: data_type={data_type}, days={days}")
         logger.debug(f"期間: {start_date} から {end_date}")
         
-        data = dynamodb_service.get_data(
+        timestamps, values = await services.data_service.get_arrays(
             data_type,
             start_date.strftime("%Y-%m-%d %H:%M:%S"),
             end_date.strftime("%Y-%m-%d %H:%M:%S")
         )
         
-        plot_html = graph_service.create_time_series_plot(data)
+        # グラフ生成はCPU負荷が高いためスレッドプールで実行（plotlyのimportも含む）
+        graph_service = await run_in_threadpool(lambda: services.graph_service)
+        from .services.graph import PLOTLY_JS_URL
+        plot_html = await run_in_threadpool(graph_service.plot_arrays, timestamps, values)
         
-        logger.info(f"データ取得完了: {len(data)}件のデータを取得")
+        logger.info(f"データ取得完了: {len(values)}件のデータを取得")
         
         return templates.TemplateResponse(
+            request,
             "index.html",
             {
-                "request": request,
                 "plot_html": plot_html,
+                "plotly_js_url": PLOTLY_JS_URL,
                 "data_type": data_type,
                 "days": days
             }
@@ -86,6 +155,7 @@ async def home(
     except Exception as e:
         logger.error(f"ホームページエラー: {str(e)}")
         return templates.TemplateResponse(
+            request,
             "error.html",
-            {"request": request, "error_message": f"エラーが発生しました: {str(e)}"}
+            {"error_message": f"エラーが発生しました: {str(e)}"}
         ) 
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""
+アプリケーションメトリクス
+
+ルートごとのレイテンシのヒストグラムと処理中リクエスト数を集計し、
+`/metrics` でPrometheusのテキスト形式として公開する。
+
+リクエスト内の処理時間はフェーズ（query / transform / serialize）ごとに
+ServerTimingへ記録し、レスポンスの `Server-Timing` ヘッダーで返す。
+現在のリクエストのServerTimingはcontextvarで受け渡すため、
+サービス層からは `timed("query")` のように呼ぶだけでよい。
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# レイテンシのバケット（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = "plant_monitor"
+
+
+class ServerTiming:
+    """1リクエスト内のフェーズごとの処理時間"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self) -> str:
+        """Server-Timingヘッダーの値（ミリ秒）"""
+        total = time.perf_counter() - self.started_at
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+current_timing: ContextVar[Optional[ServerTiming]] = ContextVar("current_timing", default=None)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """現在のリクエストのServerTimingに処理時間を記録する（リクエスト外では何もしない）"""
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(phase, time.perf_counter() - start)
+
+
+class Histogram:
+    """累積バケットのヒストグラム"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # value <= bound となる最初のバケット（どれにも入らなければ+Inf）
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, 累積件数) のリスト（最後は+Inf）"""
+        result = []
+        total = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+
+def _labels(**labels) -> str:
+    """Prometheus形式のラベル文字列"""
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsRegistry:
+    """HTTPリクエストのメトリクスを集計する"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._responses: Dict[Tuple[str, str, int], int] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def request_started(self, method: str) -> None:
+        with self._lock:
+            self._in_flight[method] = self._in_flight.get(method, 0) + 1
+
+    def request_finished(self, method: str, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self._in_flight[method] -= 1
+            histogram = self._latency.get((method, route))
+            if histogram is None:
+                histogram = self._latency[(method, route)] = Histogram(self._buckets)
+            histogram.observe(seconds)
+            key = (method, route, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def render(self) -> List[str]:
+        """Prometheusのテキスト形式の行を返す"""
+        name = f"{METRIC_PREFIX}_http_request_duration_seconds"
+        lines = [
+            f"# HELP {name} ルートごとのリクエスト処理時間",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for (method, route), histogram in sorted(self._latency.items()):
+                for le, count in histogram.cumulative():
+                    lines.append(f"{name}_bucket{_labels(method=method, route=route, le=le)} {count}")
+                lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+
+            name = f"{METRIC_PREFIX}_http_responses_total"
+            lines += [f"# HELP {name} ステータスコードごとのレスポンス数", f"# TYPE {name} counter"]
+            for (method, route, status), count in sorted(self._responses.items()):
+                lines.append(f"{name}{_labels(method=method, route=route, status=status)} {count}")
+
+            name = f"{METRIC_PREFIX}_http_requests_in_flight"
+            lines += [f"# HELP {name} 処理中のリクエスト数", f"# TYPE {name} gauge"]
+            for method, count in sorted(self._in_flight.items()):
+                lines.append(f"{name}{_labels(method=method)} {count}")
+        return lines
+
+
+# DynamoDBServiceの統計キーごとのメトリクス（名前、種類、説明）
+DYNAMODB_METRICS = {
+    "queries": ("dynamodb_queries_total", "counter", "DynamoDBへの論理クエリ数"),
+    "pages": ("dynamodb_pages_total", "counter", "Queryリクエスト（ページ）数"),
+    "items": ("dynamodb_items_total", "counter", "取得したアイテム数"),
+    "consumed_capacity_units": (
+        "dynamodb_consumed_read_capacity_units_total", "counter", "消費した読み込みキャパシティユニット"
+    ),
+    "errors": ("dynamodb_errors_total", "counter", "Queryリクエストのエラー数"),
+    "seconds": ("dynamodb_query_seconds_total", "counter", "Queryリクエストの合計時間（秒）"),
+}
+
+
+def render_dynamodb_stats(stats: Dict[str, float]) -> List[str]:
+    """DynamoDBServiceの統計をPrometheus形式に変換"""
+    lines = []
+    for key, (name, kind, help_text) in DYNAMODB_METRICS.items():
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines += [
+            f"# HELP {metric} {help_text}",
+            f"# TYPE {metric} {kind}",
+            f"{metric} {stats.get(key, 0)}",
+        ]
+    return lines
+
+
+def render_cache_stats(caches: Dict[str, Dict[str, int]]) -> List[str]:
+    """
+    キャッシュごとの統計（hits / stale_hits / misses）とヒット率をPrometheus形式に変換
+
+    Args:
+        caches: {キャッシュ名: stats} の辞書
+    """
+    results = ("hits", "stale_hits", "misses")
+    requests = f"{METRIC_PREFIX}_cache_requests_total"
+    ratio = f"{METRIC_PREFIX}_cache_hit_ratio"
+    request_lines = [f"# HELP {requests} キャッシュの参照結果ごとの件数", f"# TYPE {requests} counter"]
+    ratio_lines = [f"# HELP {ratio} キャッシュヒット率（staleを含む）", f"# TYPE {ratio} gauge"]
+    for cache, stats in caches.items():
+        for result in results:
+            request_lines.append(f"{requests}{_labels(cache=cache, result=result)} {stats.get(result, 0)}")
+        lookups = sum(stats.get(result, 0) for result in results)
+        hits = stats.get("hits", 0) + stats.get("stale_hits", 0)
+        ratio_lines.append(f"{ratio}{_labels(cache=cache)} {hits / lookups if lookups else 0.0:.4f}")
+    return request_lines + ratio_lines
+
+
+def render_single_flight_stats(stats: Dict[str, int]) -> List[str]:
+    """同一クエリの同時実行をまとめた件数をPrometheus形式に変換"""
+    metrics = [
+        ("storage_calls_total", "ストレージへの問い合わせの呼び出し数", stats.get("calls", 0)),
+        ("storage_executions_total", "実際に実行したクエリ数", stats.get("executions", 0)),
+        ("storage_coalesced_total", "実行中の同一クエリの結果を共有した呼び出し数", stats.get("coalesced", 0)),
+    ]
+    lines = []
+    for name, help_text, value in metrics:
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter", f"{metric} {value}"]
+    return lines
+
+
+def render_live_stats(subscribers: int, stats: Dict[str, int]) -> List[str]:
+    """ライブ配信ハブの購読者数とポーリング・配信件数をPrometheus形式に変換"""
+    metrics = [
+        ("live_subscribers", "gauge", "ライブ配信の購読者数", subscribers),
+        ("live_polls_total", "counter", "ライブ配信のための新着確認の回数", stats.get("polls", 0)),
+        ("live_readings_total", "counter", "配信した新着データ数", stats.get("readings", 0)),
+        ("live_dropped_total", "counter", "購読者のキューから溢れて捨てたデータ数", stats.get("dropped", 0)),
+    ]
+    lines = []
+    for name, kind, help_text, value in metrics:
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}", f"{metric} {value}"]
+    return lines
+
+
+# プロセス全体で共有するレジストリ
+registry = MetricsRegistry()
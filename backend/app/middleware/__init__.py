@@ -2,5 +2,6 @@
 ミドルウェアパッケージ
 """
 from .logging import RequestLoggingMiddleware
+from .metrics import MetricsMiddleware
 
-__all__ = ["RequestLoggingMiddleware"]
\ No newline at end of file
+__all__ = ["RequestLoggingMiddleware", "MetricsMiddleware"]
\ No newline at end of file
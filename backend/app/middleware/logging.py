@@ -1,58 +1,87 @@
 """
 リクエストログ用ミドルウェア
+
+BaseHTTPMiddlewareを使わない純粋なASGIミドルウェアとして実装し、
+レスポンス本体（ストリーミングを含む）には手を加えずにステータスだけを受け取る。
+1リクエストにつき1行の key=value 形式で出力し、頻繁に呼ばれるパスは
+サンプリングして出力件数を減らせる。
 """
-import time
 import logging
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Callable
+import random
+import time
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware:
     """リクエストとレスポンスをログ出力するミドルウェア"""
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # リクエスト開始時刻
-        start_time = time.time()
-        
-        # クライアント情報
-        client_ip = request.client.host if request.client else "unknown"
-        user_agent = request.headers.get("user-agent", "unknown")
-        
-        # リクエスト情報をログ出力
-        logger.info(
-            f"REQUEST: {request.method} {request.url} - "
-            f"Client: {client_ip} - User-Agent: {user_agent}"
-        )
-        
-        # クエリパラメータがある場合はログ出力
-        if request.query_params:
-            logger.info(f"Query params: {dict(request.query_params)}")
-        
+
+    def __init__(
+        self,
+        app,
+        sample_rates: Optional[Dict[str, float]] = None,
+        default_sample_rate: float = 1.0,
+        slow_threshold_seconds: float = 1.0,
+    ):
+        """
+        Args:
+            app: ラップするASGIアプリケーション
+            sample_rates: パスごとの出力割合（0.0〜1.0）
+            default_sample_rate: sample_ratesにないパスの出力割合
+            slow_threshold_seconds: これより遅いリクエストはサンプリングせず必ず出力する
+        """
+        self.app = app
+        self._sample_rates = sample_rates or {}
+        self._default_sample_rate = default_sample_rate
+        self._slow_threshold = slow_threshold_seconds
+
+    def _sampled(self, path: str) -> bool:
+        rate = self._sample_rates.get(path, self._default_sample_rate)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         try:
-            # リクエストを処理
-            response = await call_next(request)
-            
-            # 処理時間を計算
-            process_time = time.time() - start_time
-            
-            # レスポンス情報をログ出力
-            logger.info(
-                f"RESPONSE: {request.method} {request.url} - "
-                f"Status: {response.status_code} - "
-                f"Time: {process_time:.4f}s"
-            )
-            
-            return response
-            
+            await self.app(scope, receive, send_with_status)
         except Exception as e:
-            # エラー時のログ出力
-            process_time = time.time() - start_time
+            # エラーはサンプリングせず必ず出力する
             logger.error(
-                f"ERROR: {request.method} {request.url} - "
-                f"Error: {str(e)} - "
-                f"Time: {process_time:.4f}s"
+                "method=%s path=%s query=%s client=%s error=%r duration_ms=%.1f",
+                scope["method"],
+                scope["path"],
+                scope["query_string"].decode("latin-1"),
+                scope["client"][0] if scope.get("client") else "unknown",
+                e,
+                (time.perf_counter() - start_time) * 1000,
             )
-            raise
\ No newline at end of file
+            raise
+
+        process_time = time.perf_counter() - start_time
+        if status_code < 500 and process_time < self._slow_threshold:
+            if not logger.isEnabledFor(logging.INFO) or not self._sampled(scope["path"]):
+                return
+
+        # 文字列の組み立ては出力が決まってからloggingに任せる
+        logger.log(
+            logging.WARNING if status_code >= 500 else logging.INFO,
+            "method=%s path=%s query=%s status=%d duration_ms=%.1f client=%s",
+            scope["method"],
+            scope["path"],
+            scope["query_string"].decode("latin-1"),
+            status_code,
+            process_time * 1000,
+            scope["client"][0] if scope.get("client") else "unknown",
+        )
@@ -0,0 +1,48 @@
+"""
+メトリクス用ミドルウェア
+
+ルートごとのレイテンシと処理中リクエスト数を集計し、レスポンスに
+フェーズごとの処理時間を `Server-Timing` ヘッダーとして付与する。
+"""
+import time
+
+from ..metrics import MetricsRegistry, ServerTiming, current_timing, registry
+
+
+class MetricsMiddleware:
+    """リクエストのメトリクスを集計する純粋なASGIミドルウェア"""
+
+    def __init__(self, app, metrics: MetricsRegistry = registry):
+        self.app = app
+        self._metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        timing = ServerTiming()
+        token = current_timing.set(timing)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # ヘッダー送信時点までのフェーズを記録する（ストリーミングの本体は含まない）
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        self._metrics.request_started(method)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timing.reset(token)
+            # ルーティング後はscopeにマッチしたルートが入る（パスパラメータを含まないテンプレート）
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            self._metrics.request_finished(
+                method, route, status_code, time.perf_counter() - timing.started_at
+            )
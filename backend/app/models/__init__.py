@@ -0,0 +1,27 @@
+"""
+データモデルパッケージ
+"""
+from .alert import Alert
+from .plant import Plant, Threshold
+from .sensor import (
+    BatchDataRequest,
+    BatchDataResponse,
+    DataSummary,
+    SensorPoint,
+    SeriesData,
+    SeriesRequest,
+    SummaryBucket,
+)
+
+__all__ = [
+    "Alert",
+    "BatchDataRequest",
+    "BatchDataResponse",
+    "DataSummary",
+    "Plant",
+    "SensorPoint",
+    "SeriesData",
+    "SeriesRequest",
+    "SummaryBucket",
+    "Threshold",
+]
@@ -0,0 +1,25 @@
+"""
+アラート関連のモデル
+"""
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class Alert(BaseModel):
+    """閾値アラート（範囲外が続いた1区間）"""
+
+    id: str = Field(..., description="アラートID")
+    plant_id: str = Field(..., description="植物ID")
+    type: str = Field(..., description="種別 (temperature_high, pH_low など)")
+    severity: str = Field(..., description="重要度 (low, medium, high)")
+    message: str
+    timestamp: str = Field(..., description="発生時刻 (ISO 8601)")
+    acknowledged: bool
+    resolved: bool = Field(..., description="範囲内に戻ったかどうか")
+    data_type: str
+    threshold: float = Field(..., description="超過した閾値")
+    peak_value: float = Field(..., description="区間内で最も閾値から離れた値")
+    started_at: str
+    ended_at: Optional[str] = Field(None, description="範囲内に戻った時刻（継続中はNone）")
+    last_seen_at: str = Field(..., description="範囲外の値を最後に観測した時刻")
@@ -0,0 +1,26 @@
+"""
+植物情報関連のモデル
+"""
+from typing import Dict
+
+from pydantic import BaseModel, Field
+
+
+class Threshold(BaseModel):
+    """センサー値の許容範囲"""
+
+    min: float
+    max: float
+
+
+class Plant(BaseModel):
+    """植物情報"""
+
+    id: str = Field(..., description="植物ID")
+    name: str = Field(..., description="名前")
+    species: str = Field(..., description="学名")
+    location: str = Field(..., description="設置場所")
+    device_id: str = Field(..., description="デバイスID")
+    created_at: str
+    updated_at: str
+    thresholds: Dict[str, Threshold] = Field(default_factory=dict, description="データタイプごとの閾値")
@@ -0,0 +1,88 @@
+"""
+センサーデータ関連のモデル
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class SeriesRequest(BaseModel):
+    """一括取得で要求する系列（未指定の項目はリクエスト全体の値を使う）"""
+
+    data_type: str = Field(..., description="データタイプ (temperature, pH)")
+    start_time: Optional[str] = Field(None, description="開始時刻 (ISO format)")
+    end_time: Optional[str] = Field(None, description="終了時刻 (ISO format)")
+    limit: Optional[int] = Field(None, ge=1, description="最大取得件数")
+    max_points: Optional[int] = Field(None, ge=3, description="ダウンサンプリング後の最大点数")
+    method: Optional[str] = Field(None, pattern="^(lttb|minmax|avg)$", description="ダウンサンプリング手法")
+
+
+class BatchDataRequest(BaseModel):
+    """複数系列の一括取得リクエスト"""
+
+    series: List[SeriesRequest] = Field(..., min_length=1, max_length=20, description="取得する系列")
+    start_time: Optional[str] = Field(None, description="全系列共通の開始時刻 (ISO format)")
+    end_time: Optional[str] = Field(None, description="全系列共通の終了時刻 (ISO format)")
+    limit: int = Field(1000, ge=1, description="全系列共通の最大取得件数")
+    max_points: Optional[int] = Field(None, ge=3, description="全系列共通のダウンサンプリング後の最大点数")
+    method: str = Field("lttb", pattern="^(lttb|minmax|avg)$", description="全系列共通のダウンサンプリング手法")
+
+
+class SensorPoint(BaseModel):
+    """センサーデータの1点"""
+
+    timestamp: str = Field(..., description="計測時刻 (ISO 8601)")
+    value: float = Field(..., description="センサー値")
+    device_id: str = Field(..., description="デバイスID")
+    location: str = Field(..., description="設置場所")
+
+
+class SeriesData(BaseModel):
+    """一括取得の1系列分の結果"""
+
+    data_type: str
+    start_time: str
+    end_time: str
+    data: List[SensorPoint]
+
+
+class BatchDataResponse(BaseModel):
+    """複数系列の一括取得レスポンス"""
+
+    series: List[SeriesData]
+
+
+class SummaryBucket(BaseModel):
+    """集計期間1つ分のバケット"""
+
+    start: str = Field(..., description="バケットの開始時刻")
+    count: int
+    sum: float
+    min: float
+    max: float
+    average: float
+    std: float = Field(0, description="標準偏差（母標準偏差）")
+    p5: Optional[float] = Field(None, description="5パーセンタイル（近似）")
+    p50: Optional[float] = Field(None, description="中央値（近似）")
+    p95: Optional[float] = Field(None, description="95パーセンタイル（近似）")
+    time_above_threshold_seconds: Optional[float] = Field(
+        None, description="値がしきい値を超えていた時間（秒、近似）"
+    )
+
+
+class DataSummary(BaseModel):
+    """期間サマリー"""
+
+    average: float
+    minimum: float
+    maximum: float
+    count: int
+    period: str
+    std: float = Field(0, description="標準偏差（母標準偏差）")
+    p5: Optional[float] = Field(None, description="5パーセンタイル（近似）")
+    p50: Optional[float] = Field(None, description="中央値（近似）")
+    p95: Optional[float] = Field(None, description="95パーセンタイル（近似）")
+    time_above_threshold_seconds: Optional[float] = Field(
+        None, description="値がしきい値を超えていた時間（秒、近似）"
+    )
+    buckets: List[SummaryBucket] = []
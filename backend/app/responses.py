@@ -0,0 +1,29 @@
+"""
+高速なJSONレスポンス
+
+FastAPIはハンドラーが返した値をjsonable_encoderで変換してから標準のjsonで
+シリアライズするため、大きな系列では変換処理がハンドラー時間の大半を占める。
+このレスポンスクラスを直接返すとjsonable_encoderを経由せず、orjsonで
+一度にエンコードされる（numpy配列もそのまま渡せる）。
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from .metrics import timed
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(content: Any) -> bytes:
+    """orjsonでJSONバイト列にエンコード"""
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """orjsonでエンコードするJSONレスポンス"""
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return dumps(content)
@@ -0,0 +1,396 @@
+"""
+閾値アラートエンジン
+
+植物ごとの thresholds（plant.json）に対してセンサー値をベクトル演算で判定し、
+上限超過・下限未満が続いた区間を1つのアラート（エピソード: 開始〜終了）にまとめる。
+植物×data_typeごとにウォーターマーク（評価済みの最新insert_date）をSQLiteに保持し、
+評価のたびにそれ以降に届いたデータだけを処理するため、アラート一覧の取得コストは
+新着データの量に比例し、表示のたびに長期間のデータを読み直すことはない。
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .series import format_dates, to_epoch_ms
+from .storage import INGEST_END
+
+logger = logging.getLogger(__name__)
+
+# classifyの判定値ごとのアラート種別
+ALERT_KINDS = {1: "high", -1: "low"}
+
+# 上限超過は重要度high、下限未満はmedium（フロントエンドの判定と同じ）
+ALERT_SEVERITIES = {"high": "high", "low": "medium"}
+
+ALERT_MESSAGES = {
+    "high": "{label}が設定された上限（{threshold:g}）を超えています",
+    "low": "{label}が設定された下限（{threshold:g}）を下回っています",
+}
+
+DATA_TYPE_LABELS = {"temperature": "温度", "pH": "pH"}
+
+
+def classify(values: np.ndarray, minimum: float, maximum: float) -> np.ndarray:
+    """各値を 1（上限超過）・-1（下限未満）・0（範囲内）に分類"""
+    return (values > maximum).astype(np.int8) - (values < minimum).astype(np.int8)
+
+
+def evaluate_episodes(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    minimum: float,
+    maximum: float,
+    open_episode: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    時刻順の新着データからエピソードを求める
+
+    判定値が同じ区間（ラン）ごとにまとめ、範囲外のランを1つのエピソードとする。
+    前回から継続中のエピソード（open_episode）と同じ種別で始まる場合は延長し、
+    範囲内に戻った（または反対側に振れた）時刻を終了時刻とする。
+    時刻（エポックミリ秒）の文字列化はランの境界の分だけ行う。
+
+    Returns:
+        追加・更新するエピソード（open_episodeの更新を含む場合は "id" を持つ）
+    """
+    state = classify(values, minimum, maximum)
+    if not len(state):
+        return []
+    # 判定値の切り替わり位置でランに分割し、ランごとの最大・最小をまとめて求める
+    edges = np.flatnonzero(state[1:] != state[:-1]) + 1
+    starts = np.r_[0, edges]
+    stops = np.r_[edges, len(state)]
+    highs = np.maximum.reduceat(values, starts)
+    lows = np.minimum.reduceat(values, starts)
+    first_dates = format_dates(timestamps[starts])
+    last_dates = format_dates(timestamps[stops - 1])
+
+    episodes = []
+    current = dict(open_episode) if open_episode else None
+    for code, first_date, last_date, high, low in zip(
+        state[starts].tolist(), first_dates, last_dates, highs.tolist(), lows.tolist()
+    ):
+        kind = ALERT_KINDS.get(code)
+        peak = high if kind == "high" else low
+        if current is not None and current["kind"] == kind:
+            current["last_seen_at"] = last_date
+            if kind == "high":
+                current["peak_value"] = max(current["peak_value"], peak)
+            else:
+                current["peak_value"] = min(current["peak_value"], peak)
+            continue
+        if current is not None:
+            current["ended_at"] = first_date
+            episodes.append(current)
+            current = None
+        if kind is not None:
+            current = {
+                "kind": kind,
+                "threshold": maximum if kind == "high" else minimum,
+                "started_at": first_date,
+                "ended_at": None,
+                "last_seen_at": last_date,
+                "peak_value": peak,
+            }
+    if current is not None:
+        episodes.append(current)
+    return episodes
+
+
+class AlertStore:
+    """アラートのエピソードとウォーターマークを保存するSQLiteストア"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS alert_episodes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    plant_id TEXT NOT NULL,
+                    data_type TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    threshold REAL NOT NULL,
+                    started_at TEXT NOT NULL,
+                    ended_at TEXT,
+                    last_seen_at TEXT NOT NULL,
+                    peak_value REAL NOT NULL,
+                    acknowledged INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS alert_episodes_started ON alert_episodes (plant_id, started_at)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS alert_watermarks (
+                    plant_id TEXT NOT NULL,
+                    data_type TEXT NOT NULL,
+                    last_insert_date TEXT NOT NULL,
+                    PRIMARY KEY (plant_id, data_type)
+                )
+                """
+            )
+
+    def get_watermark(self, plant_id: str, data_type: str) -> Optional[str]:
+        """評価済みの最新insert_dateを取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_insert_date FROM alert_watermarks WHERE plant_id = ? AND data_type = ?",
+                (plant_id, data_type),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_open(self, plant_id: str, data_type: str) -> Optional[Dict[str, Any]]:
+        """継続中（未終了）のエピソードを取得"""
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT * FROM alert_episodes
+                WHERE plant_id = ? AND data_type = ? AND ended_at IS NULL
+                ORDER BY id DESC LIMIT 1
+                """,
+                (plant_id, data_type),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def apply(
+        self,
+        plant_id: str,
+        data_type: str,
+        episodes: List[Dict[str, Any]],
+        previous_watermark: Optional[str],
+        watermark: str,
+    ) -> bool:
+        """
+        エピソードを追加・更新し、ウォーターマークを進める
+
+        他のワーカーが先に同じ範囲を評価していた（ウォーターマークが変わっていた）場合は
+        何もせずFalseを返すため、同じエピソードが二重に登録されることはない。
+        """
+        with self._lock, self._conn:
+            # 確認から更新までを他のプロセスの書き込みと排他にする
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT last_insert_date FROM alert_watermarks WHERE plant_id = ? AND data_type = ?",
+                (plant_id, data_type),
+            ).fetchone()
+            if (row[0] if row else None) != previous_watermark:
+                return False
+            for episode in episodes:
+                if "id" in episode:
+                    self._conn.execute(
+                        """
+                        UPDATE alert_episodes SET ended_at = ?, last_seen_at = ?, peak_value = ?
+                        WHERE id = ?
+                        """,
+                        (episode["ended_at"], episode["last_seen_at"], episode["peak_value"], episode["id"]),
+                    )
+                else:
+                    self._conn.execute(
+                        """
+                        INSERT INTO alert_episodes
+                            (plant_id, data_type, kind, threshold, started_at, ended_at, last_seen_at, peak_value)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            plant_id, data_type, episode["kind"], episode["threshold"],
+                            episode["started_at"], episode["ended_at"],
+                            episode["last_seen_at"], episode["peak_value"],
+                        ),
+                    )
+            self._conn.execute(
+                """
+                INSERT INTO alert_watermarks (plant_id, data_type, last_insert_date) VALUES (?, ?, ?)
+                ON CONFLICT (plant_id, data_type) DO UPDATE SET last_insert_date = excluded.last_insert_date
+                """,
+                (plant_id, data_type, watermark),
+            )
+            return True
+
+    def list(
+        self, plant_id: Optional[str] = None, active_only: bool = False, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """エピソードを開始時刻の新しい順に取得"""
+        conditions, params = [], []
+        if plant_id is not None:
+            conditions.append("plant_id = ?")
+            params.append(plant_id)
+        if active_only:
+            conditions.append("ended_at IS NULL")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM alert_episodes {where} ORDER BY started_at DESC, id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, episode_id: int) -> Optional[Dict[str, Any]]:
+        """IDでエピソードを取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM alert_episodes WHERE id = ?", (episode_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def acknowledge(self, episode_id: int) -> bool:
+        """エピソードを確認済みにする（存在しない場合はFalse）"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE alert_episodes SET acknowledged = 1 WHERE id = ?", (episode_id,)
+            )
+        return cursor.rowcount > 0
+
+
+def to_alert(episode: Dict[str, Any]) -> Dict[str, Any]:
+    """エピソードをフロントエンドのAlert形式に変換"""
+    label = DATA_TYPE_LABELS.get(episode["data_type"], episode["data_type"])
+    return {
+        "id": f"alert-{episode['id']}",
+        "plant_id": episode["plant_id"],
+        "type": f"{episode['data_type']}_{episode['kind']}",
+        "severity": ALERT_SEVERITIES[episode["kind"]],
+        "message": ALERT_MESSAGES[episode["kind"]].format(label=label, threshold=episode["threshold"]),
+        "timestamp": episode["started_at"] + "Z",
+        "acknowledged": bool(episode["acknowledged"]),
+        "resolved": episode["ended_at"] is not None,
+        "data_type": episode["data_type"],
+        "threshold": episode["threshold"],
+        "peak_value": episode["peak_value"],
+        "started_at": episode["started_at"] + "Z",
+        "ended_at": episode["ended_at"] + "Z" if episode["ended_at"] else None,
+        "last_seen_at": episode["last_seen_at"] + "Z",
+    }
+
+
+def parse_alert_id(alert_id: str) -> Optional[int]:
+    """"alert-<数値>" 形式のIDからエピソードIDを取り出す"""
+    prefix, _, number = alert_id.partition("-")
+    return int(number) if prefix == "alert" and number.isdigit() else None
+
+
+class AlertEngine:
+    """植物ごとの閾値に対して新着データを差分評価するアラートエンジン"""
+
+    def __init__(
+        self,
+        source,
+        registry,
+        store: AlertStore,
+        evaluation_interval_seconds: float = 60.0,
+        bootstrap_days: int = 30,
+    ):
+        """
+        Args:
+            source: query_arraysを持つストレージ
+            registry: 植物情報レジストリ（PlantRegistry）
+            store: エピソードとウォーターマークの保存先
+            evaluation_interval_seconds: 前回の評価からこの時間内は評価を省略する
+            bootstrap_days: ウォーターマークがない場合に遡って評価する日数
+        """
+        self._source = source
+        self._registry = registry
+        self._store = store
+        self._evaluation_interval = evaluation_interval_seconds
+        self._bootstrap_days = bootstrap_days
+        self._last_evaluation: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _load(self, data_type: str, start: str) -> Tuple[np.ndarray, np.ndarray]:
+        """start以降（両端を含む）のデータを (エポックミリ秒の配列, 値の配列) として取得"""
+        timestamps, values = self._source.query_arrays(data_type, start, INGEST_END)
+        return np.asarray(timestamps, dtype=np.int64), np.asarray(values, dtype=np.float64)
+
+    def evaluate(self, force: bool = False) -> int:
+        """
+        全植物の閾値について、ウォーターマーク以降のデータを評価する
+
+        同じdata_typeを監視する植物が複数あってもデータは1回だけ読み込む。
+
+        Returns:
+            評価した件数（植物ごとの合計）
+        """
+        with self._lock:
+            last = self._last_evaluation
+            if not force and last is not None and time.monotonic() - last < self._evaluation_interval:
+                return 0
+
+            bootstrap_start = (
+                datetime.now() - timedelta(days=self._bootstrap_days)
+            ).strftime("%Y-%m-%d %H:%M:%S")
+            targets: Dict[str, List[Tuple[str, float, float]]] = {}
+            plants, _ = self._registry.list()
+            for plant in plants:
+                for data_type, (minimum, maximum) in self._registry.thresholds(plant["id"]).items():
+                    targets.setdefault(data_type, []).append((plant["id"], minimum, maximum))
+
+            evaluated = 0
+            for data_type, rules in targets.items():
+                watermarks = {
+                    plant_id: self._store.get_watermark(plant_id, data_type)
+                    for plant_id, _, _ in rules
+                }
+                start = min(watermark or bootstrap_start for watermark in watermarks.values())
+                try:
+                    timestamps, values = self._load(data_type, start)
+                except Exception as e:
+                    logger.error(f"アラート評価用のデータ取得エラー: data_type={data_type}, {str(e)}")
+                    continue
+
+                for plant_id, minimum, maximum in rules:
+                    watermark = watermarks[plant_id]
+                    # BETWEENは境界を含むため、評価済みの行を除外
+                    offset = (
+                        int(np.searchsorted(timestamps, to_epoch_ms(watermark), side="right"))
+                        if watermark else 0
+                    )
+                    if offset >= len(timestamps):
+                        continue
+                    episodes = evaluate_episodes(
+                        timestamps[offset:], values[offset:], minimum, maximum,
+                        self._store.get_open(plant_id, data_type)
+                    )
+                    last_date = format_dates(timestamps[-1:])[0]
+                    if self._store.apply(plant_id, data_type, episodes, watermark, last_date):
+                        evaluated += len(timestamps) - offset
+
+            self._last_evaluation = time.monotonic()
+            if evaluated:
+                logger.info(f"アラート評価: 評価件数={evaluated}")
+            return evaluated
+
+    def list(
+        self, plant_id: Optional[str] = None, active_only: bool = False, limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """新着データを評価してからアラートを新しい順に返す"""
+        self.evaluate()
+        return [to_alert(episode) for episode in self._store.list(plant_id, active_only, limit)]
+
+    def get(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        """IDでアラートを取得"""
+        episode_id = parse_alert_id(alert_id)
+        if episode_id is None:
+            return None
+        self.evaluate()
+        episode = self._store.get(episode_id)
+        return to_alert(episode) if episode else None
+
+    def acknowledge(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        """アラートを確認済みにする（存在しない場合はNone）"""
+        episode_id = parse_alert_id(alert_id)
+        if episode_id is None or not self._store.acknowledge(episode_id):
+            return None
+        return to_alert(self._store.get(episode_id))
@@ -0,0 +1,128 @@
+"""
+ストレージ（DynamoDBServiceなど）の非同期ラッパー
+
+boto3は同期APIのため、専用のスレッドプールでクエリを実行して
+イベントループをブロックしないようにする。プールのスレッド数が
+同時に実行できるクエリ数の上限となる。
+
+同じ引数のクエリが実行中の場合は新たに発行せず、その結果を共有する（single-flight）。
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .singleflight import SingleFlight
+from .storage import DEFAULT_PROJECTION, TimeSeriesStorage
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDynamoDBService:
+    """DynamoDBServiceのクエリを専用スレッドプールで実行する非同期サービス"""
+
+    def __init__(self, service: TimeSeriesStorage, max_concurrency: int = 16):
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="dynamodb"
+        )
+        # 同一クエリの同時実行をまとめる（統計は /metrics で公開）
+        self.single_flight = SingleFlight()
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """同期関数を専用スレッドプールで実行して結果を待つ"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def get_data(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> List[Dict[str, Any]]:
+        """期間内のデータを取得"""
+        return await self.single_flight.do(
+            ("get_data", data_type, start_date, end_date, limit, ascending, projection),
+            lambda: self.run(
+                self.service.get_data, data_type, start_date, end_date,
+                limit=limit, ascending=ascending, projection=projection
+            )
+        )
+
+    async def query_items(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> List[Dict[str, Any]]:
+        """期間内のデータを取得（エラーは呼び出し元に送出）"""
+        return await self.single_flight.do(
+            ("query_items", data_type, start_date, end_date, limit, ascending, projection),
+            lambda: self.run(
+                self.service.query_items, data_type, start_date, end_date,
+                limit=limit, ascending=ascending, projection=projection
+            )
+        )
+
+    async def query_arrays(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """期間内のデータを (エポックミリ秒, 値) の配列で取得（エラーは呼び出し元に送出）"""
+        return await self.single_flight.do(
+            ("query_arrays", data_type, start_date, end_date, limit),
+            lambda: self.run(
+                self.service.query_arrays, data_type, start_date, end_date, limit=limit
+            )
+        )
+
+    async def iter_pages(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        期間内のデータをページ単位で非同期に取得
+
+        次のページは前のページを呼び出し元が処理し終えてから取得するため、
+        範囲の長さに関係なく保持するのは1ページ分だけになる。
+        """
+        pages = self.service.iter_pages(
+            data_type, start_date, end_date,
+            limit=limit, ascending=ascending, projection=projection
+        )
+        done = object()
+        while True:
+            page = await self.run(next, pages, done)
+            if page is done:
+                break
+            yield page
+
+    async def get_latest(self, data_type: str) -> Optional[Dict[str, Any]]:
+        """最新の1件を取得"""
+        return await self.single_flight.do(
+            ("get_latest", data_type), lambda: self.run(self.service.get_latest, data_type)
+        )
+
+    def shutdown(self) -> None:
+        """スレッドプールを停止"""
+        self._executor.shutdown(wait=False)
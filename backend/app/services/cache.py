@@ -0,0 +1,272 @@
+"""
+クエリ結果キャッシュ
+
+ルーターとDynamoDBServiceの間に置くキャッシュ層。バックエンドはプロセス内LRUと
+Redis互換サーバーを切り替えられ、Redisを使えば複数のuvicornワーカーや
+レプリカ間でキャッシュヒットを共有できる。
+
+- キーは正規化した (data_type, start, end) の範囲から作る
+- 終了時刻が十分に過去の範囲（確定済みの履歴）は長いTTLで保持する
+- 期限切れ後もstale期間中は古い値を即座に返し、裏で再取得する
+  （DynamoDBが遅い・スロットリング中でもレスポンスを返せる）
+"""
+import asyncio
+import base64
+import json
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+def normalize_time(value: str) -> str:
+    """時刻文字列をDynamoDBのクエリ形式に正規化"""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).strftime(DATE_FORMAT)
+
+
+def aligned_now(granularity_seconds: int = 60) -> datetime:
+    """
+    現在時刻を指定秒単位に切り上げて返す
+
+    「現在まで」のデフォルト範囲を同じ値に揃え、キャッシュキーを安定させる。
+    """
+    now = datetime.now().replace(microsecond=0)
+    epoch_seconds = int(now.timestamp())
+    aligned = math.ceil(epoch_seconds / granularity_seconds) * granularity_seconds
+    return now + timedelta(seconds=aligned - epoch_seconds)
+
+
+class CacheBackend(ABC):
+    """キャッシュバックエンドの基底クラス"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """キーのエントリを取得（なければNone）"""
+
+    @abstractmethod
+    async def set(self, key: str, entry: Dict[str, Any], ttl_seconds: float) -> None:
+        """エントリをttl_seconds秒保存"""
+
+
+class MemoryLRUCache(CacheBackend):
+    """プロセス内のLRUキャッシュ"""
+
+    def __init__(self, max_entries: int = 64):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        found = self._entries.get(key)
+        if found is None:
+            return None
+        expires_at, entry = found
+        if time.time() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl_seconds: float) -> None:
+        self._entries[key] = (time.time() + ttl_seconds, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+def _encode_array(value: Any) -> Dict[str, str]:
+    """numpy配列をJSONで保存できる形式（dtypeとbase64のバイト列）に変換"""
+    if isinstance(value, np.ndarray):
+        return {
+            "__ndarray__": base64.b64encode(np.ascontiguousarray(value).tobytes()).decode("ascii"),
+            "dtype": value.dtype.str,
+        }
+    raise TypeError(f"JSONに変換できない型です: {type(value).__name__}")
+
+
+def _decode_array(value: Dict[str, Any]) -> Any:
+    if "__ndarray__" in value:
+        return np.frombuffer(base64.b64decode(value["__ndarray__"]), dtype=value["dtype"])
+    return value
+
+
+class RedisCache(CacheBackend):
+    """Redisプロトコル互換サーバーを使う共有キャッシュ"""
+
+    def __init__(self, url: str, prefix: str = "plant-monitor:"):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise ImportError(
+                "Redisキャッシュを使うには redis パッケージが必要です (pip install redis)"
+            ) from e
+        self._client = redis_asyncio.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._client.get(self._prefix + key)
+        return json.loads(raw, object_hook=_decode_array) if raw is not None else None
+
+    async def set(self, key: str, entry: Dict[str, Any], ttl_seconds: float) -> None:
+        await self._client.set(
+            self._prefix + key,
+            json.dumps(entry, ensure_ascii=False, default=_encode_array),
+            px=max(1, int(ttl_seconds * 1000)),
+        )
+
+
+def create_cache_backend(settings) -> Optional[CacheBackend]:
+    """設定に応じたキャッシュバックエンドを生成（"none"の場合はNone）"""
+    if settings.cache_backend == "none":
+        return None
+    if settings.cache_backend == "redis":
+        return RedisCache(settings.redis_url)
+    return MemoryLRUCache(max_entries=settings.cache_max_entries)
+
+
+class QueryCache:
+    """stale-while-revalidate方式のクエリ結果キャッシュ"""
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend],
+        recent_ttl_seconds: float = 30.0,
+        historical_ttl_seconds: float = 86400.0,
+        stale_ttl_seconds: float = 600.0,
+        settle_seconds: float = 900.0,
+    ):
+        self._backend = backend
+        self._recent_ttl = recent_ttl_seconds
+        self._historical_ttl = historical_ttl_seconds
+        self._stale_ttl = stale_ttl_seconds
+        self._settle = settle_seconds
+        self._refreshing: set = set()
+        self._tasks: set = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "errors": 0}
+
+    def _fresh_ttl(self, end: str) -> float:
+        """終了時刻が確定済みの過去なら長いTTL、現在を含む範囲なら短いTTL"""
+        settled_before = datetime.now() - timedelta(seconds=self._settle)
+        if datetime.strptime(end, DATE_FORMAT) < settled_before:
+            return self._historical_ttl
+        return self._recent_ttl
+
+    async def _load_and_store(self, key: str, loader: Loader, end: str) -> Any:
+        value = await loader()
+        fresh_ttl = self._fresh_ttl(end)
+        entry = {"value": value, "fresh_until": time.time() + fresh_ttl}
+        try:
+            await self._backend.set(key, entry, fresh_ttl + self._stale_ttl)
+        except Exception as e:
+            # キャッシュ障害時もレスポンスは返す
+            self.stats["errors"] += 1
+            logger.warning(f"キャッシュ書き込みエラー: key={key}, error={str(e)}")
+        return value
+
+    def _refresh_in_background(self, key: str, loader: Loader, end: str) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def run():
+            try:
+                await self._load_and_store(key, loader, end)
+            except Exception as e:
+                logger.warning(f"キャッシュのバックグラウンド更新に失敗: key={key}, error={str(e)}")
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get_or_load(self, key: str, loader: Loader, end: str) -> Any:
+        """
+        キャッシュから値を取得し、なければloaderで取得して保存する
+
+        Args:
+            key: 正規化済みのキャッシュキー
+            loader: 値を取得するコルーチン関数
+            end: 対象範囲の終了時刻（TTLの判定に使う）
+        """
+        if self._backend is None:
+            return await loader()
+
+        try:
+            entry = await self._backend.get(key)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"キャッシュ読み込みエラー: key={key}, error={str(e)}")
+            entry = None
+
+        if entry is not None:
+            if time.time() < entry["fresh_until"]:
+                self.stats["hits"] += 1
+            else:
+                self.stats["stale_hits"] += 1
+                self._refresh_in_background(key, loader, end)
+            return entry["value"]
+
+        self.stats["misses"] += 1
+        return await self._load_and_store(key, loader, end)
+
+
+class CachedDataService:
+    """キャッシュを経由してDynamoDBのデータを取得するサービス"""
+
+    def __init__(self, source, cache: QueryCache):
+        self._source = source
+        self.cache = cache
+
+    async def get_data(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """期間内のデータを取得（insert_date/avg_valueのみ、avg_valueはfloat）"""
+        start_date = normalize_time(start_date)
+        end_date = normalize_time(end_date)
+        key = f"data:{data_type}:{start_date}:{end_date}:{limit or ''}"
+
+        async def load():
+            items = await self._source.query_items(data_type, start_date, end_date, limit=limit)
+            # シリアライズ可能な形式に揃えて保存する
+            return [
+                {"insert_date": item["insert_date"], "avg_value": float(item["avg_value"])}
+                for item in items
+            ]
+
+        return await self.cache.get_or_load(key, load, end_date)
+
+    async def get_arrays(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """期間内のデータを時刻順の (エポックミリ秒int64, 値float64) の配列で取得"""
+        start_date = normalize_time(start_date)
+        end_date = normalize_time(end_date)
+        key = f"arrays:{data_type}:{start_date}:{end_date}:{limit or ''}"
+
+        async def load():
+            timestamps, values = await self._source.query_arrays(
+                data_type, start_date, end_date, limit=limit
+            )
+            return {"timestamps": timestamps, "values": values}
+
+        entry = await self.cache.get_or_load(key, load, end_date)
+        return entry["timestamps"], entry["values"]
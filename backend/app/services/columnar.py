@@ -0,0 +1,75 @@
+"""
+時系列データの列指向シリアライズ
+
+系列ごとに共通のメタデータ（data_type, device_id, location）は1回だけ送り、
+時刻と値はそれぞれ配列として送る。
+
+バイナリ形式（リトルエンディアン）:
+
+    オフセット  サイズ  内容
+    0           4       マジック "PMTS"
+    4           2       バージョン (uint16)
+    6           2       予約 (uint16, 0)
+    8           4       点数 N (uint32)
+    12          4       メタデータ長 M (uint32)
+    16          M       メタデータ (UTF-8 JSON)
+    ...                 8バイト境界までゼロ埋め
+    ...         8N      時刻 (int64, エポックミリ秒)
+    ...         8N      値 (float64)
+
+配列は8バイト境界に揃えているため、ブラウザ側ではコピーせずに
+BigInt64Array / Float64Array として参照できる。
+"""
+import json
+import struct
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.plant-monitor.columnar+json"
+BINARY_MEDIA_TYPE = "application/vnd.plant-monitor.series"
+
+BINARY_MAGIC = b"PMTS"
+BINARY_VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+
+
+def to_columnar_json(
+    meta: Dict[str, Any], timestamps: np.ndarray, values: np.ndarray
+) -> Dict[str, Any]:
+    """列指向JSON形式の辞書を作成"""
+    return {
+        **meta,
+        "count": int(len(values)),
+        "timestamps": timestamps.tolist(),
+        "values": values.tolist(),
+    }
+
+
+def encode_binary(
+    meta: Dict[str, Any], timestamps: np.ndarray, values: np.ndarray
+) -> bytes:
+    """バイナリ形式にエンコード"""
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    header = _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, len(values), len(meta_bytes))
+    padding = -(len(header) + len(meta_bytes)) % 8
+    return b"".join((
+        header,
+        meta_bytes,
+        b"\0" * padding,
+        np.ascontiguousarray(timestamps, dtype="<i8").tobytes(),
+        np.ascontiguousarray(values, dtype="<f8").tobytes(),
+    ))
+
+
+def decode_binary(data: bytes) -> Tuple[Dict[str, Any], np.ndarray, np.ndarray]:
+    """バイナリ形式をデコード（メタデータ、時刻、値）"""
+    magic, version, _, count, meta_len = _HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("未対応のバイナリ形式です")
+    meta_end = _HEADER.size + meta_len
+    meta = json.loads(data[_HEADER.size:meta_end].decode("utf-8"))
+    offset = meta_end + (-meta_end % 8)
+    timestamps = np.frombuffer(data, dtype="<i8", count=count, offset=offset)
+    values = np.frombuffer(data, dtype="<f8", count=count, offset=offset + 8 * count)
+    return meta, timestamps, values
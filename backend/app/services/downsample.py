@@ -0,0 +1,111 @@
+"""
+時系列データのダウンサンプリング
+
+グラフ描画に必要な点数まで、ピークや谷を残したままサーバー側で間引く。
+いずれの関数もエポックミリ秒(int64)と値(float64)の配列を受け取り、
+間引き後の (timestamps, values) を返す。
+"""
+from typing import Tuple
+
+import numpy as np
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax", "avg")
+
+
+def lttb_indices(timestamps: np.ndarray, values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets法で残す点のインデックスを求める
+
+    先頭と末尾の点は必ず残し、中間をn_out-2個のバケットに分割して、
+    前の選択点・次バケットの平均点と作る三角形の面積が最大の点を選ぶ。
+    """
+    n = len(values)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("LTTBの出力点数は3以上を指定してください")
+
+    x = timestamps.astype(np.float64)
+    y = values
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+
+    # 各バケットの平均点（次バケットの代表点として使う）
+    avg_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs(
+            (ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay)
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(timestamps: np.ndarray, values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    バケットごとの最小値・最大値の点を残すインデックスを求める
+
+    n_out/2個のバケットに分割し、各バケットの最小点と最大点を時刻順で返す。
+    """
+    n = len(values)
+    if n_out >= n:
+        return np.arange(n)
+
+    n_buckets = max(1, n_out // 2)
+    bucket = (np.arange(n) * n_buckets) // n
+    # バケット→値の順で並べ替え、各バケットの先頭（最小）と末尾（最大）を取る
+    order = np.lexsort((values, bucket))
+    starts = np.searchsorted(bucket, np.arange(n_buckets), side="left")
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def bucket_average(
+    timestamps: np.ndarray, values: np.ndarray, n_out: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """等件数のバケットに分割し、各バケットの平均時刻・平均値を返す"""
+    n = len(values)
+    if n_out >= n:
+        return timestamps, values
+
+    edges = (np.arange(n_out) * n) // n_out
+    counts = np.diff(np.append(edges, n))
+    ts_out = np.add.reduceat(timestamps, edges) // counts
+    values_out = np.add.reduceat(values, edges) / counts
+    return ts_out.astype(np.int64), values_out
+
+
+def downsample(
+    timestamps: np.ndarray, values: np.ndarray, max_points: int, method: str = "lttb"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    指定した手法で最大max_points点まで間引く
+
+    Args:
+        timestamps: 時刻順に並んだエポックミリ秒の配列
+        values: timestampsに対応する値の配列
+        max_points: 間引き後の最大点数
+        method: "lttb" / "minmax" / "avg"
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"未対応のダウンサンプリング手法です: {method}")
+    if len(values) <= max_points:
+        return timestamps, values
+
+    if method == "avg":
+        return bucket_average(timestamps, values, max_points)
+    if method == "minmax":
+        indices = minmax_indices(timestamps, values, max_points)
+    else:
+        indices = lttb_indices(timestamps, values, max_points)
+    return timestamps[indices], values[indices]
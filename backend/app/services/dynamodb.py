@@ -1,12 +1,77 @@
+import logging
 import os
+import threading
+import time
 import boto3
+from botocore.config import Config
 from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
 from dotenv import load_dotenv
 
+from .storage import DEFAULT_PROJECTION, TimeSeriesStorage
+
 load_dotenv()
 
-class DynamoDBService:
-    def __init__(self):
+logger = logging.getLogger(__name__)
+
+
+def _apply_projection(query_kwargs: Dict[str, Any], projection: Optional[tuple]) -> None:
+    """クエリ引数にProjectionExpressionを設定する"""
+    if not projection:
+        return
+    # 予約語と衝突しないよう属性名はプレースホルダー経由で指定
+    names = {f"#p{i}": name for i, name in enumerate(projection)}
+    query_kwargs['ProjectionExpression'] = ", ".join(names)
+    query_kwargs['ExpressionAttributeNames'] = names
+
+
+def _attribute_maps_to_arrays(items: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    低レベルクライアントのアイテム（属性マップ）を (エポックミリ秒int64, 値float64) の配列に変換
+
+    insert_dateの文字列（{'S': ...}）と数値の文字列表現（{'N': ...}）をnumpyに直接渡すため、
+    Decimalや1件ごとのdictを経由しない。
+    """
+    timestamps = np.array(
+        [item['insert_date']['S'] for item in items], dtype='datetime64[ms]'
+    ).astype(np.int64)
+    values = np.array([item['avg_value']['N'] for item in items], dtype=np.float64)
+    return timestamps, values
+
+
+class DynamoDBService(TimeSeriesStorage):
+    def __init__(
+        self,
+        max_pool_connections: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        table: Any = None,
+        table_name: str = 'aggdata_table',
+        client: Any = None,
+    ):
+        """
+        Args:
+            table_name: 集計データのテーブル名
+            table: 使用するテーブル。指定した場合はAWSに接続せずにこのオブジェクトの
+                query を呼ぶ（ベンチマーク・テスト用のスタンドインを渡す）
+            client: 配列での取得に使う低レベルクライアント。tableを指定した場合に
+                渡さなければ、配列での取得もtableのアイテムから作る
+        """
+        # /metricsで公開するクエリ統計
+        self.stats: Dict[str, float] = {
+            'queries': 0, 'pages': 0, 'items': 0,
+            'consumed_capacity_units': 0.0, 'errors': 0, 'seconds': 0.0,
+        }
+        self._stats_lock = threading.Lock()
+
+        self.table_name = table_name
+        if table is not None:
+            self.dynamodb = None
+            self.table = table
+            self.client = client
+            return
+
         # 環境変数から認証情報を取得
         aws_access_key_id = os.getenv('AWS_ACCESS_KEY_ID')
         aws_secret_access_key = os.getenv('AWS_SECRET_ACCESS_KEY')
@@ -21,33 +86,182 @@ class DynamoDBService:
         print(f"Region: {region_name}")
 
         try:
+            # 並行クエリ数に合わせてHTTPコネクションプールを確保
+            client_config = Config(
+                max_pool_connections=max_pool_connections,
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                retries={'max_attempts': 3, 'mode': 'adaptive'}
+            )
             self.dynamodb = boto3.resource(
                 'dynamodb',
                 aws_access_key_id=aws_access_key_id,
                 aws_secret_access_key=aws_secret_access_key,
-                region_name=region_name
+                region_name=region_name,
+                config=client_config
+            )
+            # resourceのクライアントは結果をDecimalに変換するハンドラーを持つため、
+            # 配列での取得用に変換なしの低レベルクライアントを別に作る
+            self.client = client or boto3.client(
+                'dynamodb',
+                aws_access_key_id=aws_access_key_id,
+                aws_secret_access_key=aws_secret_access_key,
+                region_name=region_name,
+                config=client_config
             )
             # テーブルの存在確認
-            self.table = self.dynamodb.Table('aggdata_table')
+            self.table = self.dynamodb.Table(table_name)
             self.table.load()  # テーブルの存在を確認
             print("DynamoDBテーブルに正常に接続しました。")
         except Exception as e:
             print(f"DynamoDB接続エラー: {str(e)}")
             raise
 
-    def get_data(self, data_type: str, start_date: str, end_date: str):
+    def _query(
+        self, query_kwargs: Dict[str, Any], query: Optional[Callable[..., Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Queryを1回実行し、ページ数・件数・消費キャパシティを集計する"""
+        start = time.perf_counter()
         try:
-            print(f"クエリパラメータ: data_type={data_type}, start_date={start_date}, end_date={end_date}")
-            response = self.table.query(
-                KeyConditionExpression='data_type = :type AND insert_date BETWEEN :start AND :end',
-                ExpressionAttributeValues={
-                    ':type': data_type,
-                    ':start': start_date,
-                    ':end': end_date
-                }
-            )
-            print(f"取得したデータ数: {len(response['Items'])}")
-            return response['Items']
+            response = (query or self.table.query)(ReturnConsumedCapacity='TOTAL', **query_kwargs)
+        except Exception:
+            with self._stats_lock:
+                self.stats['errors'] += 1
+            raise
+        capacity = (response.get('ConsumedCapacity') or {}).get('CapacityUnits', 0.0)
+        with self._stats_lock:
+            self.stats['pages'] += 1
+            self.stats['items'] += len(response.get('Items', []))
+            self.stats['consumed_capacity_units'] += capacity
+            self.stats['seconds'] += time.perf_counter() - start
+        return response
+
+    def _count_query(self) -> None:
+        with self._stats_lock:
+            self.stats['queries'] += 1
+
+    def iter_pages(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        期間内のデータをページ単位で遅延取得する
+
+        LastEvaluatedKeyを辿って1MBのページ上限を超える範囲も全件取得する。
+        limitを指定した場合は残り件数をLimitとしてDynamoDBに渡し、
+        必要な件数が揃った時点で以降のページは取得しない。
+        """
+        query_kwargs: Dict[str, Any] = {
+            'KeyConditionExpression': 'data_type = :type AND insert_date BETWEEN :start AND :end',
+            'ExpressionAttributeValues': {
+                ':type': data_type,
+                ':start': start_date,
+                ':end': end_date
+            },
+            'ScanIndexForward': ascending,
+        }
+        _apply_projection(query_kwargs, projection)
+        self._count_query()
+
+        remaining = limit
+        while remaining is None or remaining > 0:
+            if remaining is not None:
+                query_kwargs['Limit'] = remaining
+            response = self._query(query_kwargs)
+            items = response.get('Items', [])
+            if remaining is not None:
+                items = items[:remaining]
+                remaining -= len(items)
+            if items:
+                yield items
+
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            query_kwargs['ExclusiveStartKey'] = last_key
+
+    def get_latest(
+        self,
+        data_type: str,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        最新の1件を取得する
+
+        ソートキーの降順でLimit=1のクエリを発行するため、
+        期間の長さに関係なく1件分の読み込みで済む。
+        """
+        try:
+            query_kwargs: Dict[str, Any] = {
+                'KeyConditionExpression': 'data_type = :type',
+                'ExpressionAttributeValues': {':type': data_type},
+                'ScanIndexForward': False,
+                'Limit': 1,
+            }
+            _apply_projection(query_kwargs, projection)
+            self._count_query()
+            response = self._query(query_kwargs)
+            items = response.get('Items', [])
+            return items[0] if items else None
         except Exception as e:
-            print(f"DynamoDBクエリエラー: {str(e)}")
-            return [] 
\ No newline at end of file
+            logger.error(f"DynamoDB最新データ取得エラー: {str(e)}")
+            raise
+
+    def query_arrays(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        期間内のデータを時刻順の (エポックミリ秒int64, 値float64) の配列で取得する
+
+        低レベルクライアントのQueryで属性マップのまま受け取り、ページごとに配列へ変換する。
+        resource APIのようにavg_valueをDecimalに変換してからfloatに戻す処理が不要になる。
+        """
+        if self.client is None:
+            return super().query_arrays(data_type, start_date, end_date, limit=limit)
+
+        query_kwargs: Dict[str, Any] = {
+            'TableName': self.table_name,
+            'KeyConditionExpression': 'data_type = :type AND insert_date BETWEEN :start AND :end',
+            'ExpressionAttributeValues': {
+                ':type': {'S': data_type},
+                ':start': {'S': start_date},
+                ':end': {'S': end_date}
+            },
+            'ScanIndexForward': True,
+        }
+        _apply_projection(query_kwargs, DEFAULT_PROJECTION)
+        self._count_query()
+
+        timestamp_pages: List[np.ndarray] = []
+        value_pages: List[np.ndarray] = []
+        remaining = limit
+        while remaining is None or remaining > 0:
+            if remaining is not None:
+                query_kwargs['Limit'] = remaining
+            response = self._query(query_kwargs, self.client.query)
+            items = response.get('Items', [])
+            if remaining is not None:
+                items = items[:remaining]
+                remaining -= len(items)
+            if items:
+                timestamps, values = _attribute_maps_to_arrays(items)
+                timestamp_pages.append(timestamps)
+                value_pages.append(values)
+
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key:
+                break
+            query_kwargs['ExclusiveStartKey'] = last_key
+
+        if not timestamp_pages:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(timestamp_pages), np.concatenate(value_pages)
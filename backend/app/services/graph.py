@@ -1,12 +1,100 @@
+"""
+Plotlyによるグラフ生成サービス
+
+plotly.jsはページに埋め込まず `/assets/plotly.min.js` から一度だけ配信する。
+描画済みのHTMLは系列データのハッシュをキーにキャッシュし、点数の多い系列は
+LTTBで間引いたうえでWebGL描画の `Scattergl` に切り替える。
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import plotly
 import plotly.graph_objects as go
-import pandas as pd
-from datetime import datetime
+
+from .downsample import downsample
+
+# plotly.jsのURL（バージョンを含めてimmutableなキャッシュを可能にする）
+PLOTLY_JS_URL = f"/assets/plotly.min.js?v={plotly.__version__}"
+
+
+@lru_cache(maxsize=1)
+def plotly_js() -> Tuple[bytes, bytes, str]:
+    """
+    同梱のplotly.jsを取得（初回のみ生成してプロセス内で保持）
+
+    Returns:
+        (本体, gzip圧縮済みの本体, ETag) のタプル
+    """
+    from plotly.offline import get_plotlyjs
+
+    body = get_plotlyjs().encode("utf-8")
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+    return body, gzip.compress(body, compresslevel=6, mtime=0), etag
+
+
+def _series_arrays(data: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """insert_date/avg_value（またはtimestamp/value）の配列を時刻順で作成"""
+    time_key = "insert_date" if "insert_date" in data[0] else "timestamp"
+    value_key = "avg_value" if "avg_value" in data[0] else "value"
+    timestamps = np.array(
+        [item[time_key].rstrip("Z") for item in data], dtype="datetime64[ms]"
+    ).astype(np.int64)
+    values = np.array([item[value_key] for item in data], dtype=np.float64)
+    order = np.argsort(timestamps, kind="stable")
+    return timestamps[order], values[order]
+
 
 class GraphService:
+    def __init__(
+        self,
+        max_points: int = 2000,
+        webgl_threshold: int = 1000,
+        cache_entries: int = 32,
+    ):
+        self._max_points = max_points
+        self._webgl_threshold = webgl_threshold
+        self._cache_entries = cache_entries
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key: str) -> Optional[str]:
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+            return html
+
+    def _store(self, key: str, html: str) -> str:
+        with self._lock:
+            self._cache[key] = html
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_entries:
+                self._cache.popitem(last=False)
+        return html
+
     @staticmethod
-    def create_time_series_plot(data):
+    def _to_html(fig) -> str:
+        # plotly.jsはテンプレート側で読み込むため埋め込まない
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+    def create_time_series_plot(self, data):
+        """insert_date/avg_value（またはtimestamp/value）のレコードからグラフを生成"""
         if not data:
+            return self.plot_arrays(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        return self.plot_arrays(*_series_arrays(data))
+
+    def plot_arrays(self, timestamps: np.ndarray, values: np.ndarray) -> str:
+        """時刻順のエポックミリ秒・値の配列からグラフを生成"""
+        if not len(values):
             # 空のデータの場合、空のグラフを生成
+            html = self._cached("empty")
+            if html is not None:
+                return html
             fig = go.Figure()
             fig.update_layout(
                 title='データがありません',
@@ -22,25 +110,38 @@ class GraphService:
                     showarrow=False
                 )]
             )
-            return fig.to_html(full_html=False)
-            
-        df = pd.DataFrame(data)
-        df['insert_date'] = pd.to_datetime(df['insert_date'])
-        df = df.sort_values('insert_date')
-        
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=df['insert_date'],
-            y=df['avg_value'],
-            mode='lines+markers',
-            name='平均値'
-        ))
-        
+            return self._store("empty", self._to_html(fig))
+
+        digest = hashlib.sha1(timestamps.tobytes())
+        digest.update(values.tobytes())
+        key = digest.hexdigest()
+        html = self._cached(key)
+        if html is not None:
+            return html
+
+        if len(values) > self._webgl_threshold:
+            # 点数が多い場合は間引いてWebGLで描画する
+            timestamps, values = downsample(timestamps, values, self._max_points, "lttb")
+            trace = go.Scattergl(
+                x=timestamps.astype("datetime64[ms]"),
+                y=values,
+                mode='lines',
+                name='平均値'
+            )
+        else:
+            trace = go.Scatter(
+                x=timestamps.astype("datetime64[ms]"),
+                y=values,
+                mode='lines+markers',
+                name='平均値'
+            )
+
+        fig = go.Figure(trace)
         fig.update_layout(
             title='時系列データ',
             xaxis_title='日時',
             yaxis_title='平均値',
             template='plotly_white'
         )
-        
-        return fig.to_html(full_html=False) 
\ No newline at end of file
+
+        return self._store(key, self._to_html(fig))
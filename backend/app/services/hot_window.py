@@ -0,0 +1,376 @@
+"""
+直近期間のインメモリ時系列ストア（ホットウィンドウ）
+
+リクエストの大半は直近1〜30日を表示するため、data_typeごとに直近 window_days 日分を
+時刻順の (エポックミリ秒int64, 値float64) の配列としてプロセス内に保持し、
+範囲が収まるクエリは二分探索で求めたスライスだけで返す（ストレージには問い合わせない）。
+
+- 配列はdata_typeごとに max_points 点分を確保し、保持するのは最大 max_series 系列
+  （最も長く使われていない系列から破棄）なので、メモリ使用量はおおよそ
+  16バイト × max_points × max_series に収まる
+- バックグラウンドのスレッドが refresh_interval_seconds ごとに、
+  保持している最終時刻より新しいデータだけを末尾に追記する
+- ウィンドウの外にかかる範囲と、更新が滞っている系列はそのままストレージに問い合わせる
+- ウィンドウの期間内にデータがない系列（存在しない data_type を含む）はウィンドウを作らず、
+  その判定を refresh_interval_seconds の間保持してストレージに委ねる
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .local_store import _DATA_TYPE_PATTERN
+from .series import arrays_to_items, format_dates, to_epoch_ms
+from .storage import DEFAULT_PROJECTION, INGEST_END, TimeSeriesStorage
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# _absent_latestで保持していない（ストレージに問い合わせる必要がある）ことを表す値
+_NOT_CACHED = object()
+
+
+def compaction_start(timestamps: np.ndarray, window_ms: int, capacity: int) -> int:
+    """
+    配列が一杯になったときに残す先頭の位置
+
+    最終時刻から window_ms より古い点と、容量の3/4を超える古い点を捨てる
+    （詰め直しのたびに容量の1/4以上の空きを作る）。
+    """
+    return max(
+        int(np.searchsorted(timestamps, timestamps[-1] - window_ms)),
+        len(timestamps) - capacity * 3 // 4,
+    )
+
+
+class _Window:
+    """
+    1つのdata_typeの配列
+
+    追記は確保済みの配列の末尾に書き込み、読み手には (timestamps, values, covered_from)
+    のスナップショットを差し替えて公開する。読み手が持つスライスの範囲は書き換えず、
+    配列が一杯になったときは新しい配列へ詰め直すため、読み込みにロックは要らない。
+    """
+
+    def __init__(self, capacity: int, covered_from: int):
+        self._capacity = capacity
+        self._timestamps = np.empty(capacity, dtype=np.int64)
+        self._values = np.empty(capacity, dtype=np.float64)
+        self._length = 0
+        # covered_from（エポックミリ秒）以降のデータは全て保持している
+        self.snapshot: Tuple[np.ndarray, np.ndarray, int] = (
+            self._timestamps[:0], self._values[:0], covered_from
+        )
+        self._refreshed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def locked(self):
+        """追記・更新時に取得するロック"""
+        return self._lock
+
+    def mark_refreshed(self) -> None:
+        self._refreshed_at = time.monotonic()
+
+    def age(self) -> Optional[float]:
+        """最後に更新してからの秒数（未読み込みならNone）"""
+        return None if self._refreshed_at is None else time.monotonic() - self._refreshed_at
+
+    @property
+    def last(self) -> int:
+        """保持している最終時刻（データがなければcovered_fromの直前）"""
+        timestamps, _, covered_from = self.snapshot
+        return int(timestamps[-1]) if len(timestamps) else covered_from - 1
+
+    def append(self, timestamps: np.ndarray, values: np.ndarray, window_ms: int) -> int:
+        """
+        最終時刻より新しいデータを追記する（lockを取得して呼ぶ）
+
+        入り切らない場合は古い点を捨てて（compaction_start）新しい配列へ詰め直す。
+
+        Returns:
+            追記した件数
+        """
+        keep = timestamps > self.last
+        timestamps, values = timestamps[keep], values[keep]
+        count = len(timestamps)
+        if not count:
+            return 0
+
+        covered_from = self.snapshot[2]
+        if self._length + count <= self._capacity:
+            end = self._length + count
+            self._timestamps[self._length:end] = timestamps
+            self._values[self._length:end] = values
+            self._length = end
+        else:
+            merged_timestamps = np.concatenate([self._timestamps[:self._length], timestamps])
+            merged_values = np.concatenate([self._values[:self._length], values])
+            start = compaction_start(merged_timestamps, window_ms, self._capacity)
+            if start:
+                covered_from = int(merged_timestamps[start])
+            self._length = len(merged_timestamps) - start
+            self._timestamps = np.empty(self._capacity, dtype=np.int64)
+            self._values = np.empty(self._capacity, dtype=np.float64)
+            self._timestamps[:self._length] = merged_timestamps[start:]
+            self._values[:self._length] = merged_values[start:]
+
+        self.snapshot = (
+            self._timestamps[:self._length], self._values[:self._length], covered_from
+        )
+        return count
+
+
+class HotWindowStore(TimeSeriesStorage):
+    """直近 window_days 日分をメモリから返し、それ以外をストレージに委ねるストレージ"""
+
+    def __init__(
+        self,
+        source: TimeSeriesStorage,
+        window_days: int = 30,
+        max_points: int = 100000,
+        max_series: int = 16,
+        refresh_interval_seconds: float = 10.0,
+        page_size: int = 10000,
+    ):
+        """
+        Args:
+            source: 元のストレージ（DynamoDBServiceなど）
+            window_days: メモリに保持する日数（境界付近の範囲のために1日分多く保持する）
+            max_points: data_typeごとに保持する最大点数
+            max_series: 保持する最大系列数
+            refresh_interval_seconds: 新着データを取り込む間隔。この3倍以上更新できていない
+                系列はメモリから返さない
+            page_size: iter_pagesの1ページの件数
+        """
+        self.source = source
+        # 終了時刻が少し前の「直近window_days日」も収まるよう、1日分多く保持する
+        self._window_days = window_days + 1
+        self._window_ms = self._window_days * 86400 * 1000
+        self._max_points = max_points
+        self._max_series = max_series
+        self._refresh_interval = refresh_interval_seconds
+        self._page_size = page_size
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+        # ウィンドウを作らなかった系列: data_type -> (判定の有効期限（time.monotonic）, 確認した最新値)
+        self._absent: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self._guard = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # hits: メモリから返した回数, misses: ストレージに委ねた回数
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def _window_start(self) -> int:
+        """ウィンドウの開始時刻（エポックミリ秒）"""
+        start = datetime.now().replace(microsecond=0) - timedelta(days=self._window_days)
+        return to_epoch_ms(start.strftime(DATE_FORMAT))
+
+    def _has_recent_data(self, data_type: str) -> bool:
+        """
+        ウィンドウの期間内にデータがある系列か
+
+        ない場合は確認した最新値とともに refresh_interval_seconds の間その判定を保持し、
+        その間は同じ系列についてストレージに確認しない。
+        """
+        now = time.monotonic()
+        absent = self._absent.get(data_type)
+        if absent is not None and absent[0] > now:
+            return False
+        try:
+            latest = self.source.get_latest(data_type)
+        except Exception as e:
+            logger.warning(f"ホットウィンドウの系列を確認できません: data_type={data_type}, error={str(e)}")
+            return False
+        if latest is not None and to_epoch_ms(latest["insert_date"]) >= self._window_start():
+            self._absent.pop(data_type, None)
+            return True
+        for expired in [key for key, (until, _) in list(self._absent.items()) if until <= now]:
+            self._absent.pop(expired, None)
+        self._absent[data_type] = (now + self._refresh_interval, latest)
+        return False
+
+    def _absent_latest(self, data_type: str, projection: Optional[tuple]) -> Any:
+        """
+        ウィンドウを作らなかった系列について、判定時に確認した最新値を返す
+
+        保持していない・期限切れ・要求された属性を持たない場合は _NOT_CACHED。
+        """
+        absent = self._absent.get(data_type)
+        if absent is None or absent[0] <= time.monotonic():
+            return _NOT_CACHED
+        item = absent[1]
+        if item is None:
+            return None
+        names = projection or tuple(item)
+        if not all(name in item for name in names):
+            return _NOT_CACHED
+        return {name: item[name] for name in names}
+
+    def _create_window(self, data_type: str) -> Optional[_Window]:
+        """data_typeの空のウィンドウを作る（期間内にデータがないなど、保持しない場合はNone）"""
+        if not _DATA_TYPE_PATTERN.match(data_type) or not self._has_recent_data(data_type):
+            return None
+        return _Window(self._max_points, self._window_start())
+
+    def _window(self, data_type: str) -> Optional[_Window]:
+        """data_typeのウィンドウを取得（なければ直近window_days日分を読み込む）"""
+        with self._guard:
+            window = self._windows.get(data_type)
+            if window is not None:
+                self._windows.move_to_end(data_type)
+        if window is None:
+            # 作成時のストレージへの確認は、他の系列の読み込みを止めないようロックの外で行う
+            window = self._create_window(data_type)
+            if window is None:
+                return None
+            with self._guard:
+                existing = self._windows.get(data_type)
+                if existing is not None:
+                    # 同時に来た別のリクエストが先に作成済み
+                    window = existing
+                else:
+                    self._windows[data_type] = window
+                    while len(self._windows) > self._max_series:
+                        evicted, _ = self._windows.popitem(last=False)
+                        logger.info(f"ホットウィンドウから系列を破棄: data_type={evicted}")
+                self._windows.move_to_end(data_type)
+        if window.age() is None:
+            self._refresh_window(data_type, window, only_if_unloaded=True)
+        return window
+
+    def _is_fresh(self, window: _Window) -> bool:
+        """読み込み済みで、更新が滞っていないか"""
+        age = window.age()
+        return age is not None and age <= self._refresh_interval * 3
+
+    def _refresh_window(self, data_type: str, window: _Window, only_if_unloaded: bool = False) -> int:
+        """保持している最終時刻より新しいデータを取り込む（失敗時はログを出して保持中の値を使う）"""
+        with window.locked():
+            initial = window.age() is None
+            if only_if_unloaded and not initial:
+                # 同時に来た別のリクエストが読み込み済み
+                return 0
+            try:
+                timestamps, values = self.source.query_arrays(
+                    data_type, format_dates(np.array([window.last]))[0], INGEST_END
+                )
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                logger.warning(f"ホットウィンドウの更新に失敗: data_type={data_type}, error={str(e)}")
+                return 0
+            added = window.append(np.asarray(timestamps), np.asarray(values), self._window_ms)
+            window.mark_refreshed()
+            self.stats["refreshes"] += 1
+        if initial:
+            logger.info(f"ホットウィンドウを読み込み: data_type={data_type}, 件数={added}")
+        return added
+
+    def refresh(self) -> int:
+        """保持している全系列の新着データを取り込む"""
+        with self._guard:
+            windows = list(self._windows.items())
+        return sum(self._refresh_window(data_type, window) for data_type, window in windows)
+
+    def _slice(
+        self, data_type: str, start_date: str, end_date: str
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """範囲がウィンドウに収まればそのスライスを、収まらなければNoneを返す"""
+        start_ms = to_epoch_ms(start_date)
+        # 直近window_days日に収まらない範囲のためにウィンドウを読み込むことはしない
+        if start_ms < self._window_start():
+            self.stats["misses"] += 1
+            return None
+        window = self._window(data_type)
+        if window is None:
+            self.stats["misses"] += 1
+            return None
+        timestamps, values, covered_from = window.snapshot
+        if start_ms < covered_from or not self._is_fresh(window):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        lo = int(np.searchsorted(timestamps, start_ms, side="left"))
+        hi = int(np.searchsorted(timestamps, to_epoch_ms(end_date), side="right"))
+        return timestamps[lo:hi], values[lo:hi]
+
+    def query_arrays(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        found = self._slice(data_type, start_date, end_date)
+        if found is None:
+            return self.source.query_arrays(data_type, start_date, end_date, limit=limit)
+        timestamps, values = found
+        if limit is not None:
+            timestamps, values = timestamps[:limit], values[:limit]
+        return timestamps, values
+
+    def iter_pages(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        found = self._slice(data_type, start_date, end_date)
+        if found is None:
+            yield from self.source.iter_pages(
+                data_type, start_date, end_date,
+                limit=limit, ascending=ascending, projection=projection
+            )
+            return
+        timestamps, values = found
+        if not ascending:
+            timestamps, values = timestamps[::-1], values[::-1]
+        if limit is not None:
+            timestamps, values = timestamps[:limit], values[:limit]
+        for offset in range(0, len(timestamps), self._page_size):
+            end = offset + self._page_size
+            yield arrays_to_items(data_type, timestamps[offset:end], values[offset:end], projection)
+
+    def get_latest(
+        self,
+        data_type: str,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Optional[Dict[str, Any]]:
+        window = self._window(data_type)
+        if window is None:
+            # ウィンドウを作らなかった系列は、その判定で取得した最新値を使う（同じ1件を読み直さない）
+            latest = self._absent_latest(data_type, projection)
+            if latest is not _NOT_CACHED:
+                self.stats["misses"] += 1
+                return latest
+        snapshot = window.snapshot if window is not None and self._is_fresh(window) else None
+        if snapshot is None or not len(snapshot[0]):
+            # ウィンドウに最新値がない（期間内にデータがない・更新できていない）場合
+            self.stats["misses"] += 1
+            return self.source.get_latest(data_type, projection=projection)
+        self.stats["hits"] += 1
+        timestamps, values, _ = snapshot
+        return arrays_to_items(data_type, timestamps[-1:], values[-1:], projection)[0]
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"ホットウィンドウの更新処理でエラー: {str(e)}")
+
+    def start(self) -> None:
+        """新着データを取り込むバックグラウンドスレッドを開始"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hot-window", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """バックグラウンドスレッドを止める"""
+        self._stop.set()
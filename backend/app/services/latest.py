@@ -0,0 +1,111 @@
+"""
+data_typeごとの最新値キャッシュ
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+LatestFetcher = Callable[[str], Optional[Dict[str, Any]]]
+
+
+@dataclass
+class _LatestEntry:
+    item: Optional[Dict[str, Any]]
+    fetched_at: float
+
+
+class LatestValueCache:
+    """
+    最新値をプロセス内に保持し、期限切れ時はバックグラウンドで更新するキャッシュ
+
+    初回のみ同期的に取得し、以降はTTLを過ぎても保持中の値を即座に返しつつ
+    裏で再取得する。同じdata_typeの更新は同時に1つしか走らない。
+    """
+
+    def __init__(
+        self,
+        fetcher: LatestFetcher,
+        ttl_seconds: float = 30.0,
+        max_workers: int = 4,
+    ):
+        self._fetcher = fetcher
+        self._ttl = ttl_seconds
+        self._entries: Dict[str, _LatestEntry] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="latest-refresh"
+        )
+
+    def _fetch(self, data_type: str) -> Optional[Dict[str, Any]]:
+        item = self._fetcher(data_type)
+        with self._lock:
+            self._entries[data_type] = _LatestEntry(item, time.monotonic())
+        return item
+
+    def _refresh_in_background(self, data_type: str) -> None:
+        with self._lock:
+            if data_type in self._refreshing:
+                return
+            self._refreshing.add(data_type)
+
+        def run():
+            try:
+                self._fetch(data_type)
+            except Exception as e:
+                # 失敗時は保持中の値をそのまま使い続ける
+                logger.warning(f"最新値のバックグラウンド更新に失敗: data_type={data_type}, error={str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(data_type)
+
+        self._executor.submit(run)
+
+    def get(self, data_type: str) -> Optional[Dict[str, Any]]:
+        """最新値を取得する"""
+        entry = self._entries.get(data_type)
+        if entry is None:
+            self.stats["misses"] += 1
+            return self._fetch(data_type)
+        if time.monotonic() - entry.fetched_at > self._ttl:
+            self.stats["stale_hits"] += 1
+            self._refresh_in_background(data_type)
+        else:
+            self.stats["hits"] += 1
+        return entry.item
+
+    def get_many(self, data_types: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        複数のdata_typeの最新値をまとめて取得する（未取得分は並行して取得）
+
+        取得に失敗したdata_typeはNoneとし、他のdata_typeの結果は返す。
+        """
+        data_types = list(dict.fromkeys(data_types))
+        missing = [t for t in data_types if t not in self._entries]
+        futures = {t: self._executor.submit(self._fetch, t) for t in missing}
+        self.stats["misses"] += len(missing)
+        result = {}
+        for data_type in data_types:
+            try:
+                if data_type in futures:
+                    result[data_type] = futures[data_type].result()
+                else:
+                    result[data_type] = self.get(data_type)
+            except Exception as e:
+                logger.error(f"最新値の取得に失敗: data_type={data_type}, error={str(e)}")
+                result[data_type] = None
+        return result
+
+    def invalidate(self, data_type: Optional[str] = None) -> None:
+        """キャッシュを破棄する"""
+        with self._lock:
+            if data_type is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(data_type, None)
@@ -0,0 +1,116 @@
+"""
+新着データのライブ配信ハブ
+
+購読者（SSEの接続）がいるdata_typeごとに、ワーカー内で1つだけポーリングタスクを動かし、
+前回以降に届いたデータを全購読者のキューへ配る。ストレージへの読み込みは
+購読者数に関係なく「data_typeごとに poll_interval_seconds に1回、新着分だけ」になる。
+
+ハブとポーリングタスクはイベントループ上でのみ操作するため、ロックは使わない。
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .storage import INGEST_END
+
+logger = logging.getLogger(__name__)
+
+# 購読者のキューに入る (data_type, アイテム)
+Reading = Tuple[str, Dict[str, Any]]
+
+
+class LiveHub:
+    """data_typeごとの共有ポーリングと購読者への配信"""
+
+    def __init__(self, source, poll_interval_seconds: float = 10.0, max_queue: int = 100):
+        """
+        Args:
+            source: get_latest / query_items を持つ非同期ストレージ（AsyncDynamoDBService）
+            poll_interval_seconds: 新着データを確認する間隔
+            max_queue: 購読者ごとのキューの上限（溢れた場合は古いものから捨てる）
+        """
+        self._source = source
+        self._interval = poll_interval_seconds
+        self._max_queue = max_queue
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"polls": 0, "readings": 0, "dropped": 0}
+
+    @property
+    def subscriber_count(self) -> int:
+        """接続中の購読者数（data_typeごとの延べ数）"""
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, data_types: Iterable[str]) -> asyncio.Queue:
+        """
+        data_typesの新着データを受け取るキューを登録する
+
+        既に取得済みの最新値があればすぐにキューへ入れる。
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._max_queue)
+        for data_type in dict.fromkeys(data_types):
+            self._subscribers.setdefault(data_type, set()).add(queue)
+            if data_type in self._latest:
+                self._put(queue, (data_type, self._latest[data_type]))
+            if data_type not in self._pollers:
+                self._pollers[data_type] = asyncio.create_task(self._poll(data_type))
+        return queue
+
+    def unsubscribe(self, data_types: Iterable[str], queue: asyncio.Queue) -> None:
+        """キューの登録を解除し、購読者がいなくなったdata_typeのポーリングを止める"""
+        for data_type in dict.fromkeys(data_types):
+            queues = self._subscribers.get(data_type)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[data_type]
+                self._latest.pop(data_type, None)
+                poller = self._pollers.pop(data_type, None)
+                if poller is not None:
+                    poller.cancel()
+
+    def _put(self, queue: asyncio.Queue, reading: Reading) -> None:
+        # 読み出しが追いつかない購読者のために他の購読者やポーリングを待たせない
+        if queue.full():
+            queue.get_nowait()
+            self.stats["dropped"] += 1
+        queue.put_nowait(reading)
+
+    def _publish(self, data_type: str, items: List[Dict[str, Any]]) -> None:
+        self._latest[data_type] = items[-1]
+        self.stats["readings"] += len(items)
+        for queue in self._subscribers.get(data_type, ()):
+            for item in items:
+                self._put(queue, (data_type, item))
+
+    async def _fetch_new(self, data_type: str, last: Optional[str]) -> List[Dict[str, Any]]:
+        """lastより新しいデータ（初回は最新の1件）を取得"""
+        if last is None:
+            item = await self._source.get_latest(data_type)
+            return [item] if item else []
+        items = await self._source.query_items(data_type, last, INGEST_END)
+        # BETWEENは境界を含むため、配信済みの行を除外
+        return [item for item in items if item["insert_date"] > last]
+
+    async def _poll(self, data_type: str) -> None:
+        last: Optional[str] = None
+        while True:
+            self.stats["polls"] += 1
+            try:
+                items = await self._fetch_new(data_type, last)
+                if items:
+                    last = items[-1]["insert_date"]
+                    self._publish(data_type, items)
+            except Exception as e:
+                logger.warning(f"ライブ配信用のデータ取得に失敗: data_type={data_type}, error={str(e)}")
+            await asyncio.sleep(self._interval)
+
+    def close(self) -> None:
+        """全てのポーリングを止める"""
+        for poller in self._pollers.values():
+            poller.cancel()
+        self._pollers.clear()
+        self._subscribers.clear()
+        self._latest.clear()
@@ -0,0 +1,289 @@
+"""
+ローカルの列指向時系列ストア
+
+data_typeごとに insert_date のエポックミリ秒（int64）と avg_value（float64）を
+別々のファイルへ追記専用で保存し、np.memmap で読み出す。時刻の列は昇順なので
+範囲クエリは二分探索（searchsorted）で位置を求め、memmapのスライスを
+コピーせずに返す。
+
+DynamoDBの新着分を同期する読み込みレプリカ（LocalReplica）としても、
+オンプレミスのゲートウェイでの主ストア（LocalSeriesStore単体）としても使える。
+"""
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .series import arrays_to_items, format_dates, items_to_arrays, to_epoch_ms
+from .storage import BOOTSTRAP_START, DEFAULT_PROJECTION, INGEST_END, TimeSeriesStorage
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス間のロックを行わない
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FILE = "timestamp.i64"
+VALUE_FILE = "value.f64"
+LOCK_FILE = ".lock"
+
+# data_typeはディレクトリ名になるため、パス区切りなどを含む名前は受け付けない
+_DATA_TYPE_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+_EMPTY_TIMESTAMPS = np.empty(0, dtype=np.int64)
+_EMPTY_VALUES = np.empty(0, dtype=np.float64)
+
+
+@contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """複数ワーカーからの同時追記を防ぐプロセス間ロック"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class _Series:
+    """1つのdata_typeの列ファイルとそのmemmap"""
+
+    def __init__(self, directory: str):
+        self._directory = directory
+        self._timestamp_path = os.path.join(directory, TIMESTAMP_FILE)
+        self._value_path = os.path.join(directory, VALUE_FILE)
+        self._sizes: Optional[Tuple[int, int]] = None
+        self._arrays: Tuple[np.ndarray, np.ndarray] = (_EMPTY_TIMESTAMPS, _EMPTY_VALUES)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (timestamps, values) のmemmap
+
+        ファイルサイズが変わっていれば（他のプロセスの追記を含めて）再マップする。
+        書き込み途中で列の長さが揃っていない場合は短い方に合わせる。
+        """
+        sizes = (self._file_size(self._timestamp_path), self._file_size(self._value_path))
+        with self._lock:
+            if sizes != self._sizes:
+                length = min(sizes) // 8
+                if length:
+                    self._arrays = (
+                        np.memmap(self._timestamp_path, dtype=np.int64, mode="r", shape=(length,)),
+                        np.memmap(self._value_path, dtype=np.float64, mode="r", shape=(length,)),
+                    )
+                else:
+                    self._arrays = (_EMPTY_TIMESTAMPS, _EMPTY_VALUES)
+                self._sizes = sizes
+            return self._arrays
+
+    def append(self, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """
+        最終時刻より新しいデータだけを追記する
+
+        Returns:
+            追記した件数
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        os.makedirs(self._directory, exist_ok=True)
+        with _file_lock(os.path.join(self._directory, LOCK_FILE)):
+            current, _ = self.arrays()
+            length = len(current)
+            last = int(current[-1]) if length else np.iinfo(np.int64).min
+            # 既存の最終時刻以前と、入力内で時刻が増えていない行は捨てる
+            previous = np.maximum.accumulate(np.r_[last, timestamps[:-1]]) if len(timestamps) else timestamps
+            keep = timestamps > previous
+            timestamps, values = timestamps[keep], values[keep]
+            if not len(timestamps):
+                return 0
+
+            # 前回の書き込みが途中で止まっていた場合は揃っている長さまで切り詰める
+            for path in (self._value_path, self._timestamp_path):
+                with open(path, "ab") as f:
+                    f.truncate(length * 8)
+            # 値を先に書くので、読み手（短い方に合わせる）が値のない時刻を見ることはない
+            with open(self._value_path, "ab") as f:
+                f.write(values.tobytes())
+            with open(self._timestamp_path, "ab") as f:
+                f.write(timestamps.tobytes())
+            return len(timestamps)
+
+
+class LocalSeriesStore(TimeSeriesStorage):
+    """data_typeごとの列ファイルをmemmapで読み出すローカルストア"""
+
+    def __init__(self, root: str, page_size: int = 10000):
+        """
+        Args:
+            root: 列ファイルを置くディレクトリ（data_typeごとにサブディレクトリを作る）
+            page_size: iter_pagesの1ページの件数
+        """
+        self._root = root
+        self._page_size = page_size
+        self._series_by_type: Dict[str, _Series] = {}
+        self._guard = threading.Lock()
+
+    def _series(self, data_type: str) -> _Series:
+        if not _DATA_TYPE_PATTERN.match(data_type):
+            raise ValueError(f"不正なdata_typeです: {data_type}")
+        with self._guard:
+            series = self._series_by_type.get(data_type)
+            if series is None:
+                series = self._series_by_type[data_type] = _Series(os.path.join(self._root, data_type))
+            return series
+
+    def query_arrays(
+        self, data_type: str, start_date: str, end_date: str, limit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        期間内（両端を含む）の (timestamps, values) を返す
+
+        戻り値はmemmapのスライス（ビュー）なので、件数に関係なくコピーは発生しない。
+        """
+        timestamps, values = self._series(data_type).arrays()
+        lo = int(np.searchsorted(timestamps, to_epoch_ms(start_date), side="left"))
+        hi = int(np.searchsorted(timestamps, to_epoch_ms(end_date), side="right"))
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return timestamps[lo:hi], values[lo:hi]
+
+    def append(self, data_type: str, timestamps: np.ndarray, values: np.ndarray) -> int:
+        """時刻順のデータを追記する（保存済みの最終時刻以前の行は無視する）"""
+        return self._series(data_type).append(timestamps, values)
+
+    def append_items(self, data_type: str, items: List[Dict[str, Any]]) -> int:
+        """insert_date / avg_value を持つアイテムを追記する"""
+        if not items:
+            return 0
+        timestamps, values = items_to_arrays(items)
+        return self.append(data_type, timestamps, values)
+
+    def latest_date(self, data_type: str) -> Optional[str]:
+        """保存済みの最終時刻（データがなければNone）"""
+        timestamps, _ = self._series(data_type).arrays()
+        return format_dates(timestamps[-1:])[0] if len(timestamps) else None
+
+    def iter_pages(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        timestamps, values = self.query_arrays(data_type, start_date, end_date)
+        if not ascending:
+            timestamps, values = timestamps[::-1], values[::-1]
+        if limit is not None:
+            timestamps, values = timestamps[:limit], values[:limit]
+        for offset in range(0, len(timestamps), self._page_size):
+            end = offset + self._page_size
+            yield arrays_to_items(data_type, timestamps[offset:end], values[offset:end], projection)
+
+    def get_latest(
+        self,
+        data_type: str,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Optional[Dict[str, Any]]:
+        timestamps, values = self._series(data_type).arrays()
+        if not len(timestamps):
+            return None
+        return arrays_to_items(data_type, timestamps[-1:], values[-1:], projection)[0]
+
+
+class LocalReplica(TimeSeriesStorage):
+    """
+    プライマリ（DynamoDB）の新着分をローカルストアへ同期しながら読む読み込みレプリカ
+
+    期間クエリはsync_interval_secondsごとに差分同期したローカルストアから返す。
+    最新値は鮮度が重要で1件の読み込みで済むため、常にプライマリから取得する。
+    """
+
+    def __init__(
+        self,
+        primary: TimeSeriesStorage,
+        local: LocalSeriesStore,
+        sync_interval_seconds: float = 30.0,
+    ):
+        self.primary = primary
+        self.local = local
+        self._sync_interval = sync_interval_seconds
+        self._last_sync: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, data_type: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(data_type, threading.Lock())
+
+    def sync(self, data_type: str, force: bool = False) -> int:
+        """
+        ローカルの最終時刻以降のデータをプライマリから取り込む
+
+        プライマリに接続できない場合はログを出して同期済みの範囲だけで応答する。
+
+        Returns:
+            新たに取り込んだ件数
+        """
+        with self._lock_for(data_type):
+            last = self._last_sync.get(data_type)
+            if not force and last is not None and time.monotonic() - last < self._sync_interval:
+                return 0
+
+            start = self.local.latest_date(data_type) or BOOTSTRAP_START
+            synced = 0
+            try:
+                for page in self.primary.iter_pages(data_type, start, INGEST_END):
+                    synced += self.local.append_items(data_type, page)
+            except Exception as e:
+                logger.error(f"レプリカ同期エラー: data_type={data_type}, {str(e)}")
+            self._last_sync[data_type] = time.monotonic()
+            if synced:
+                logger.info(f"レプリカ同期: data_type={data_type}, 取り込み件数={synced}")
+            return synced
+
+    def query_arrays(
+        self, data_type: str, start_date: str, end_date: str, limit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        self.sync(data_type)
+        return self.local.query_arrays(data_type, start_date, end_date, limit=limit)
+
+    def iter_pages(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        self.sync(data_type)
+        yield from self.local.iter_pages(
+            data_type, start_date, end_date,
+            limit=limit, ascending=ascending, projection=projection
+        )
+
+    def get_latest(
+        self,
+        data_type: str,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Optional[Dict[str, Any]]:
+        return self.primary.get_latest(data_type, projection=projection)
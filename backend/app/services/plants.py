@@ -0,0 +1,137 @@
+"""
+植物情報レジストリ
+
+植物情報のJSONファイルを一度だけ読み込み、id・device_id・locationで
+索引を作って保持する。ファイルの更新時刻が変わった場合のみ再読み込みする。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ファイルが読めない場合のデフォルトデータ
+DEFAULT_PLANTS = [
+    {
+        "id": "plant-001",
+        "name": "バジル",
+        "species": "Ocimum basilicum",
+        "location": "温室A",
+        "device_id": "sensor_001",
+        "created_at": "2025-01-01T00:00:00Z",
+        "updated_at": "2025-01-01T00:00:00Z",
+        "thresholds": {
+            "temperature": {"min": 18, "max": 28},
+            "pH": {"min": 6.0, "max": 7.5}
+        }
+    }
+]
+
+
+class _Snapshot:
+    """読み込み済みの植物情報と索引"""
+
+    def __init__(self, plants: List[Dict[str, Any]]):
+        self.plants = plants
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_device: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_location: Dict[str, List[Dict[str, Any]]] = {}
+        # data_typeごとの (min, max) を事前に解決しておく
+        self.thresholds: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        for plant in plants:
+            self.by_id[plant["id"]] = plant
+            self.by_device.setdefault(plant.get("device_id"), []).append(plant)
+            self.by_location.setdefault(plant.get("location"), []).append(plant)
+            self.thresholds[plant["id"]] = {
+                data_type: (float(threshold["min"]), float(threshold["max"]))
+                for data_type, threshold in (plant.get("thresholds") or {}).items()
+            }
+
+
+class PlantRegistry:
+    """植物情報のキャッシュ付きレジストリ"""
+
+    def __init__(self, path: str, check_interval_seconds: float = 1.0):
+        self._path = path
+        self._check_interval = check_interval_seconds
+        self._lock = threading.Lock()
+        self._mtime_ns: Optional[int] = None
+        self._checked_at = 0.0
+        self._snapshot = _Snapshot(DEFAULT_PLANTS)
+
+    @staticmethod
+    def _parse(raw: Any, mtime_ns: int) -> List[Dict[str, Any]]:
+        """単一の植物・植物の配列・{"plants": [...]} のいずれの形式も受け付ける"""
+        if isinstance(raw, dict):
+            plants = raw.get("plants", [raw])
+        else:
+            plants = raw
+        updated_at = datetime.fromtimestamp(mtime_ns / 1e9, tz=timezone.utc)
+        default_updated_at = updated_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+        for plant in plants:
+            plant.setdefault("updated_at", default_updated_at)
+        return plants
+
+    def _refresh(self) -> _Snapshot:
+        """必要な場合のみファイルを再読み込みして最新のスナップショットを返す"""
+        now = time.monotonic()
+        if now - self._checked_at < self._check_interval:
+            return self._snapshot
+
+        with self._lock:
+            if now - self._checked_at < self._check_interval:
+                return self._snapshot
+            self._checked_at = now
+            try:
+                mtime_ns = os.stat(self._path).st_mtime_ns
+                if mtime_ns != self._mtime_ns:
+                    with open(self._path, "r", encoding="utf-8") as f:
+                        plants = self._parse(json.load(f), mtime_ns)
+                    self._snapshot = _Snapshot(plants)
+                    self._mtime_ns = mtime_ns
+                    logger.info(f"植物情報を読み込みました: {len(plants)}件")
+            except Exception as e:
+                # 読み込みに失敗した場合は保持中のデータ（初回はデフォルト）を使う
+                logger.error(f"植物情報の読み込みエラー: {str(e)}")
+            return self._snapshot
+
+    def list(
+        self,
+        location: Optional[str] = None,
+        device_id: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        条件に合う植物を取得
+
+        Returns:
+            (ページ内の植物, 条件に合う総件数) のタプル
+        """
+        snapshot = self._refresh()
+        if device_id is not None:
+            plants = snapshot.by_device.get(device_id, [])
+            if location is not None:
+                plants = [p for p in plants if p.get("location") == location]
+        elif location is not None:
+            plants = snapshot.by_location.get(location, [])
+        else:
+            plants = snapshot.plants
+        end = None if limit is None else offset + limit
+        return plants[offset:end], len(plants)
+
+    def get(self, plant_id: str) -> Optional[Dict[str, Any]]:
+        """IDで植物を取得"""
+        return self._refresh().by_id.get(plant_id)
+
+    def by_device(self, device_id: str) -> List[Dict[str, Any]]:
+        """デバイスIDに紐づく植物を取得"""
+        return self._refresh().by_device.get(device_id, [])
+
+    def thresholds(self, plant_id: str) -> Dict[str, Tuple[float, float]]:
+        """植物のdata_typeごとの閾値 (min, max) を取得"""
+        return self._refresh().thresholds.get(plant_id, {})
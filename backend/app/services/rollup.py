@@ -0,0 +1,441 @@
+"""
+時間バケット単位の集計（ロールアップ）サービス
+
+DynamoDBの生データを時・日・週・月ごとの count/sum/min/max に集計して
+ローカルのSQLiteに保存する。集計はデータ種別ごとのウォーターマーク以降に
+追加されたデータだけを取り込んで差分更新するため、長期間のサマリーも
+バケット数ぶんの行を読むだけで返せる。
+
+バケットには偏差平方和（M2）・計測時間・分位点スケッチ（sketch.py）も保存する。
+いずれもマージできるため、標準偏差・p5/p50/p95・しきい値超過時間も
+元データを読み直さずにバケットの合成だけで求まる（値は近似）。
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .series import format_dates, items_to_arrays, to_epoch_ms
+from .sketch import QuantileSketch, merge_moments
+from .storage import BOOTSTRAP_START, INGEST_END
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PERIODS = ("hour", "day", "week", "month")
+
+# 1970-01-01は木曜日のため、月曜始まりの週に揃えるためのオフセット（日）
+_WEEK_OFFSET_DAYS = 3
+
+# 1回の計測が代表する時間の上限（秒）。これより長い間隔は欠測とみなし、上限までしか数えない
+MAX_READING_GAP_SECONDS = 900
+
+# バケット1件: (開始時刻, count, sum, min, max, M2, 計測時間（秒）, 分位点スケッチ)
+BucketRow = Tuple[str, int, float, float, float, float, float, bytes]
+
+
+def bucket_starts(timestamps: np.ndarray, period: str) -> np.ndarray:
+    """
+    エポックミリ秒の配列を集計期間の開始時刻（datetime64[s]）に変換
+
+    週は月曜始まり、月は1日始まりで揃える。
+    """
+    ts = timestamps.astype("datetime64[ms]")
+    if period == "hour":
+        return ts.astype("datetime64[h]").astype("datetime64[s]")
+    if period == "day":
+        return ts.astype("datetime64[D]").astype("datetime64[s]")
+    if period == "week":
+        days = ts.astype("datetime64[D]").astype(np.int64)
+        monday = (days + _WEEK_OFFSET_DAYS) // 7 * 7 - _WEEK_OFFSET_DAYS
+        return monday.astype("datetime64[D]").astype("datetime64[s]")
+    if period == "month":
+        return ts.astype("datetime64[M]").astype("datetime64[s]")
+    raise ValueError(f"未対応の集計期間です: {period}")
+
+
+def aggregate_buckets(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    period: str,
+    previous_ms: Optional[int] = None,
+) -> List[BucketRow]:
+    """
+    時刻順の配列をバケットごとに集計
+
+    各計測は直前の計測からの時間（MAX_READING_GAP_SECONDSまで）を代表するものとして
+    計測時間に数える。
+
+    Args:
+        previous_ms: 直前に取り込んだ計測の時刻（エポックミリ秒）。Noneなら先頭の計測は0秒
+
+    Returns:
+        BucketRow のリスト
+    """
+    if len(values) == 0:
+        return []
+    starts = bucket_starts(timestamps, period)
+    # 時刻順に並んでいるので、バケットの切り替わり位置で分割できる
+    edges = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    bounds = np.append(edges, len(values))
+    counts = np.diff(bounds)
+    sums = np.add.reduceat(values, edges)
+    mins = np.minimum.reduceat(values, edges)
+    maxs = np.maximum.reduceat(values, edges)
+    # バケット内の平均を引いてから二乗する（Welford法と同じく桁落ちを避ける）
+    deviations = values - np.repeat(sums / counts, counts)
+    m2s = np.add.reduceat(deviations * deviations, edges)
+    previous = np.r_[timestamps[0] if previous_ms is None else previous_ms, timestamps[:-1]]
+    durations = np.minimum((timestamps - previous) / 1000.0, MAX_READING_GAP_SECONDS)
+    seconds = np.add.reduceat(durations, edges)
+    sketches = [
+        QuantileSketch.from_values(values[lo:hi]).to_bytes()
+        for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+    ]
+    labels = np.datetime_as_string(starts[edges], unit="s")
+    return list(zip(
+        labels.tolist(), counts.tolist(), sums.tolist(), mins.tolist(), maxs.tolist(),
+        m2s.tolist(), seconds.tolist(), sketches
+    ))
+
+
+def _combine_rows(label: str, rows: List[BucketRow]) -> BucketRow:
+    """複数の集計を開始時刻labelの1つのバケットにまとめる"""
+    count, _, m2 = merge_moments((row[1], row[2] / row[1], row[5]) for row in rows)
+    sketch = QuantileSketch.merge([QuantileSketch.from_bytes(row[7]) for row in rows])
+    return (
+        label, count, sum(row[2] for row in rows), min(row[3] for row in rows),
+        max(row[4] for row in rows), m2, sum(row[6] for row in rows), sketch.to_bytes(),
+    )
+
+
+def _merge_rows(old: BucketRow, new: BucketRow) -> BucketRow:
+    """同じバケットの集計を1つにまとめる"""
+    return _combine_rows(old[0], [old, new])
+
+
+def _floor_ms(ms: int, period: str) -> int:
+    """エポックミリ秒を集計期間の開始時刻に切り下げる"""
+    return int(bucket_starts(np.array([ms]), period)[0].astype("datetime64[ms]").astype(np.int64))
+
+
+def _ceil_ms(ms: int, period: str) -> int:
+    """エポックミリ秒を次の集計期間の開始時刻に切り上げる（境界ちょうどならそのまま）"""
+    floor = _floor_ms(ms, period)
+    if floor == ms:
+        return ms
+    start = np.datetime64(floor, "ms")
+    if period == "month":
+        following = (start.astype("datetime64[M]") + 1).astype("datetime64[ms]")
+    else:
+        following = start + np.timedelta64({"hour": 1, "day": 24, "week": 168}[period], "h")
+    return int(following.astype(np.int64))
+
+
+def _label(ms: int) -> str:
+    """エポックミリ秒をバケット開始時刻の形式（秒単位のISO形式）に変換"""
+    return np.datetime_as_string(np.datetime64(ms, "ms"), unit="s")
+
+
+class RollupStore:
+    """ロールアップを保存するSQLiteストア"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(rollups)")}
+            if columns and "sketch" not in columns:
+                # 統計量の列がない古いロールアップは、ウォーターマークごと消して作り直す
+                logger.warning("ロールアップの形式が古いため、全期間を再集計します")
+                self._conn.execute("DROP TABLE rollups")
+                self._conn.execute("DROP TABLE IF EXISTS watermarks")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rollups (
+                    data_type TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    bucket_start TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    sum REAL NOT NULL,
+                    min REAL NOT NULL,
+                    max REAL NOT NULL,
+                    m2 REAL NOT NULL,
+                    seconds REAL NOT NULL,
+                    sketch BLOB NOT NULL,
+                    PRIMARY KEY (data_type, period, bucket_start)
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    data_type TEXT PRIMARY KEY,
+                    last_insert_date TEXT NOT NULL
+                )
+                """
+            )
+
+    def get_watermark(self, data_type: str) -> Optional[str]:
+        """取り込み済みの最新insert_dateを取得"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_insert_date FROM watermarks WHERE data_type = ?",
+                (data_type,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def merge(
+        self,
+        data_type: str,
+        buckets: Dict[str, List[BucketRow]],
+        previous_watermark: Optional[str],
+        watermark: str,
+    ) -> bool:
+        """
+        バケット集計を既存の値にマージし、ウォーターマークを進める
+
+        M2とスケッチはSQLでは合成できないため、既存の行を読んでPython側でまとめる。
+        同じトランザクションで更新するため、途中で失敗しても二重計上されない。
+        他のワーカーが先に同じ範囲を取り込んでいた（ウォーターマークが変わっていた）場合は
+        何もせずFalseを返す。
+        """
+        with self._lock, self._conn:
+            # 確認から更新までを他のプロセスの書き込みと排他にする
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT last_insert_date FROM watermarks WHERE data_type = ?",
+                (data_type,),
+            ).fetchone()
+            if (row[0] if row else None) != previous_watermark:
+                return False
+            for period, rows in buckets.items():
+                if not rows:
+                    continue
+                existing = {
+                    row[0]: row
+                    for row in self._conn.execute(
+                        """
+                        SELECT bucket_start, count, sum, min, max, m2, seconds, sketch FROM rollups
+                        WHERE data_type = ? AND period = ? AND bucket_start BETWEEN ? AND ?
+                        """,
+                        (data_type, period, rows[0][0], rows[-1][0]),
+                    )
+                }
+                merged = [
+                    _merge_rows(existing[row[0]], row) if row[0] in existing else row
+                    for row in rows
+                ]
+                self._conn.executemany(
+                    """
+                    INSERT OR REPLACE INTO rollups
+                        (data_type, period, bucket_start, count, sum, min, max, m2, seconds, sketch)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [(data_type, period, *row) for row in merged],
+                )
+            self._conn.execute(
+                """
+                INSERT INTO watermarks (data_type, last_insert_date) VALUES (?, ?)
+                ON CONFLICT (data_type) DO UPDATE SET last_insert_date = excluded.last_insert_date
+                """,
+                (data_type, watermark),
+            )
+        return True
+
+    def get_buckets(
+        self, data_type: str, period: str, start: str, end: str
+    ) -> List[BucketRow]:
+        """バケット開始時刻がstart〜endの範囲にある集計を時刻順に取得"""
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT bucket_start, count, sum, min, max, m2, seconds, sketch FROM rollups
+                WHERE data_type = ? AND period = ? AND bucket_start BETWEEN ? AND ?
+                ORDER BY bucket_start
+                """,
+                (data_type, period, start, end),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+
+class RollupService:
+    """DynamoDBの新着データをロールアップに取り込み、期間サマリーを返すサービス"""
+
+    def __init__(self, source, store: RollupStore, refresh_interval_seconds: float = 60.0):
+        self._source = source
+        self._store = store
+        self._refresh_interval = refresh_interval_seconds
+        self._last_refresh: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, data_type: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(data_type, threading.Lock())
+
+    def refresh(self, data_type: str, force: bool = False) -> int:
+        """
+        ウォーターマーク以降のデータを取り込む
+
+        Returns:
+            新たに取り込んだ件数
+        """
+        with self._lock_for(data_type):
+            last = self._last_refresh.get(data_type)
+            if not force and last is not None and time.monotonic() - last < self._refresh_interval:
+                return 0
+
+            watermark = self._store.get_watermark(data_type)
+            start = watermark or BOOTSTRAP_START
+            ingested = 0
+            for page in self._source.iter_pages(data_type, start, INGEST_END):
+                # BETWEENは境界を含むため、取り込み済みの行を除外
+                if watermark:
+                    page = [item for item in page if item["insert_date"] > watermark]
+                if not page:
+                    continue
+                timestamps, values = items_to_arrays(page)
+                previous_ms = to_epoch_ms(watermark) if watermark else None
+                buckets = {
+                    period: aggregate_buckets(timestamps, values, period, previous_ms)
+                    for period in ROLLUP_PERIODS
+                }
+                if not self._store.merge(data_type, buckets, watermark, page[-1]["insert_date"]):
+                    # 他のワーカーが同じ範囲を取り込んだ。続きはそのワーカーに任せる
+                    logger.info(f"ロールアップは他のワーカーが更新済み: data_type={data_type}")
+                    break
+                watermark = page[-1]["insert_date"]
+                ingested += len(page)
+
+            self._last_refresh[data_type] = time.monotonic()
+            if ingested:
+                logger.info(f"ロールアップ更新: data_type={data_type}, 取り込み件数={ingested}")
+            return ingested
+
+    def _partial_bucket(
+        self, data_type: str, period: str, lo: int, hi: int, hours: Tuple[int, int]
+    ) -> Optional[BucketRow]:
+        """
+        1つの集計期間のうち [lo, hi)（エポックミリ秒）の部分だけを集計
+
+        hours（時間単位で丸ごと範囲に入る [開始, 終了)）は時間単位のロールアップを合成し、
+        1時間に満たない端だけ生データを読む。
+        """
+        hour_lo, hour_hi = hours
+        rows = []
+        if max(lo, hour_lo) < min(hi, hour_hi):
+            rows += self._store.get_buckets(
+                data_type, "hour", _label(max(lo, hour_lo)), _label(min(hi, hour_hi) - 1000)
+            )
+        for edge_lo, edge_hi in ((lo, min(hi, hour_lo)), (max(lo, hour_hi), hi)):
+            if edge_lo < edge_hi:
+                query_start, query_end = format_dates(np.array([edge_lo, edge_hi - 1]))
+                timestamps, values = self._source.query_arrays(data_type, query_start, query_end)
+                rows += aggregate_buckets(timestamps, values, period)
+        if not rows:
+            return None
+        return _combine_rows(_label(_floor_ms(lo, period)), rows)
+
+    def summarize(
+        self,
+        data_type: str,
+        period: str,
+        start: str,
+        end: str,
+        threshold: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        期間内のバケット集計と全体のサマリーを返す
+
+        範囲に丸ごと入るバケットは保存済みの集計を使い、startやendが途中にかかる
+        先頭・末尾のバケットは範囲内のデータだけで集計し直す（開始時刻は集計期間の境界のまま）。
+        全体の標準偏差・分位点はバケットのM2とスケッチを合成して求める。
+        thresholdを指定した場合は、バケットの計測時間のうち値がthresholdを超えていた時間（秒）も推定する。
+        """
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"未対応の集計期間です: {period}")
+        self.refresh(data_type)
+
+        # endを含む半開区間 [start_ms, end_ms) として扱う
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end) + 1
+        full_lo, full_hi = _ceil_ms(start_ms, period), _floor_ms(end_ms, period)
+        if full_lo > full_hi:
+            # 範囲全体が1つのバケットの途中に収まる
+            full_lo = full_hi = end_ms
+        hours = (_ceil_ms(start_ms, "hour"), _floor_ms(end_ms, "hour"))
+        if hours[0] >= hours[1]:
+            hours = (end_ms, end_ms)
+
+        rows: List[BucketRow] = []
+        if full_lo < full_hi:
+            rows = self._store.get_buckets(data_type, period, _label(full_lo), _label(full_hi - 1000))
+        if start_ms < full_lo:
+            head = self._partial_bucket(data_type, period, start_ms, full_lo, hours)
+            rows = ([head] if head else []) + rows
+        if full_hi < end_ms:
+            tail = self._partial_bucket(data_type, period, full_hi, end_ms, hours)
+            rows = rows + ([tail] if tail else [])
+
+        count = sum(row[1] for row in rows)
+        if not count:
+            return {
+                "average": 0,
+                "minimum": 0,
+                "maximum": 0,
+                "count": 0,
+                "period": period,
+                "std": 0,
+                "p5": None,
+                "p50": None,
+                "p95": None,
+                "time_above_threshold_seconds": None if threshold is None else 0.0,
+                "buckets": [],
+            }
+
+        buckets = []
+        sketches = []
+        for label, bucket_count, total, minimum, maximum, m2, duration, sketch_bytes in rows:
+            sketch = QuantileSketch.from_bytes(sketch_bytes)
+            p5, p50, p95 = sketch.quantile([0.05, 0.5, 0.95]).tolist()
+            buckets.append({
+                "start": label,
+                "count": bucket_count,
+                "sum": total,
+                "min": minimum,
+                "max": maximum,
+                "average": total / bucket_count,
+                "std": float(np.sqrt(m2 / bucket_count)),
+                "p5": p5,
+                "p50": p50,
+                "p95": p95,
+                "time_above_threshold_seconds": (
+                    None if threshold is None else duration * (1.0 - sketch.cdf(threshold))
+                ),
+            })
+            sketches.append(sketch)
+        time_above = None
+        if threshold is not None:
+            time_above = sum(bucket["time_above_threshold_seconds"] for bucket in buckets)
+
+        _, _, m2 = merge_moments((row[1], row[2] / row[1], row[5]) for row in rows)
+        p5, p50, p95 = QuantileSketch.merge(sketches).quantile([0.05, 0.5, 0.95]).tolist()
+        return {
+            "average": sum(row[2] for row in rows) / count,
+            "minimum": min(row[3] for row in rows),
+            "maximum": max(row[4] for row in rows),
+            "count": count,
+            "period": period,
+            "std": float(np.sqrt(m2 / count)),
+            "p5": p5,
+            "p50": p50,
+            "p95": p95,
+            "time_above_threshold_seconds": time_above,
+            "buckets": buckets,
+        }
@@ -0,0 +1,57 @@
+"""
+時系列データの配列変換ユーティリティ
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def items_to_arrays(items: Iterable[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    DynamoDBのアイテムをエポックミリ秒(int64)と値(float64)の配列に変換
+
+    Returns:
+        (timestamps, values) のタプル
+    """
+    items = list(items)
+    timestamps = np.array(
+        [item["insert_date"] for item in items], dtype="datetime64[ms]"
+    ).astype(np.int64)
+    values = np.array([item["avg_value"] for item in items], dtype=np.float64)
+    return timestamps, values
+
+
+def arrays_to_items(
+    data_type: str, timestamps: np.ndarray, values: np.ndarray, projection: Optional[tuple]
+) -> List[Dict[str, Any]]:
+    """配列をDynamoDBと同じ形式のアイテムに変換（data_type/insert_date/avg_valueのうちprojectionの属性のみ）"""
+    columns = {
+        "data_type": [data_type] * len(timestamps),
+        "insert_date": format_dates(timestamps),
+        "avg_value": values.tolist(),
+    }
+    names = [name for name in (projection or columns) if name in columns]
+    return [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))]
+
+
+def to_epoch_ms(date: str) -> int:
+    """"%Y-%m-%d %H:%M:%S" 形式（日付のみも可）の文字列をエポックミリ秒に変換"""
+    return int(np.datetime64(date.replace(" ", "T"), "ms").astype(np.int64))
+
+
+def format_dates(timestamps: np.ndarray) -> List[str]:
+    """エポックミリ秒の配列を "%Y-%m-%d %H:%M:%S" 形式の文字列リストに変換"""
+    iso = np.datetime_as_string(timestamps.astype("datetime64[ms]"), unit="s")
+    return [s.replace("T", " ") for s in iso.tolist()]
+
+
+def format_timestamps(timestamps: np.ndarray) -> List[str]:
+    """
+    エポックミリ秒の配列をISO形式(UTC, 'Z'付き)の文字列リストに変換
+
+    秒未満を持つ時刻（バケット平均の時刻など）があればミリ秒まで出力し、
+    列指向・バイナリ形式と同じ時刻を表すようにする。
+    """
+    unit = "ms" if len(timestamps) and np.any(np.asarray(timestamps) % 1000) else "s"
+    iso = np.datetime_as_string(timestamps.astype("datetime64[ms]"), unit=unit)
+    return [s + "Z" for s in iso.tolist()]
@@ -0,0 +1,348 @@
+"""
+ワーカー間で共有するホットウィンドウ
+
+uvicorn/gunicornのワーカーごとにHotWindowStoreを持つと、保持するメモリと
+ストレージへの新着確認がワーカー数の分だけ増える。SharedHotWindowStoreは系列ごとの配列を
+ディレクトリ（/dev/shm 配下など）のセグメントファイルに置き、各ワーカーはそれを
+読み込み専用でmmapしてスライスをそのまま返す（コピーしない）。
+
+- 新着データの取り込みは、リーダー用のロックファイルを取れた1つのワーカーだけが行う
+  （そのワーカーが終了するとロックが外れ、次の周期で別のワーカーが引き継ぐ）
+- まだセグメントがない系列は、最初に要求したワーカーが系列ごとのロックを取って読み込む。
+  セグメントを作るのはウィンドウの期間内にデータがある系列だけ（HotWindowStoreと同じ判定）で、系列数が max_series に
+  達していれば最も長く読まれていないセグメントを削除する
+- 各ワーカーは系列を読んだ時刻をロックファイルの更新時刻として記録し、
+  idle_seconds 以上どのワーカーも読んでいないセグメントは担当のワーカーが削除する
+- セグメントの先頭にはバージョン付きのヘッダーを置く。追記は配列の末尾に書いてから
+  ヘッダーの件数を更新し、容量を超えたときは詰め直した新しいファイルに置き換える。
+  読み手が保持している範囲が書き換わることはない
+
+セグメントのレイアウト:
+    ヘッダー（64バイト） | timestamps int64 × capacity | values float64 × capacity
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .hot_window import HotWindowStore, compaction_start
+from .local_store import _DATA_TYPE_PATTERN, _file_lock, fcntl
+from .storage import TimeSeriesStorage
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PMWIN001"
+HEADER_SIZE = 64
+# version: 公開のたびに増える番号, count: 公開済みの件数, covered_from: この時刻以降を全て保持,
+# refreshed_at: 最後に更新した時刻（UNIX秒、未読み込みなら0）
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u8"),
+    ("count", "<i8"),
+    ("capacity", "<i8"),
+    ("covered_from", "<i8"),
+    ("refreshed_at", "<f8"),
+])
+SEGMENT_SUFFIX = ".seg"
+LOCK_SUFFIX = ".lock"
+LEADER_LOCK_FILE = ".refresher.lock"
+CREATE_LOCK_FILE = ".create.lock"
+
+
+def create_segment(
+    path: str,
+    capacity: int,
+    covered_from: int,
+    timestamps: Optional[np.ndarray] = None,
+    values: Optional[np.ndarray] = None,
+    version: int = 0,
+    refreshed_at: float = 0.0,
+    exclusive: bool = False,
+) -> None:
+    """
+    セグメントファイルを作成
+
+    一時ファイルに書き終えてからrenameするため、読み手が書き込み途中の状態を見ることはない。
+    exclusive=Trueの場合は既存のファイルを置き換えない（他のワーカーが先に作っていればそれを使う）。
+    """
+    count = 0 if timestamps is None else len(timestamps)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.truncate(HEADER_SIZE + 16 * capacity)
+    with open(tmp_path, "r+b") as f:
+        header = np.memmap(f, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        header[0] = (MAGIC, version, count, capacity, covered_from, refreshed_at)
+        if count:
+            np.memmap(f, dtype=np.int64, mode="r+", offset=HEADER_SIZE, shape=(count,))[:] = timestamps
+            np.memmap(
+                f, dtype=np.float64, mode="r+", offset=HEADER_SIZE + 8 * capacity, shape=(count,)
+            )[:] = values
+    if not exclusive:
+        os.replace(tmp_path, path)
+        return
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(tmp_path)
+
+
+class _Segment:
+    """1つのセグメントファイルのmmap"""
+
+    def __init__(self, path: str, writable: bool = False):
+        mode = "r+" if writable else "r"
+        with open(path, "r+b" if writable else "rb") as f:
+            # rename で置き換えられたかどうかをinodeで判定する
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.header = np.memmap(f, dtype=HEADER_DTYPE, mode=mode, shape=(1,))
+            if self.header["magic"][0] != MAGIC:
+                raise ValueError(f"セグメントの形式が不正です: {path}")
+            self.capacity = int(self.header["capacity"][0])
+            self.timestamps = np.memmap(
+                f, dtype=np.int64, mode=mode, offset=HEADER_SIZE, shape=(self.capacity,)
+            )
+            self.values = np.memmap(
+                f, dtype=np.float64, mode=mode, offset=HEADER_SIZE + 8 * self.capacity,
+                shape=(self.capacity,)
+            )
+
+    def field(self, name: str):
+        return self.header[name][0]
+
+
+class _SharedWindow:
+    """セグメントファイルに置いた1つのdata_typeの配列（HotWindowStoreの_Windowと同じ操作を持つ）"""
+
+    def __init__(self, path: str, lock_path: str, capacity: int):
+        self._path = path
+        self._lock_path = lock_path
+        self._capacity = capacity
+        self._segment = _Segment(path)
+        self._writer: Optional[_Segment] = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> _Segment:
+        """読み込み用のmmap（ファイルが置き換えられていれば開き直す）"""
+        segment = self._segment
+        try:
+            if os.stat(self._path).st_ino != segment.inode:
+                segment = self._segment = _Segment(self._path)
+        except OSError:
+            # 置き換えの途中などで一時的に見えない場合は開いているものを使う
+            pass
+        return segment
+
+    @property
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        segment = self._current()
+        # 件数より前の範囲は書き換えられないため、件数を読んでからスライスすれば一貫する
+        count = int(segment.field("count"))
+        return segment.timestamps[:count], segment.values[:count], int(segment.field("covered_from"))
+
+    @property
+    def last(self) -> int:
+        """保持している最終時刻（データがなければcovered_fromの直前）"""
+        timestamps, _, covered_from = self.snapshot
+        return int(timestamps[-1]) if len(timestamps) else covered_from - 1
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """他のスレッド・プロセスの書き込みを排他し、書き込み用のmmapを開く"""
+        with self._lock, _file_lock(self._lock_path):
+            self._writer = _Segment(self._path, writable=True)
+            try:
+                yield
+            finally:
+                self._writer = None
+
+    def append(self, timestamps: np.ndarray, values: np.ndarray, window_ms: int) -> int:
+        """最終時刻より新しいデータを追記する（locked()の中で呼ぶ）"""
+        keep = timestamps > self.last
+        timestamps, values = timestamps[keep], values[keep]
+        count = len(timestamps)
+        if not count:
+            return 0
+
+        writer = self._writer
+        length = int(writer.field("count"))
+        version = int(writer.field("version")) + 1
+        if length + count <= writer.capacity:
+            writer.timestamps[length:length + count] = timestamps
+            writer.values[length:length + count] = values
+            # データを書いてから件数を更新する（読み手は件数までしか見ない）
+            writer.header["count"] = length + count
+            writer.header["version"] = version
+            return count
+
+        merged_timestamps = np.concatenate([writer.timestamps[:length], timestamps])
+        merged_values = np.concatenate([writer.values[:length], values])
+        start = compaction_start(merged_timestamps, window_ms, self._capacity)
+        covered_from = int(merged_timestamps[start]) if start else int(writer.field("covered_from"))
+        create_segment(
+            self._path, self._capacity, covered_from,
+            merged_timestamps[start:], merged_values[start:],
+            version=version, refreshed_at=float(writer.field("refreshed_at"))
+        )
+        self._writer = _Segment(self._path, writable=True)
+        return count
+
+    def mark_refreshed(self) -> None:
+        self._writer.header["refreshed_at"] = time.time()
+
+    def age(self) -> Optional[float]:
+        """最後に更新してからの秒数（どのワーカーもまだ読み込んでいなければNone）"""
+        refreshed_at = float(self._current().field("refreshed_at"))
+        return None if refreshed_at <= 0 else max(0.0, time.time() - refreshed_at)
+
+
+class SharedHotWindowStore(HotWindowStore):
+    """セグメントファイルを介して複数のワーカーで1つのホットウィンドウを共有するストレージ"""
+
+    def __init__(self, source: TimeSeriesStorage, directory: str, idle_seconds: float = 3600.0, **kwargs):
+        """
+        Args:
+            source: 元のストレージ（DynamoDBServiceなど）
+            directory: セグメントファイルを置くディレクトリ（tmpfsの /dev/shm 配下を推奨）
+            idle_seconds: この秒数以上どのワーカーも読んでいないセグメントを削除する
+            **kwargs: HotWindowStoreの設定（window_days, max_points, max_series など）
+        """
+        if fcntl is None:
+            raise RuntimeError("共有ホットウィンドウにはfcntl（ファイルロック）が必要です")
+        super().__init__(source, **kwargs)
+        self._directory = directory
+        self._idle_seconds = idle_seconds
+        self._leader_file = None
+        # data_typeごとに最後にアクセス時刻を記録した時刻（time.monotonic）
+        self._touched: Dict[str, float] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, data_type: str) -> Tuple[str, str]:
+        base = os.path.join(self._directory, data_type)
+        return base + SEGMENT_SUFFIX, base + LOCK_SUFFIX
+
+    def _segment_names(self) -> List[str]:
+        """セグメントがあるdata_type"""
+        return sorted(
+            name[:-len(SEGMENT_SUFFIX)]
+            for name in os.listdir(self._directory)
+            if name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _touch(self, data_type: str) -> None:
+        """
+        系列を読んだ時刻をロックファイルの更新時刻として全ワーカーに共有する
+
+        システムコールを減らすため、記録はワーカーごとに更新間隔に1回までにする。
+        """
+        now = time.monotonic()
+        touched = self._touched.get(data_type)
+        if touched is not None and now - touched < self._refresh_interval:
+            return
+        self._touched[data_type] = now
+        _, lock_path = self._paths(data_type)
+        try:
+            with open(lock_path, "a"):
+                pass
+            os.utime(lock_path)
+        except OSError:
+            pass
+
+    def _last_access(self, data_type: str) -> float:
+        """どれかのワーカーが最後に系列を読んだ時刻（UNIX秒）"""
+        try:
+            return os.path.getmtime(self._paths(data_type)[1])
+        except OSError:
+            return 0.0
+
+    def _remove_segments(self, data_types: List[str], reason: str) -> None:
+        """
+        セグメントを削除する（ロックファイルは他のワーカーが保持している可能性があるため残す）
+
+        削除したセグメントを開いているワーカーは更新が止まったものとして扱い、
+        次に要求されたときに作り直す。
+        """
+        for data_type in data_types:
+            try:
+                os.unlink(self._paths(data_type)[0])
+            except FileNotFoundError:
+                continue
+            logger.info(f"共有ホットウィンドウから系列を破棄（{reason}）: data_type={data_type}")
+
+    def _create_window(self, data_type: str) -> Optional[_SharedWindow]:
+        # data_typeはファイル名になるため、パス区切りなどを含む名前は扱わない
+        if not _DATA_TYPE_PATTERN.match(data_type):
+            return None
+        path, lock_path = self._paths(data_type)
+        if not os.path.exists(path):
+            if not self._has_recent_data(data_type):
+                return None
+            with _file_lock(os.path.join(self._directory, CREATE_LOCK_FILE)):
+                names = self._segment_names()
+                if data_type not in names:
+                    excess = len(names) - self._max_series + 1
+                    if excess > 0:
+                        self._remove_segments(sorted(names, key=self._last_access)[:excess], "系列数の上限")
+                    create_segment(path, self._max_points, self._window_start(), exclusive=True)
+        try:
+            return _SharedWindow(path, lock_path, self._max_points)
+        except (OSError, ValueError) as e:
+            logger.warning(f"共有ホットウィンドウを開けません: data_type={data_type}, error={str(e)}")
+            return None
+
+    def _forget(self, data_types: List[str]) -> None:
+        """セグメントが削除された系列をこのワーカーの保持から外す"""
+        with self._guard:
+            for data_type in data_types:
+                self._windows.pop(data_type, None)
+
+    def _window(self, data_type: str) -> Optional[_SharedWindow]:
+        if data_type in self._windows and not os.path.exists(self._paths(data_type)[0]):
+            self._forget([data_type])
+        window = super()._window(data_type)
+        if window is not None:
+            self._touch(data_type)
+        return window
+
+    def _lead(self) -> bool:
+        """新着データの取り込みを担当するワーカーか（ロックを取れれば担当になる）"""
+        if self._leader_file is not None:
+            return True
+        f = open(os.path.join(self._directory, LEADER_LOCK_FILE), "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._leader_file = f
+        logger.info(f"共有ホットウィンドウの更新を担当します: pid={os.getpid()}")
+        return True
+
+    def refresh(self) -> int:
+        """担当のワーカーであれば、読まれている系列の新着データを取り込み、読まれていない系列を削除する"""
+        if not self._lead():
+            return 0
+        cutoff = time.time() - self._idle_seconds
+        with _file_lock(os.path.join(self._directory, CREATE_LOCK_FILE)):
+            self._remove_segments(
+                [name for name in self._segment_names() if self._last_access(name) < cutoff],
+                "長期間未使用"
+            )
+            names = self._segment_names()
+        self._forget([data_type for data_type in list(self._windows) if data_type not in names])
+        for data_type in names:
+            # 読み込みのための参照はアクセスとして記録しない
+            super()._window(data_type)
+        return super().refresh()
+
+    def close(self) -> None:
+        super().close()
+        if self._leader_file is not None:
+            # ロックを外し、他のワーカーが引き継げるようにする
+            self._leader_file.close()
+            self._leader_file = None
@@ -0,0 +1,48 @@
+"""
+同一クエリの同時実行をまとめる（single-flight）
+
+同じキーの処理が実行中であれば新たに実行せず、実行中の結果を待って共有する。
+キャッシュの期限切れ直後や、多数の利用者が同時にダッシュボードを開いたときに
+同じ範囲のクエリが一斉にストレージへ届くのを防ぐ。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """キーごとに実行中のタスクを1つだけ保持し、同時の呼び出しで結果を共有する"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # calls: 呼び出し回数, executions: 実際に実行した回数, coalesced: 実行中の結果を共有した回数
+        self.stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        keyの処理が実行中ならその結果を、なければfuncを実行した結果を返す
+
+        実行はタスクとして切り離すため、最初の呼び出し元がキャンセルされても
+        他の呼び出し元は結果を受け取れる。例外は待っている全員に送出される。
+        """
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 待っていた呼び出し元が全員キャンセルされた場合も例外を回収しておく
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def inflight(self) -> int:
+        """実行中の処理数"""
+        return len(self._inflight)
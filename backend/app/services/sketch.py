@@ -0,0 +1,132 @@
+"""
+マージ可能な統計量（分位点スケッチと分散）
+
+ロールアップのバケットごとに保存し、任意の期間のサマリーをバケットのマージだけで求めるために使う。
+どちらも元の値を保持せず、サイズは件数に関係なく一定。
+
+- QuantileSketch: t-digest（マージ型）。値を重み付きのセントロイドにまとめ、
+  分布の両端ほど細かく保つため p5 / p95 のような裾の分位点も精度よく求まる
+- merge_moments: Welford法の分散（件数・平均・偏差平方和 M2）を
+  Chanの式で合成する。バケットごとの M2 は平均を引いてから二乗するため桁落ちしにくい
+"""
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+# セントロイド数の目安（およそ compression / 2 個まで）
+DEFAULT_COMPRESSION = 100
+
+
+def _compress(
+    means: np.ndarray, weights: np.ndarray, compression: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    セントロイドを平均値順に並べ、k1スケール関数の整数区間ごとにまとめる
+
+    累積重みの位置qを k(q) = compression / 2π × asin(2q - 1) に写すと
+    分布の両端ほど区間が細かくなる。
+    """
+    order = np.argsort(means, kind="stable")
+    means, weights = means[order], weights[order]
+    total = weights.sum()
+    q = (np.cumsum(weights) - weights / 2) / total
+    groups = np.floor(compression / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1.0, 1.0)))
+    edges = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    merged_weights = np.add.reduceat(weights, edges)
+    merged_means = np.add.reduceat(means * weights, edges) / merged_weights
+    return merged_means, merged_weights
+
+
+class QuantileSketch:
+    """マージ可能な分位点スケッチ（t-digest）"""
+
+    def __init__(
+        self,
+        means: np.ndarray,
+        weights: np.ndarray,
+        minimum: float,
+        maximum: float,
+    ):
+        self.means = means
+        self.weights = weights
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def from_values(
+        cls, values: np.ndarray, compression: float = DEFAULT_COMPRESSION
+    ) -> "QuantileSketch":
+        """値の配列からスケッチを作る（空の配列は不可）"""
+        values = np.asarray(values, dtype=np.float64)
+        means, weights = _compress(values, np.ones(len(values)), compression)
+        return cls(means, weights, float(values.min()), float(values.max()))
+
+    @classmethod
+    def merge(
+        cls, sketches: Sequence["QuantileSketch"], compression: float = DEFAULT_COMPRESSION
+    ) -> "QuantileSketch":
+        """複数のスケッチを1つにまとめる（空のリストは不可）"""
+        if len(sketches) == 1:
+            return sketches[0]
+        means, weights = _compress(
+            np.concatenate([sketch.means for sketch in sketches]),
+            np.concatenate([sketch.weights for sketch in sketches]),
+            compression,
+        )
+        return cls(
+            means,
+            weights,
+            min(sketch.minimum for sketch in sketches),
+            max(sketch.maximum for sketch in sketches),
+        )
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _positions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """補間に使う (値, 累積重み) の点列（両端に最小値・最大値を置く）"""
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return (
+            np.r_[self.minimum, self.means, self.maximum],
+            np.r_[0.0, centers, total],
+        )
+
+    def quantile(self, q):
+        """分位点（qは0〜1、配列も可）"""
+        values, positions = self._positions()
+        return np.interp(np.asarray(q) * positions[-1], positions, values)
+
+    def cdf(self, x: float) -> float:
+        """x以下の値の割合"""
+        values, positions = self._positions()
+        return float(np.interp(x, values, positions) / positions[-1])
+
+    def to_bytes(self) -> bytes:
+        """保存用のバイト列（最小値, 最大値, セントロイドの平均値..., 重み...）"""
+        return np.r_[self.minimum, self.maximum, self.means, self.weights].astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "QuantileSketch":
+        array = np.frombuffer(data, dtype="<f8")
+        size = (len(array) - 2) // 2
+        return cls(array[2:2 + size], array[2 + size:], float(array[0]), float(array[1]))
+
+
+def merge_moments(moments: Iterable[Tuple[int, float, float]]) -> Tuple[int, float, float]:
+    """
+    (件数, 平均, M2) の組をまとめる（Chanの並列Welford法）
+
+    M2は平均からの偏差平方和で、分散は M2 / 件数 になる。
+    """
+    moments = [m for m in moments if m[0]]
+    if not moments:
+        return 0, 0.0, 0.0
+    counts = np.array([m[0] for m in moments], dtype=np.float64)
+    means = np.array([m[1] for m in moments])
+    m2s = np.array([m[2] for m in moments])
+    count = counts.sum()
+    mean = float((counts * means).sum() / count)
+    m2 = float(m2s.sum() + (counts * (means - mean) ** 2).sum())
+    return int(count), mean, m2
@@ -0,0 +1,129 @@
+"""
+時系列ストレージのインターフェース
+
+APIやロールアップ・キャッシュはこのインターフェースだけを使うため、
+DynamoDB（dynamodb.py）とローカルの列指向ストア（local_store.py）を
+設定（STORAGE_BACKEND）で切り替えられる。
+
+実装が用意するのは iter_pages と get_latest だけで、
+1件ずつの取得やまとめての取得、配列での取得はここで共通に実装する。
+配列をより安く作れる実装（DynamoDBの低レベルクライアント、memmap）は
+query_arrays を上書きする。
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .series import items_to_arrays
+
+# 取得する属性（グラフ・APIで利用するもののみ）
+DEFAULT_PROJECTION = ("insert_date", "avg_value")
+
+# 初回取り込み時の開始日時と、取り込み範囲の上限（文字列比較のため十分先の日時）
+BOOTSTRAP_START = "1970-01-01 00:00:00"
+INGEST_END = "9999-12-31 23:59:59"
+
+
+class TimeSeriesStorage(ABC):
+    """data_typeごとの時系列（insert_date順）を読み出すストレージ"""
+
+    @abstractmethod
+    def iter_pages(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        期間内（両端を含む）のデータをページ単位で遅延取得する
+
+        日時は "%Y-%m-%d %H:%M:%S" 形式の文字列で、アイテムは少なくとも
+        insert_date と avg_value を持つ。
+        """
+
+    @abstractmethod
+    def get_latest(
+        self,
+        data_type: str,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Optional[Dict[str, Any]]:
+        """最新の1件を取得する（データがなければNone）"""
+
+    def iter_data(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> Iterator[Dict[str, Any]]:
+        """期間内のデータを1件ずつ遅延取得する"""
+        for page in self.iter_pages(
+            data_type, start_date, end_date,
+            limit=limit, ascending=ascending, projection=projection
+        ):
+            yield from page
+
+    def query_items(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ) -> List[Dict[str, Any]]:
+        """期間内のデータをまとめて取得する（エラーは呼び出し元に送出）"""
+        return list(self.iter_data(
+            data_type, start_date, end_date,
+            limit=limit, ascending=ascending, projection=projection
+        ))
+
+    def query_arrays(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        期間内のデータを時刻順の (エポックミリ秒int64, 値float64) の配列で取得する
+
+        エラーは呼び出し元に送出する。
+        """
+        pages = [
+            items_to_arrays(page)
+            for page in self.iter_pages(data_type, start_date, end_date, limit=limit)
+        ]
+        if not pages:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return (
+            np.concatenate([timestamps for timestamps, _ in pages]),
+            np.concatenate([values for _, values in pages]),
+        )
+
+    def get_data(
+        self,
+        data_type: str,
+        start_date: str,
+        end_date: str,
+        limit: Optional[int] = None,
+        ascending: bool = True,
+        projection: Optional[tuple] = DEFAULT_PROJECTION,
+    ):
+        try:
+            print(f"クエリパラメータ: data_type={data_type}, start_date={start_date}, end_date={end_date}, limit={limit}")
+            items = self.query_items(
+                data_type, start_date, end_date,
+                limit=limit, ascending=ascending, projection=projection
+            )
+            print(f"取得したデータ数: {len(items)}")
+            return items
+        except Exception as e:
+            print(f"クエリエラー: {str(e)}")
+            return []
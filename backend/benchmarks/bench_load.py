@@ -0,0 +1,329 @@
+"""
+負荷・長時間（ソーク）試験
+
+uvicornでアプリ（benchmarks/fake_app.py: DynamoDBスタンドイン接続済み）を起動し、
+ダッシュボードの実際のリクエスト構成（/data/latest のポーリング、/data の期間読み込み、
+/data/summary、/ の表示）を指定した同時接続数・時間で送り続ける。
+
+エンドポイントごとにスループット、p50/p95/p99レイテンシ、エラー率を、
+サーバープロセス全体（全ワーカー）についてメモリ（RSS）の増加量を表示し、
+SLOの閾値を超えた場合は終了コード1で終了する。イベントループのブロッキングは
+軽いエンドポイント（/data/latest, /health）のp99悪化として、メモリリークは
+ウォームアップ後のRSS増加として検出できる。
+
+実行方法（backendディレクトリで）:
+
+    uv run python -m benchmarks.bench_load --workers 1,4 --concurrency 32 --duration 60
+    uv run python -m benchmarks.bench_load --duration 1800 --slo benchmarks/slo.json  # ソーク試験
+
+SLOファイル（JSON）はDEFAULT_SLOと同じ形式で、指定したキーだけが上書きされる。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# (名前, 重み, URLを作る関数) — ダッシュボード1画面分の典型的な構成
+RequestMix = List[Tuple[str, float, Callable[[], str]]]
+
+
+def _range(days: int) -> str:
+    end = datetime.now()
+    return f"start_time={(end - timedelta(days=days)).isoformat()}&end_time={end.isoformat()}"
+
+
+REQUEST_MIX: RequestMix = [
+    ("GET /data/latest", 45, lambda: "/api/v1/data/latest?data_type=temperature"),
+    ("GET /data/latest (multi)", 15, lambda: "/api/v1/data/latest?data_types=temperature,pH"),
+    ("GET /data 1d", 12, lambda: f"/api/v1/data?data_type=temperature&{_range(1)}"),
+    ("GET /data 7d", 8, lambda: f"/api/v1/data?data_type=temperature&{_range(7)}&max_points=1000"),
+    ("GET /data/summary", 8, lambda: "/api/v1/data/summary?data_type=temperature&period=hour"),
+    ("GET /plants", 5, lambda: "/api/v1/plants"),
+    ("GET /health", 4, lambda: "/api/v1/health"),
+    ("GET /", 3, lambda: "/?data_type=temperature&days=1"),
+]
+
+# 既定のSLO（レイテンシはミリ秒、メモリはMB）
+DEFAULT_SLO: Dict[str, Any] = {
+    "endpoints": {
+        "GET /data/latest": {"p95_ms": 150, "p99_ms": 300},
+        "GET /data/latest (multi)": {"p95_ms": 200, "p99_ms": 400},
+        "GET /data 1d": {"p95_ms": 400, "p99_ms": 800},
+        "GET /data 7d": {"p95_ms": 800, "p99_ms": 1500},
+        "GET /data/summary": {"p95_ms": 500, "p99_ms": 1000},
+        "GET /plants": {"p95_ms": 150, "p99_ms": 300},
+        "GET /health": {"p95_ms": 100, "p99_ms": 250},
+        "GET /": {"p95_ms": 1500, "p99_ms": 3000},
+    },
+    "max_error_rate": 0.01,
+    "max_memory_growth_mb": 64,
+}
+
+
+def load_slo(path: Optional[str]) -> Dict[str, Any]:
+    """既定のSLOにファイルの内容を重ねる"""
+    slo = json.loads(json.dumps(DEFAULT_SLO))
+    if path:
+        with open(path, encoding="utf-8") as f:
+            override = json.load(f)
+        for name, limits in override.pop("endpoints", {}).items():
+            slo["endpoints"].setdefault(name, {}).update(limits)
+        slo.update(override)
+    return slo
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近傍順位法によるパーセンタイル（sorted_valuesは昇順）"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _process_tree(root_pid: int) -> List[int]:
+    """root_pidとその子孫のPID（Linuxの/procから取得）"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # commに空白や括弧が含まれても良いよう、最後の ')' 以降を読む
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def rss_mb(root_pid: int) -> Optional[float]:
+    """サーバープロセス全体のRSS（MB）。/procがない環境ではNone"""
+    if not os.path.isdir("/proc"):
+        return None
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in _process_tree(root_pid):
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total / (1024 * 1024)
+
+
+class Server:
+    """uvicornのサブプロセス"""
+
+    def __init__(self, workers: int, port: int, years: float, latency_ms: float):
+        self.url = f"http://127.0.0.1:{port}"
+        self._command = [
+            sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ]
+        rollup_dir = tempfile.mkdtemp(prefix="bench-rollup-")
+        self._env = {
+            **os.environ,
+            "BENCH_YEARS": str(years),
+            "BENCH_LATENCY_MS": str(latency_ms),
+            # ワーカー間で同じロールアップDBを共有する（本番の構成と同じ）
+            "ROLLUP_DB_PATH": os.path.join(rollup_dir, "rollups.sqlite3"),
+            "ALERT_DB_PATH": os.path.join(rollup_dir, "alerts.sqlite3"),
+            "ENABLE_REQUEST_LOGGING": "false",
+        }
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 120.0) -> None:
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.process = subprocess.Popen(self._command, cwd=backend_dir, env=self._env)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"サーバーが起動できませんでした (exit={self.process.returncode})")
+            try:
+                if httpx.get(f"{self.url}/api/v1/health", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError("サーバーの起動がタイムアウトしました")
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+async def _client_loop(
+    client: httpx.AsyncClient,
+    mix: RequestMix,
+    deadline: float,
+    samples: Dict[str, List[float]],
+    errors: Dict[str, int],
+    record: Callable[[], bool],
+) -> None:
+    """1クライアント分: deadlineまで重み付きで選んだリクエストを送り続ける"""
+    names = [name for name, _, _ in mix]
+    weights = [weight for _, weight, _ in mix]
+    urls = {name: make_url for name, _, make_url in mix}
+    while time.monotonic() < deadline:
+        name = random.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await client.get(urls[name]())
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        elapsed = (time.perf_counter() - start) * 1000
+        if record():
+            samples.setdefault(name, []).append(elapsed)
+            if failed:
+                errors[name] = errors.get(name, 0) + 1
+
+
+async def run_load(
+    server: Server, concurrency: int, duration: float, warmup: float, mix: RequestMix = REQUEST_MIX
+) -> Dict[str, Any]:
+    """ウォームアップ後のduration秒間を計測し、エンドポイントごとの結果とメモリ推移を返す"""
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    started = time.monotonic()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    memory: List[Tuple[float, float]] = []
+
+    async def sample_memory():
+        while time.monotonic() < deadline:
+            await asyncio.sleep(1.0)
+            if time.monotonic() >= measure_from:
+                value = rss_mb(server.process.pid)
+                if value is not None:
+                    memory.append((time.monotonic() - measure_from, value))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=server.url, limits=limits, timeout=30.0) as client:
+        await asyncio.gather(
+            sample_memory(),
+            *(
+                _client_loop(client, mix, deadline, samples, errors, lambda: time.monotonic() >= measure_from)
+                for _ in range(concurrency)
+            ),
+        )
+
+    endpoints = {}
+    for name, values in sorted(samples.items()):
+        values.sort()
+        endpoints[name] = {
+            "requests": len(values),
+            "rps": len(values) / duration,
+            "error_rate": errors.get(name, 0) / len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+            "max_ms": values[-1],
+        }
+    total = sum(len(values) for values in samples.values())
+    return {
+        "endpoints": endpoints,
+        "total_rps": total / duration,
+        "error_rate": sum(errors.values()) / total if total else 0.0,
+        "memory_start_mb": memory[0][1] if memory else None,
+        "memory_end_mb": memory[-1][1] if memory else None,
+        "memory_peak_mb": max(value for _, value in memory) if memory else None,
+        "memory_growth_mb": memory[-1][1] - memory[0][1] if len(memory) > 1 else None,
+    }
+
+
+def check_slo(result: Dict[str, Any], slo: Dict[str, Any]) -> List[str]:
+    """SLO違反の一覧（違反がなければ空）"""
+    violations = []
+    for name, limits in slo["endpoints"].items():
+        measured = result["endpoints"].get(name)
+        if measured is None:
+            continue
+        for key, limit in limits.items():
+            if measured.get(key, 0) > limit:
+                violations.append(f"{name}: {key}={measured[key]:.1f} > {limit}")
+    for name, measured in result["endpoints"].items():
+        if measured["error_rate"] > slo["max_error_rate"]:
+            violations.append(f"{name}: error_rate={measured['error_rate']:.3f} > {slo['max_error_rate']}")
+    growth = result["memory_growth_mb"]
+    if growth is not None and growth > slo["max_memory_growth_mb"]:
+        violations.append(f"memory_growth_mb={growth:.1f} > {slo['max_memory_growth_mb']}")
+    return violations
+
+
+def print_result(workers: int, concurrency: int, result: Dict[str, Any]) -> None:
+    print(f"\n== workers={workers} concurrency={concurrency} "
+          f"total={result['total_rps']:.1f} req/s errors={result['error_rate']:.2%}")
+    print(f"{'endpoint':<28} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err':>7}")
+    for name, measured in result["endpoints"].items():
+        print(
+            f"{name:<28} {measured['rps']:8.1f} {measured['p50_ms']:8.1f} {measured['p95_ms']:8.1f} "
+            f"{measured['p99_ms']:8.1f} {measured['max_ms']:8.1f} {measured['error_rate']:7.2%}"
+        )
+    if result["memory_growth_mb"] is not None:
+        print(
+            f"memory: start={result['memory_start_mb']:.1f}MB end={result['memory_end_mb']:.1f}MB "
+            f"peak={result['memory_peak_mb']:.1f}MB growth={result['memory_growth_mb']:+.1f}MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="負荷・長時間（ソーク）試験")
+    parser.add_argument("--workers", default="1", help="uvicornのワーカー数（カンマ区切りで複数構成）")
+    parser.add_argument("--concurrency", type=int, default=32, help="同時接続数")
+    parser.add_argument("--duration", type=float, default=30.0, help="計測時間（秒）")
+    parser.add_argument("--warmup", type=float, default=5.0, help="計測前のウォームアップ時間（秒）")
+    parser.add_argument("--years", type=float, default=0.25, help="データtypeごとに生成する年数")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Query1回ごとに加える待ち時間")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--slo", help="SLO閾値のJSONファイル")
+    parser.add_argument("--output", help="結果を保存するJSONファイル")
+    args = parser.parse_args()
+
+    slo = load_slo(args.slo)
+    report = {"args": vars(args), "slo": slo, "runs": []}
+    failed = False
+    for workers in [int(w) for w in args.workers.split(",")]:
+        server = Server(workers, args.port, args.years, args.latency_ms)
+        server.start()
+        try:
+            result = asyncio.run(run_load(server, args.concurrency, args.duration, args.warmup))
+        finally:
+            server.stop()
+        print_result(workers, args.concurrency, result)
+        violations = check_slo(result, slo)
+        for violation in violations:
+            print(f"SLO違反: {violation}")
+        failed = failed or bool(violations)
+        report["runs"].append({"workers": workers, "result": result, "violations": violations})
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {args.output}")
+    print("\nSLO: " + ("NG" if failed else "OK"))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+JSONシリアライズのマイクロベンチマーク
+
+100k点の系列について、FastAPI標準の経路（jsonable_encoder + 標準json）と
+FastJSONResponse（orjson）のエンコード時間・スループットを比較する。
+
+実行方法（backendディレクトリで）:
+
+    uv run python -m benchmarks.bench_serialize --points 100000 --repeat 5
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.responses import FastJSONResponse
+from app.services.columnar import to_columnar_json
+
+
+def make_points(n: int) -> List[dict]:
+    """5分間隔のセンサーデータをAPIレスポンス形式で生成"""
+    start = datetime(2024, 1, 1)
+    rng = np.random.default_rng(0)
+    values = (20 + 5 * np.sin(np.arange(n) / 288) + rng.normal(0, 0.3, n)).tolist()
+    return [
+        {
+            "timestamp": (start + timedelta(minutes=5 * i)).strftime("%Y-%m-%dT%H:%M:%S") + "Z",
+            "value": values[i],
+            "device_id": "sensor_001",
+            "location": "温室A",
+        }
+        for i in range(n)
+    ]
+
+
+def measure(func: Callable[[], bytes], repeat: int) -> tuple:
+    """関数を繰り返し実行し、中央値の実行時間と出力サイズを返す"""
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(func())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONシリアライズのベンチマーク")
+    parser.add_argument("--points", type=int, default=100_000, help="系列の点数")
+    parser.add_argument("--repeat", type=int, default=5, help="繰り返し回数")
+    args = parser.parse_args()
+
+    points = make_points(args.points)
+    timestamps = np.arange(args.points, dtype=np.int64) * 300_000 + 1_704_067_200_000
+    values = np.array([p["value"] for p in points])
+    meta = {"data_type": "temperature", "device_id": "sensor_001", "location": "温室A"}
+
+    cases = {
+        "jsonable_encoder + json (FastAPI標準)": lambda: JSONResponse(jsonable_encoder(points)).body,
+        "FastJSONResponse (orjson)": lambda: FastJSONResponse(points).body,
+        "FastJSONResponse 列指向JSON": lambda: FastJSONResponse(
+            to_columnar_json(meta, timestamps, values)
+        ).body,
+    }
+
+    print(f"points={args.points}, repeat={args.repeat}")
+    baseline = None
+    for name, func in cases.items():
+        elapsed, size = measure(func, args.repeat)
+        baseline = baseline or elapsed
+        print(
+            f"{name:<40} {elapsed * 1000:9.1f} ms  "
+            f"{args.points / elapsed / 1e6:7.2f} Mpoints/s  "
+            f"{size / 1e6:7.2f} MB  x{baseline / elapsed:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
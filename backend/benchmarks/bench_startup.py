@@ -0,0 +1,77 @@
+"""
+起動時間のベンチマーク
+
+新しいPythonプロセスで app.main をimportする時間と、起動直後の最初のリクエスト
+（/api/v1/health, /api/v1/plants）のレイテンシを計測し、複数回の中央値を表示する。
+あわせて起動直後に重いモジュール（boto3, pandas, plotly）が読み込まれていないかを確認する。
+
+DynamoDBへの接続は最初に必要になるまで行われないため、AWS認証情報はダミーで構わない。
+
+実行方法（backendディレクトリで）:
+
+    uv run python -m benchmarks.bench_startup --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 子プロセスで実行する計測コード
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+client = TestClient(app.main.app)
+timings = {"import_ms": (imported - start) * 1000}
+for path in ("/api/v1/health", "/api/v1/plants"):
+    t = time.perf_counter()
+    status = client.get(path).status_code
+    timings[f"first {path} ms"] = (time.perf_counter() - t) * 1000
+    assert status == 200, (path, status)
+timings["heavy_modules"] = sorted(
+    name for name in ("boto3", "pandas", "plotly") if name in sys.modules
+)
+print(json.dumps(timings))
+"""
+
+
+def run_once() -> dict:
+    """新しいプロセスで1回計測する"""
+    env = dict(os.environ)
+    env.setdefault("AWS_ACCESS_KEY_ID", "dummy")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "dummy")
+    env["WARM_UP_ON_STARTUP"] = "false"
+    env["ENABLE_REQUEST_LOGGING"] = "false"
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="起動時間のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=5, help="繰り返し回数")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.repeat)]
+
+    print(f"repeat={args.repeat}")
+    for key in runs[0]:
+        if key == "heavy_modules":
+            continue
+        samples = [run[key] for run in runs]
+        print(f"{key:<28} {statistics.median(samples):9.1f} ms  (min {min(samples):.1f}, max {max(samples):.1f})")
+    print(f"起動直後に読み込まれた重いモジュール: {', '.join(runs[0]['heavy_modules']) or 'なし'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+オフラインベンチマークスイート
+
+インメモリのDynamoDBスタンドイン（benchmarks/fake_dynamodb.py）に数年分の
+5分間隔データを用意し、AWSに接続せずに以下を計測する。
+
+- サービス関数: クエリ・配列変換・出力形式への変換・並べ替え・間引き・シリアライズ・グラフ描画
+- `/api/v1/*` の各ルート（アプリ全体をTestClient経由で呼び出す）
+
+いずれも表示期間（日数）ごとに計測し、結果はコミットごとのJSONとして
+benchmarks/results/ に保存する。`--compare` で別の結果と比較できる。
+
+実行方法（backendディレクトリで）:
+
+    uv run python -m benchmarks.bench_suite --days 1,30,365 --repeat 5
+    uv run python -m benchmarks.bench_suite --compare benchmarks/results/<commit>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+DATA_TYPES = ("temperature", "pH")
+
+
+def _configure_environment(rollup_dir: str) -> None:
+    """app.* をimportする前に、AWSやネットワークを使わない設定にする"""
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    # 毎回DynamoDB（スタンドイン）まで到達する経路を計測するためキャッシュは無効にする
+    os.environ["CACHE_BACKEND"] = "none"
+    os.environ["WARM_UP_ON_STARTUP"] = "false"
+    os.environ["ENABLE_REQUEST_LOGGING"] = "false"
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["ROLLUP_DB_PATH"] = os.path.join(rollup_dir, "rollups.sqlite3")
+    os.environ["ALERT_DB_PATH"] = os.path.join(rollup_dir, "alerts.sqlite3")
+
+
+def _git_revision() -> str:
+    """現在のコミット（未コミットの変更があれば -dirty 付き）"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """1回ウォームアップしてから繰り返し実行し、中央値・最小値（ミリ秒）を返す"""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(timings), "min_ms": min(timings)}
+
+
+def service_cases(table, end: datetime, days: int) -> Dict[str, Callable[[], Any]]:
+    """サービス関数のベンチマークケース"""
+    import numpy as np
+    from boto3.dynamodb.types import TypeDeserializer
+
+    from app.api.v1 import _to_point
+    from app.responses import dumps
+    from app.services.columnar import encode_binary, to_columnar_json
+    from app.services.downsample import downsample
+    from app.services.dynamodb import DynamoDBService, _attribute_maps_to_arrays
+    from app.services.graph import GraphService
+    from app.services.series import items_to_arrays
+
+    from .fake_dynamodb import _to_attribute_map
+
+    service = DynamoDBService(table=table)
+    start_date = (end - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    end_date = end.strftime("%Y-%m-%d %H:%M:%S")
+    items = service.query_items("temperature", start_date, end_date)
+    points = [_to_point(item) for item in items]
+    # 低レベルクライアントが返す属性マップ（resource APIはこれをDecimalに変換してから返す）
+    attribute_maps = [_to_attribute_map(item) for item in items]
+    deserializer = TypeDeserializer()
+    timestamps, values = items_to_arrays(items)
+    descending = timestamps[::-1].copy()
+    meta = {"data_type": "temperature", "device_id": "sensor_001", "location": "温室A"}
+    # 描画結果のキャッシュを使わず毎回描画する
+    graph = GraphService(cache_entries=0)
+
+    return {
+        "query (query_items)": lambda: service.query_items("temperature", start_date, end_date),
+        "transform (items_to_arrays)": lambda: items_to_arrays(items),
+        "deserialize (resource + items_to_arrays)": lambda: items_to_arrays(
+            [{name: deserializer.deserialize(value) for name, value in item.items()} for item in attribute_maps]
+        ),
+        "deserialize (attribute maps -> arrays)": lambda: _attribute_maps_to_arrays(attribute_maps),
+        "transform (_to_point)": lambda: [_to_point(item) for item in items],
+        "sort (argsort)": lambda: np.argsort(descending, kind="stable"),
+        "downsample (lttb 1000)": lambda: downsample(timestamps, values, 1000, "lttb"),
+        "serialize (json points)": lambda: dumps(points),
+        "serialize (columnar json)": lambda: dumps(to_columnar_json(meta, timestamps, values)),
+        "serialize (binary)": lambda: encode_binary(meta, timestamps, values),
+        "graph render": lambda: graph.create_time_series_plot(items),
+    }
+
+
+def route_cases(client, end: datetime, days: int) -> Dict[str, Callable[[], Any]]:
+    """`/api/v1/*` ルートのベンチマークケース"""
+    start_time = (end - timedelta(days=days)).isoformat()
+    end_time = end.isoformat()
+    limit = days * 288 + 1
+    data = f"/api/v1/data?data_type=temperature&start_time={start_time}&end_time={end_time}"
+    batch = (
+        f"/api/v1/data/batch?data_types={','.join(DATA_TYPES)}"
+        f"&start_time={start_time}&end_time={end_time}&limit={limit}"
+    )
+    summary = f"/api/v1/data/summary?data_type=temperature&start_time={start_time}&end_time={end_time}"
+
+    def get(url: str) -> Callable[[], Any]:
+        def call():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code, response.text[:200])
+            return response.content
+        return call
+
+    return {
+        "GET /data json": get(f"{data}&limit={limit}"),
+        "GET /data max_points=1000": get(f"{data}&max_points=1000"),
+        "GET /data columnar": get(f"{data}&limit={limit}&format=columnar"),
+        "GET /data binary": get(f"{data}&limit={limit}&format=binary"),
+        "GET /data ndjson": get(f"{data}&format=ndjson"),
+        "GET /data/batch": get(batch),
+        "GET /data/summary hour": get(f"{summary}&period=hour"),
+        "GET /data/summary day": get(f"{summary}&period=day"),
+    }
+
+
+def fixed_route_cases(client) -> Dict[str, Callable[[], Any]]:
+    """期間に依存しないルートのベンチマークケース"""
+    def get(url: str) -> Callable[[], Any]:
+        return lambda: client.get(url).content
+
+    return {
+        "GET /data/latest": get("/api/v1/data/latest?data_type=temperature"),
+        "GET /data/latest (multi)": get(f"/api/v1/data/latest?data_types={','.join(DATA_TYPES)}"),
+        "GET /plants": get("/api/v1/plants"),
+        "GET /health": get("/api/v1/health"),
+    }
+
+
+def print_results(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]]) -> None:
+    """結果を表形式で表示（baseline指定時は比率も表示）"""
+    previous = {}
+    if baseline:
+        previous = {(r["group"], r["name"], r["days"]): r for r in baseline["results"]}
+    for result in results:
+        line = (
+            f"{result['group']:<8} {result['name']:<30} days={str(result['days']):>4} "
+            f"points={result['points']:>7} {result['median_ms']:10.2f} ms"
+        )
+        before = previous.get((result["group"], result["name"], result["days"]))
+        if before:
+            line += f"  (前回 {before['median_ms']:.2f} ms, x{before['median_ms'] / result['median_ms']:.2f})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="オフラインベンチマークスイート")
+    parser.add_argument("--years", type=float, default=2.0, help="データtypeごとに生成する年数")
+    parser.add_argument("--days", default="1,30,365", help="計測する表示期間（日、カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=5, help="繰り返し回数")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Query1回ごとに加える待ち時間")
+    parser.add_argument("--only", choices=("service", "route"), help="片方のグループだけ計測")
+    parser.add_argument("--output", default=RESULTS_DIR, help="結果を保存するディレクトリ")
+    parser.add_argument("--compare", help="比較対象の結果JSON")
+    args = parser.parse_args()
+
+    rollup_dir = tempfile.mkdtemp(prefix="bench-rollup-")
+    _configure_environment(rollup_dir)
+
+    from fastapi.testclient import TestClient
+
+    from app.dependencies import provider
+    from app.main import app
+    from app.services.dynamodb import DynamoDBService
+
+    from .fake_dynamodb import FakeClient, build_table
+
+    started = time.perf_counter()
+    table = build_table(DATA_TYPES, years=args.years, latency_seconds=args.latency_ms / 1000)
+    end = datetime.strptime(table.latest_date("temperature"), "%Y-%m-%d %H:%M:%S")
+    print(f"テストデータ生成: {args.years}年分 x {len(DATA_TYPES)}系列 ({time.perf_counter() - started:.1f}s)")
+
+    provider.connect(dynamodb=DynamoDBService(table=table, client=FakeClient(table)))
+    client = TestClient(app)
+
+    results: List[Dict[str, Any]] = []
+    for days in [int(d) for d in args.days.split(",")]:
+        points = days * 288
+        groups = []
+        if args.only in (None, "service"):
+            groups.append(("service", service_cases(table, end, days)))
+        if args.only in (None, "route"):
+            groups.append(("route", route_cases(client, end, days)))
+        for group, cases in groups:
+            for name, func in cases.items():
+                results.append({
+                    "group": group, "name": name, "days": days, "points": points,
+                    **measure(func, args.repeat),
+                })
+    if args.only in (None, "route"):
+        for name, func in fixed_route_cases(client).items():
+            results.append({
+                "group": "route", "name": name, "days": "-", "points": 1,
+                **measure(func, args.repeat),
+            })
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    revision = _git_revision()
+    report = {
+        "meta": {
+            "revision": revision,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+            "dynamodb": provider.dynamodb.stats,
+        },
+        "results": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{revision}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+負荷試験用のASGIエントリポイント
+
+app.main.app をインメモリのDynamoDBスタンドイン（benchmarks/fake_dynamodb.py）に
+接続した状態で公開する。uvicornのワーカーごとにimportされ、それぞれがテストデータを生成する。
+
+    uv run uvicorn benchmarks.fake_app:app --workers 4
+
+環境変数:
+    BENCH_YEARS: データtypeごとに生成する年数（既定 0.25）
+    BENCH_LATENCY_MS: Query1回ごとに加える待ち時間（既定 5）
+"""
+import os
+import tempfile
+
+# app.* をimportする前に、AWSやネットワークを使わない設定にする
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+os.environ.setdefault("WARM_UP_ON_STARTUP", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+_state_dir = tempfile.mkdtemp(prefix="bench-rollup-")
+os.environ.setdefault("ROLLUP_DB_PATH", os.path.join(_state_dir, "rollups.sqlite3"))
+# アラートのエピソード・ウォーターマークも実運用のDBに書き込まない
+os.environ.setdefault("ALERT_DB_PATH", os.path.join(_state_dir, "alerts.sqlite3"))
+
+from app.dependencies import provider  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services.dynamodb import DynamoDBService  # noqa: E402
+
+from .fake_dynamodb import FakeClient, build_table  # noqa: E402
+
+DATA_TYPES = ("temperature", "pH")
+
+table = build_table(
+    DATA_TYPES,
+    years=float(os.environ.get("BENCH_YEARS", "0.25")),
+    latency_seconds=float(os.environ.get("BENCH_LATENCY_MS", "5")) / 1000,
+)
+provider.connect(dynamodb=DynamoDBService(table=table, client=FakeClient(table)))
+
+__all__ = ["app"]
@@ -0,0 +1,233 @@
+"""
+ベンチマーク用のインメモリDynamoDBスタンドイン
+
+`aggdata_table` の Query API のうち、DynamoDBServiceが使う機能だけを再現する。
+
+- KeyConditionExpression（data_type = :type [AND insert_date BETWEEN :start AND :end]）
+- ScanIndexForward / Limit / ExclusiveStartKey / LastEvaluatedKey
+- ProjectionExpression / ExpressionAttributeNames
+- ReturnConsumedCapacity（結果整合性読み込み: 4KBごとに0.5RCU）
+
+DynamoDBと同様に、1回のQueryで読み込むのはプロジェクション適用前のサイズで
+1MBまでとし、それを超える範囲はLastEvaluatedKeyで続きのページを返す。
+
+FakeClient は同じテーブルを低レベルクライアント（属性マップ形式）として見せる。
+"""
+import bisect
+import math
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# 1回のQueryで読み込む上限（バイト）
+PAGE_SIZE_LIMIT = 1024 * 1024
+
+# 合成データの系列ごとの基準値・日変動・ノイズ
+SERIES_PROFILES = {
+    "temperature": (22.0, 4.0, 0.3),
+    "pH": (6.8, 0.2, 0.03),
+}
+
+
+def _attribute_size(name: str, value: Any) -> int:
+    """DynamoDBのアイテムサイズ計算（属性名 + 値）の近似"""
+    if isinstance(value, str):
+        return len(name) + len(value.encode("utf-8"))
+    # 数値は有効桁2桁ごとに1バイト + 1バイト
+    digits = len(str(value).replace("-", "").replace(".", "").lstrip("0")) or 1
+    return len(name) + math.ceil(digits / 2) + 1
+
+
+def item_size(item: Dict[str, Any]) -> int:
+    """アイテムのサイズ（バイト）"""
+    return sum(_attribute_size(name, value) for name, value in item.items())
+
+
+def generate_items(
+    data_type: str,
+    end: datetime,
+    days: float,
+    interval_minutes: int = 5,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    aggdata_table形式の合成データを時刻順で生成
+
+    5分ごとの集計値（avg/min/max/count）を日周期の変動とノイズ付きで作る。
+    insert_dateはクエリと同じ "%Y-%m-%d %H:%M:%S" 形式、数値はboto3と同じくDecimalで保持する。
+    """
+    base, amplitude, noise = SERIES_PROFILES.get(data_type, (10.0, 1.0, 0.1))
+    count = int(days * 24 * 60 / interval_minutes)
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(count) * interval_minutes
+    avg = base + amplitude * np.sin(2 * np.pi * minutes / 1440) + rng.normal(0, noise, count)
+    spread = np.abs(rng.normal(0, noise, count))
+    start = np.datetime64(end - timedelta(minutes=interval_minutes * (count - 1)), "m")
+    dates = np.char.replace(
+        np.datetime_as_string(start + minutes.astype("timedelta64[m]"), unit="s"), "T", " "
+    ).tolist()
+    interval = Decimal(interval_minutes)
+    return [
+        {
+            "data_type": data_type,
+            "insert_date": date,
+            "avg_value": Decimal(f"{value:.3f}"),
+            "min_value": Decimal(f"{value - delta:.3f}"),
+            "max_value": Decimal(f"{value + delta:.3f}"),
+            "count": interval,
+        }
+        for date, value, delta in zip(dates, avg.tolist(), spread.tolist())
+    ]
+
+
+class FakeTable:
+    """DynamoDBのTableリソースのQueryだけを再現するスタンドイン"""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        """
+        Args:
+            latency_seconds: Query1回ごとに加える待ち時間（ネットワーク往復の模擬）
+        """
+        self._latency = latency_seconds
+        self._items: Dict[str, List[Dict[str, Any]]] = {}
+        self._keys: Dict[str, List[str]] = {}
+        self._sizes: Dict[str, List[int]] = {}
+        self.query_count = 0
+
+    def put_items(self, items: Iterable[Dict[str, Any]]) -> None:
+        """アイテムを追加（data_typeごとにinsert_date順で保持）"""
+        touched = set()
+        for item in items:
+            self._items.setdefault(item["data_type"], []).append(item)
+            touched.add(item["data_type"])
+        for data_type in touched:
+            rows = self._items[data_type]
+            rows.sort(key=lambda row: row["insert_date"])
+            self._keys[data_type] = [row["insert_date"] for row in rows]
+            self._sizes[data_type] = [item_size(row) for row in rows]
+
+    def latest_date(self, data_type: str) -> str:
+        """data_typeの最新のinsert_date"""
+        return self._keys[data_type][-1]
+
+    def load(self) -> None:
+        """テーブルの存在確認（常に成功）"""
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        self.query_count += 1
+        if self._latency:
+            time.sleep(self._latency)
+
+        values = kwargs["ExpressionAttributeValues"]
+        data_type = values[":type"]
+        keys = self._keys.get(data_type, [])
+        rows = self._items.get(data_type, [])
+        sizes = self._sizes.get(data_type, [])
+
+        lo, hi = 0, len(keys)
+        if ":start" in values:
+            lo = bisect.bisect_left(keys, values[":start"])
+            hi = bisect.bisect_right(keys, values[":end"])
+
+        forward = kwargs.get("ScanIndexForward", True)
+        start_key = kwargs.get("ExclusiveStartKey")
+        if start_key:
+            if forward:
+                lo = bisect.bisect_right(keys, start_key["insert_date"], lo, hi)
+            else:
+                hi = bisect.bisect_left(keys, start_key["insert_date"], lo, hi)
+
+        limit = kwargs.get("Limit")
+        indices = range(lo, hi) if forward else range(hi - 1, lo - 1, -1)
+        selected: List[int] = []
+        read_bytes = 0
+        for index in indices:
+            if read_bytes + sizes[index] > PAGE_SIZE_LIMIT or (limit and len(selected) >= limit):
+                break
+            read_bytes += sizes[index]
+            selected.append(index)
+
+        projection: Optional[List[str]] = None
+        if "ProjectionExpression" in kwargs:
+            names = kwargs.get("ExpressionAttributeNames", {})
+            projection = [
+                names.get(name.strip(), name.strip())
+                for name in kwargs["ProjectionExpression"].split(",")
+            ]
+
+        if projection:
+            items = [
+                {name: rows[index][name] for name in projection if name in rows[index]}
+                for index in selected
+            ]
+        else:
+            items = [dict(rows[index]) for index in selected]
+
+        response: Dict[str, Any] = {"Items": items, "Count": len(items), "ScannedCount": len(items)}
+        remaining = (hi - lo) - len(selected)
+        if selected and remaining > 0:
+            last = rows[selected[-1]]
+            response["LastEvaluatedKey"] = {"data_type": data_type, "insert_date": last["insert_date"]}
+        if kwargs.get("ReturnConsumedCapacity", "NONE") != "NONE":
+            response["ConsumedCapacity"] = {
+                "TableName": "aggdata_table",
+                "CapacityUnits": math.ceil(max(read_bytes, 1) / 4096) * 0.5,
+            }
+        return response
+
+
+def _to_attribute(value: Any) -> Dict[str, str]:
+    """値を低レベルクライアントの属性値（{'S': ...} / {'N': ...}）に変換"""
+    if isinstance(value, str):
+        return {"S": value}
+    return {"N": str(value)}
+
+
+def _from_attribute(value: Dict[str, str]) -> Any:
+    if "S" in value:
+        return value["S"]
+    return Decimal(value["N"])
+
+
+def _to_attribute_map(item: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    return {name: _to_attribute(value) for name, value in item.items()}
+
+
+class FakeClient:
+    """FakeTableを低レベルクライアント（boto3.client('dynamodb')）のQueryとして見せるスタンドイン"""
+
+    def __init__(self, table: FakeTable):
+        self.table = table
+
+    def query(self, TableName: str, **kwargs) -> Dict[str, Any]:
+        kwargs["ExpressionAttributeValues"] = {
+            name: _from_attribute(value)
+            for name, value in kwargs["ExpressionAttributeValues"].items()
+        }
+        if "ExclusiveStartKey" in kwargs:
+            kwargs["ExclusiveStartKey"] = {
+                name: _from_attribute(value) for name, value in kwargs["ExclusiveStartKey"].items()
+            }
+        response = self.table.query(**kwargs)
+        response["Items"] = [_to_attribute_map(item) for item in response["Items"]]
+        if "LastEvaluatedKey" in response:
+            response["LastEvaluatedKey"] = _to_attribute_map(response["LastEvaluatedKey"])
+        return response
+
+
+def build_table(
+    data_types: Iterable[str] = ("temperature", "pH"),
+    years: float = 2.0,
+    end: Optional[datetime] = None,
+    latency_seconds: float = 0.0,
+) -> FakeTable:
+    """data_typeごとにyears年分の5分間隔データを持つテーブルを作る"""
+    end = end or datetime.now().replace(second=0, microsecond=0)
+    end -= timedelta(minutes=end.minute % 5)
+    table = FakeTable(latency_seconds=latency_seconds)
+    for seed, data_type in enumerate(data_types):
+        table.put_items(generate_items(data_type, end, days=365 * years, seed=seed))
+    return table
@@ -0,0 +1,10 @@
+"""
+テスト共通設定
+
+Settings() はAWS認証情報を必須とするため、未設定の環境ではダミー値を使う
+（DynamoDBへの接続はモックまたはスタンドインで行う）。
+"""
+import os
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
@@ -1,10 +1,25 @@
 """
 サービス層のテスト
 """
+import numpy as np
 import pytest
 from unittest.mock import Mock, patch
 from app.services.dynamodb import DynamoDBService
+from app.services.async_dynamodb import AsyncDynamoDBService
 from app.services.graph import GraphService
+from app.services.latest import LatestValueCache
+from app.services.live import LiveHub
+from app.services.downsample import downsample
+from app.services.rollup import RollupService, RollupStore
+from app.services.local_store import LocalReplica, LocalSeriesStore
+from app.services.alerts import AlertEngine, AlertStore, evaluate_episodes
+from app.services.cache import MemoryLRUCache, QueryCache
+from app.services.columnar import decode_binary, encode_binary, to_columnar_json
+from app.services.plants import PlantRegistry
+from app.services.series import arrays_to_items, items_to_arrays, to_epoch_ms
+from app.responses import FastJSONResponse
+from app.middleware import MetricsMiddleware, RequestLoggingMiddleware
+from app.metrics import MetricsRegistry, timed
 
 
 class TestDynamoDBService:
@@ -52,6 +67,1076 @@ class TestDynamoDBService:
         
         assert len(result) == 0
 
+    @patch('app.services.dynamodb.boto3')
+    def test_get_data_follows_pagination(self, mock_boto3):
+        """LastEvaluatedKeyを辿って全ページを取得するテスト"""
+        mock_table = Mock()
+        mock_table.query.side_effect = [
+            {
+                'Items': [{'insert_date': '2025-01-26T10:00:00', 'avg_value': 23.5}],
+                'LastEvaluatedKey': {'data_type': 'temperature', 'insert_date': '2025-01-26T10:00:00'}
+            },
+            {
+                'Items': [{'insert_date': '2025-01-26T10:05:00', 'avg_value': 24.0}]
+            }
+        ]
+        mock_boto3.resource.return_value.Table.return_value = mock_table
+
+        service = DynamoDBService()
+        result = service.get_data('temperature', '2025-01-19', '2025-01-26')
+
+        assert [item['avg_value'] for item in result] == [23.5, 24.0]
+        assert mock_table.query.call_count == 2
+        second_call = mock_table.query.call_args_list[1].kwargs
+        assert second_call['ExclusiveStartKey']['insert_date'] == '2025-01-26T10:00:00'
+        assert 'ProjectionExpression' in second_call
+
+    @patch('app.services.dynamodb.boto3')
+    def test_get_data_limit_stops_paging(self, mock_boto3):
+        """limitに達したら以降のページを取得しないテスト"""
+        mock_table = Mock()
+        mock_table.query.return_value = {
+            'Items': [{'insert_date': '2025-01-26T10:00:00', 'avg_value': 23.5}] * 2,
+            'LastEvaluatedKey': {'data_type': 'temperature', 'insert_date': '2025-01-26T10:05:00'}
+        }
+        mock_boto3.resource.return_value.Table.return_value = mock_table
+
+        service = DynamoDBService()
+        result = service.get_data('temperature', '2025-01-19', '2025-01-26', limit=2)
+
+        assert len(result) == 2
+        assert mock_table.query.call_count == 1
+        assert mock_table.query.call_args.kwargs['Limit'] == 2
+
+    @patch('app.services.dynamodb.boto3')
+    def test_get_latest(self, mock_boto3):
+        """最新データを降順・1件のクエリで取得するテスト"""
+        mock_table = Mock()
+        mock_table.query.return_value = {
+            'Items': [{'insert_date': '2025-01-26T10:30:00', 'avg_value': 23.5}]
+        }
+        mock_boto3.resource.return_value.Table.return_value = mock_table
+
+        service = DynamoDBService()
+        result = service.get_latest('temperature')
+
+        assert result['insert_date'] == '2025-01-26T10:30:00'
+        kwargs = mock_table.query.call_args.kwargs
+        assert kwargs['ScanIndexForward'] is False
+        assert kwargs['Limit'] == 1
+
+    @patch('app.services.dynamodb.boto3')
+    def test_query_stats(self, mock_boto3):
+        """ページ数・件数・消費キャパシティを集計するテスト"""
+        mock_table = Mock()
+        mock_table.query.side_effect = [
+            {
+                'Items': [{'insert_date': '2025-01-26T10:00:00', 'avg_value': 23.5}] * 3,
+                'LastEvaluatedKey': {'data_type': 'temperature', 'insert_date': '2025-01-26T10:00:00'},
+                'ConsumedCapacity': {'TableName': 'aggdata_table', 'CapacityUnits': 1.5}
+            },
+            {
+                'Items': [{'insert_date': '2025-01-26T10:05:00', 'avg_value': 24.0}],
+                'ConsumedCapacity': {'TableName': 'aggdata_table', 'CapacityUnits': 0.5}
+            }
+        ]
+        mock_boto3.resource.return_value.Table.return_value = mock_table
+
+        service = DynamoDBService()
+        service.query_items('temperature', '2025-01-19', '2025-01-26')
+
+        assert mock_table.query.call_args.kwargs['ReturnConsumedCapacity'] == 'TOTAL'
+        assert service.stats['queries'] == 1
+        assert service.stats['pages'] == 2
+        assert service.stats['items'] == 4
+        assert service.stats['consumed_capacity_units'] == 2.0
+
+    @patch('app.services.dynamodb.boto3')
+    def test_injected_table_pages_by_size(self, mock_boto3):
+        """テーブルを渡した場合はAWSに接続せず、1MB単位のページを辿るテスト"""
+        from datetime import datetime
+        from benchmarks.fake_dynamodb import FakeTable, generate_items
+
+        table = FakeTable()
+        table.put_items(generate_items('temperature', datetime(2025, 3, 2), days=60))
+        service = DynamoDBService(table=table)
+
+        items = service.query_items('temperature', '2025-01-01 00:00:00', '2025-03-02 00:00:00')
+
+        mock_boto3.resource.assert_not_called()
+        assert len(items) == 17280
+        assert items[0]['insert_date'] < items[-1]['insert_date']
+        assert service.stats['pages'] == table.query_count > 1
+
+    def test_query_arrays_parses_attribute_maps(self):
+        """低レベルクライアントの属性マップを直接配列に変換し、resource経由と同じ値になるテスト"""
+        from datetime import datetime
+        from benchmarks.fake_dynamodb import FakeClient, FakeTable, generate_items
+        from app.services.series import items_to_arrays
+
+        table = FakeTable()
+        table.put_items(generate_items('temperature', datetime(2025, 3, 2), days=60))
+        service = DynamoDBService(table=table, client=FakeClient(table))
+        start, end = '2025-01-01 00:00:00', '2025-03-02 00:00:00'
+
+        timestamps, values = service.query_arrays('temperature', start, end)
+        expected_timestamps, expected_values = items_to_arrays(service.query_items('temperature', start, end))
+
+        assert timestamps.dtype == np.int64 and values.dtype == np.float64
+        np.testing.assert_array_equal(timestamps, expected_timestamps)
+        np.testing.assert_array_equal(values, expected_values)
+        limited, _ = service.query_arrays('temperature', start, end, limit=5)
+        np.testing.assert_array_equal(limited, expected_timestamps[:5])
+
+
+class TestAsyncDynamoDBService:
+    """AsyncDynamoDBServiceのテスト"""
+
+    async def test_queries_run_concurrently(self):
+        """クエリがスレッドプールで並行実行されることのテスト"""
+        import asyncio
+        import threading
+
+        barrier = threading.Barrier(3, timeout=5)
+
+        def get_data(*args, **kwargs):
+            barrier.wait()
+            return []
+
+        service = Mock()
+        service.get_data.side_effect = get_data
+        async_service = AsyncDynamoDBService(service, max_concurrency=3)
+
+        # 3件が同時に実行されていなければBarrierがタイムアウトする
+        # （同一クエリはまとめられるため、期間の異なるクエリを使う）
+        results = await asyncio.gather(*[
+            async_service.get_data('temperature', f'2025-01-1{day}', '2025-01-26') for day in range(3)
+        ])
+
+        assert results == [[], [], []]
+        async_service.shutdown()
+
+    async def test_identical_queries_are_coalesced(self):
+        """実行中の同一クエリは1回だけ実行して結果を共有するテスト"""
+        import asyncio
+        import threading
+
+        release = threading.Event()
+
+        def query_items(*args, **kwargs):
+            release.wait(timeout=5)
+            return [{'avg_value': 1}]
+
+        service = Mock()
+        service.query_items.side_effect = query_items
+        async_service = AsyncDynamoDBService(service)
+
+        calls = [
+            asyncio.ensure_future(async_service.query_items('temperature', '2025-01-19', '2025-01-26'))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0.05)
+        release.set()
+        results = await asyncio.gather(*calls)
+
+        assert all(result == [{'avg_value': 1}] for result in results)
+        assert service.query_items.call_count == 1
+        assert async_service.single_flight.stats == {'calls': 5, 'executions': 1, 'coalesced': 4}
+        assert async_service.single_flight.inflight == 0
+
+        # 完了後の呼び出しは新たに実行する
+        await async_service.query_items('temperature', '2025-01-19', '2025-01-26')
+        assert service.query_items.call_count == 2
+        async_service.shutdown()
+
+    async def test_iter_pages(self):
+        """ページ単位で順に非同期取得できることのテスト"""
+        service = Mock()
+        service.iter_pages.return_value = iter([[{'avg_value': 1}], [{'avg_value': 2}]])
+        async_service = AsyncDynamoDBService(service)
+
+        pages = [page async for page in async_service.iter_pages('temperature', '2025-01-19', '2025-01-26')]
+
+        assert pages == [[{'avg_value': 1}], [{'avg_value': 2}]]
+        async_service.shutdown()
+
+
+class TestLatestValueCache:
+    """LatestValueCacheのテスト"""
+
+    def test_get_caches_value(self):
+        """TTL内はフェッチせずにキャッシュを返すテスト"""
+        fetcher = Mock(return_value={'insert_date': '2025-01-26T10:30:00', 'avg_value': 23.5})
+        cache = LatestValueCache(fetcher, ttl_seconds=60)
+
+        assert cache.get('temperature')['avg_value'] == 23.5
+        assert cache.get('temperature')['avg_value'] == 23.5
+        assert fetcher.call_count == 1
+
+    def test_get_many(self):
+        """複数data_typeの一括取得テスト"""
+        fetcher = Mock(side_effect=lambda t: None if t == 'pH' else {'avg_value': 1.0})
+        cache = LatestValueCache(fetcher, ttl_seconds=60)
+
+        result = cache.get_many(['temperature', 'pH', 'temperature'])
+
+        assert result == {'temperature': {'avg_value': 1.0}, 'pH': None}
+        assert fetcher.call_count == 2
+
+    def test_get_many_isolates_failures(self):
+        """1つのdata_typeの取得に失敗しても、他のdata_typeの値は返すテスト"""
+        def fetcher(data_type):
+            if data_type == 'pH':
+                raise RuntimeError('throttled')
+            return {'avg_value': 1.0}
+        cache = LatestValueCache(fetcher, ttl_seconds=60)
+        cache.get('temperature')
+
+        result = cache.get_many(['temperature', 'pH', 'humidity'])
+
+        assert result == {'temperature': {'avg_value': 1.0}, 'pH': None, 'humidity': {'avg_value': 1.0}}
+        assert 'pH' not in cache._entries
+
+    def test_stale_value_is_served_while_refreshing(self):
+        """TTL切れでも保持中の値を返し、裏で更新するテスト"""
+        fetcher = Mock(side_effect=[{'avg_value': 1.0}, {'avg_value': 2.0}])
+        cache = LatestValueCache(fetcher, ttl_seconds=0)
+
+        assert cache.get('temperature') == {'avg_value': 1.0}
+        assert cache.get('temperature') == {'avg_value': 1.0}
+        cache._executor.shutdown(wait=True)
+        assert fetcher.call_count == 2
+        assert cache._entries['temperature'].item == {'avg_value': 2.0}
+
+
+class TestLiveHub:
+    """LiveHubのテスト"""
+
+    async def test_one_poller_fans_out_to_all_subscribers(self):
+        """購読者数に関係なくdata_typeごとに1回だけ取得して全員に配ることのテスト"""
+        import asyncio
+        from unittest.mock import AsyncMock
+
+        source = Mock()
+        source.get_latest = AsyncMock(return_value={'insert_date': '2025-01-26 10:00:00', 'avg_value': 1.0})
+        source.query_items = AsyncMock(return_value=[
+            {'insert_date': '2025-01-26 10:00:00', 'avg_value': 1.0},
+            {'insert_date': '2025-01-26 10:05:00', 'avg_value': 2.0},
+        ])
+        hub = LiveHub(source, poll_interval_seconds=0.01)
+
+        queues = [hub.subscribe(['temperature']) for _ in range(3)]
+        readings = [
+            [await asyncio.wait_for(queue.get(), 1) for _ in range(2)] for queue in queues
+        ]
+
+        assert source.get_latest.await_count == 1
+        assert source.query_items.await_args.args[1] == '2025-01-26 10:00:00'
+        for received in readings:
+            assert [item['avg_value'] for _, item in received] == [1.0, 2.0]
+
+        for queue in queues:
+            hub.unsubscribe(['temperature'], queue)
+        assert hub.subscriber_count == 0
+        assert not hub._pollers
+
+
+class TestDownsample:
+    """ダウンサンプリングのテスト"""
+
+    def setup_method(self):
+        n = 10000
+        self.timestamps = np.arange(n, dtype=np.int64) * 300000
+        self.values = np.sin(np.arange(n) / 100.0)
+        self.values[1234] = 50.0
+        self.values[8765] = -50.0
+
+    @pytest.mark.parametrize("method", ["lttb", "minmax"])
+    def test_keeps_peaks_and_troughs(self, method):
+        """ピークと谷が残ることのテスト"""
+        timestamps, values = downsample(self.timestamps, self.values, 200, method)
+
+        assert len(values) <= 200
+        assert values.max() == 50.0
+        assert values.min() == -50.0
+        assert np.all(np.diff(timestamps) > 0)
+
+    def test_avg(self):
+        """バケット平均のテスト"""
+        timestamps, values = downsample(self.timestamps, self.values, 100, "avg")
+
+        assert len(values) == 100
+        assert np.all(np.diff(timestamps) > 0)
+
+    def test_sub_second_timestamps_keep_milliseconds(self):
+        """秒未満の平均時刻はJSONでもミリ秒まで出力するテスト"""
+        from app.services.series import format_timestamps
+
+        timestamps, _ = downsample(np.array([0, 1000, 2000], dtype=np.int64), np.zeros(3), 2, "avg")
+
+        assert format_timestamps(timestamps) == ['1970-01-01T00:00:00.000Z', '1970-01-01T00:00:01.500Z']
+        assert format_timestamps(np.array([0, 2000])) == ['1970-01-01T00:00:00Z', '1970-01-01T00:00:02Z']
+
+    def test_small_series_is_unchanged(self):
+        """点数がmax_points以下なら変更しないテスト"""
+        timestamps, values = downsample(self.timestamps[:10], self.values[:10], 100)
+
+        assert len(values) == 10
+
+    def test_unknown_method(self):
+        """未対応手法のテスト"""
+        with pytest.raises(ValueError):
+            downsample(self.timestamps, self.values, 100, "unknown")
+
+
+class TestRollupService:
+    """RollupServiceのテスト"""
+
+    def _items(self, dates):
+        return [{'insert_date': d, 'avg_value': float(i + 1)} for i, d in enumerate(dates)]
+
+    def _source(self, items):
+        """iter_pagesでitemsを返し、query_arraysでは範囲内の行を返すソース"""
+        timestamps, values = items_to_arrays(items)
+
+        def query_arrays(data_type, start, end, limit=None):
+            keep = (timestamps >= to_epoch_ms(start)) & (timestamps <= to_epoch_ms(end))
+            return timestamps[keep], values[keep]
+
+        source = Mock()
+        source.iter_pages.return_value = iter([items])
+        source.query_arrays.side_effect = query_arrays
+        return source
+
+    def test_summarize_by_day(self):
+        """日単位のバケット集計テスト"""
+        source = self._source(self._items([
+            '2025-01-26T10:00:00', '2025-01-26T11:00:00', '2025-01-27T09:00:00'
+        ]))
+        service = RollupService(source, RollupStore(':memory:'))
+
+        result = service.summarize('temperature', 'day', '2025-01-26 00:00:00', '2025-01-31 00:00:00')
+
+        assert result['count'] == 3
+        assert result['minimum'] == 1.0
+        assert result['maximum'] == 3.0
+        assert [b['start'] for b in result['buckets']] == ['2025-01-26T00:00:00', '2025-01-27T00:00:00']
+        assert result['buckets'][0]['sum'] == 3.0
+
+    def test_week_and_month_buckets(self):
+        """週は月曜、月は1日に揃うことのテスト"""
+        source = self._source(self._items(['2025-01-30T10:00:00']))
+        service = RollupService(source, RollupStore(':memory:'))
+
+        week = service.summarize('temperature', 'week', '2025-01-01 00:00:00', '2025-02-28 00:00:00')
+        month = service.summarize('temperature', 'month', '2025-01-01 00:00:00', '2025-02-28 00:00:00')
+
+        assert week['buckets'][0]['start'] == '2025-01-27T00:00:00'
+        assert month['buckets'][0]['start'] == '2025-01-01T00:00:00'
+
+    def test_partial_edge_buckets_only_count_range(self):
+        """startとendがバケットの途中にかかる場合、範囲内のデータだけを集計するテスト"""
+        # 10分間隔で1月分。範囲内は1.0、範囲外は100.0
+        timestamps = np.arange(
+            np.datetime64('2024-01-01', 'ms'), np.datetime64('2024-02-01', 'ms'), np.timedelta64(10, 'm')
+        ).astype(np.int64)
+        inside = (timestamps >= to_epoch_ms('2024-01-20 00:30:00')) & (timestamps < to_epoch_ms('2024-01-21 00:30:00'))
+        items = arrays_to_items('temperature', timestamps, np.where(inside, 1.0, 100.0), ('insert_date', 'avg_value'))
+        service = RollupService(self._source(items), RollupStore(':memory:'))
+
+        month = service.summarize('temperature', 'month', '2024-01-20 00:30:00', '2024-01-21 00:29:59')
+        day = service.summarize('temperature', 'day', '2024-01-20 00:30:00', '2024-01-21 00:29:59')
+
+        assert (month['count'], month['minimum'], month['maximum']) == (144, 1.0, 1.0)
+        assert [(b['start'], b['count']) for b in month['buckets']] == [('2024-01-01T00:00:00', 144)]
+        assert [(b['start'], b['count'], b['max']) for b in day['buckets']] == [
+            ('2024-01-20T00:00:00', 141, 1.0), ('2024-01-21T00:00:00', 3, 1.0)
+        ]
+
+    def test_refresh_is_incremental(self):
+        """ウォーターマーク以降のデータだけを取り込むテスト"""
+        source = self._source(self._items(['2025-01-26T10:00:00', '2025-01-26T11:00:00']))
+        source.iter_pages.side_effect = [
+            iter([self._items(['2025-01-26T10:00:00', '2025-01-26T11:00:00'])]),
+            iter([[
+                {'insert_date': '2025-01-26T11:00:00', 'avg_value': 2.0},
+                {'insert_date': '2025-01-26T12:00:00', 'avg_value': 10.0},
+            ]]),
+        ]
+        service = RollupService(source, RollupStore(':memory:'))
+
+        assert service.refresh('temperature', force=True) == 2
+        assert service.refresh('temperature', force=True) == 1
+        assert source.iter_pages.call_args.args[1] == '2025-01-26T11:00:00'
+
+        result = service.summarize('temperature', 'day', '2025-01-26 00:00:00', '2025-01-26 23:59:59')
+        assert result['count'] == 3
+        assert result['maximum'] == 10.0
+
+    def test_workers_sharing_db_do_not_double_count(self, tmp_path):
+        """同じDBファイルを共有する2つのワーカーが同じ範囲を二重に取り込まないテスト"""
+        path = str(tmp_path / 'rollups.sqlite3')
+        dates = ['2025-01-26T10:00:00', '2025-01-26T11:00:00', '2025-01-26T12:00:00']
+        first = RollupService(self._source(self._items(dates)), RollupStore(path))
+
+        def pages_after_first_worker(*args):
+            # ウォーターマークを読んだ後、取り込む前にもう一方のワーカーが更新を終える
+            first.refresh('temperature', force=True)
+            yield self._items(dates)
+
+        source = self._source(self._items(dates))
+        source.iter_pages.side_effect = pages_after_first_worker
+        second = RollupService(source, RollupStore(path))
+
+        assert second.refresh('temperature', force=True) == 0
+        result = second.summarize('temperature', 'day', '2025-01-26 00:00:00', '2025-01-26 23:59:59')
+        assert result['count'] == 3
+
+    def test_merged_statistics_match_raw_data(self):
+        """ページをまたいでマージしたバケットの標準偏差・分位点が元データと一致するテスト"""
+        values = np.random.default_rng(0).normal(20.0, 3.0, 20000)
+        timestamps = np.datetime64('2025-01-01', 'ms').astype(np.int64) + np.arange(20000) * 60000
+        items = arrays_to_items('temperature', timestamps, values, ('insert_date', 'avg_value'))
+        source = self._source(items)
+        source.iter_pages.return_value = iter([items[i:i + 3000] for i in range(0, 20000, 3000)])
+        service = RollupService(source, RollupStore(':memory:'))
+
+        result = service.summarize('temperature', 'day', '2025-01-01 00:00:00', '2025-02-28 00:00:00')
+
+        assert result['std'] == pytest.approx(values.std())
+        for key, q in (('p5', 0.05), ('p50', 0.5), ('p95', 0.95)):
+            assert result[key] == pytest.approx(np.quantile(values, q), abs=0.1)
+        assert result['buckets'][0]['std'] == pytest.approx(values[:1440].std())
+
+    def test_time_above_threshold(self):
+        """しきい値を超えていた時間（直前の計測からの間隔の合計）のテスト"""
+        # 1分間隔で前半30分は20度、後半30分は30度
+        source = self._source([
+            {'insert_date': f'2025-01-26T10:{minute:02d}:00', 'avg_value': 20.0 if minute < 30 else 30.0}
+            for minute in range(60)
+        ])
+        service = RollupService(source, RollupStore(':memory:'))
+
+        result = service.summarize('temperature', 'hour', '2025-01-26 00:00:00', '2025-01-26 23:59:59',
+                                   threshold=25.0)
+        assert result['time_above_threshold_seconds'] == pytest.approx(1800.0, rel=0.05)
+        assert service.summarize('temperature', 'hour', '2025-01-26 00:00:00',
+                                 '2025-01-26 23:59:59')['time_above_threshold_seconds'] is None
+
+
+class TestLocalSeriesStore:
+    """LocalSeriesStore / LocalReplicaのテスト"""
+
+    def _items(self, dates, start=1.0):
+        return [{'insert_date': d, 'avg_value': start + i} for i, d in enumerate(dates)]
+
+    def test_range_query_returns_memmap_slices(self, tmp_path):
+        """範囲クエリがmemmapのスライスを返し、ページ取得もできることのテスト"""
+        store = LocalSeriesStore(str(tmp_path), page_size=2)
+        store.append_items('temperature', self._items([
+            '2025-01-26 10:00:00', '2025-01-26 10:05:00', '2025-01-26 10:10:00', '2025-01-26 10:15:00'
+        ]))
+
+        timestamps, values = store.query_arrays('temperature', '2025-01-26 10:05:00', '2025-01-26 10:10:00')
+
+        assert isinstance(timestamps, np.memmap) and isinstance(values, np.memmap)
+        assert values.tolist() == [2.0, 3.0]
+        pages = list(store.iter_pages('temperature', '2025-01-26 00:00:00', '2025-01-27 00:00:00',
+                                      limit=3, ascending=False))
+        assert [len(page) for page in pages] == [2, 1]
+        assert pages[0][0] == {'insert_date': '2025-01-26 10:15:00', 'avg_value': 4.0}
+        assert store.get_latest('temperature')['insert_date'] == '2025-01-26 10:15:00'
+        assert store.get_latest('pH') is None
+
+    def test_append_only_skips_existing_rows(self, tmp_path):
+        """保存済みの最終時刻以前の行は追記されないことのテスト"""
+        store = LocalSeriesStore(str(tmp_path))
+        assert store.append_items('pH', self._items(['2025-01-26 10:00:00', '2025-01-26 10:05:00'])) == 2
+        assert store.append_items('pH', self._items(['2025-01-26 10:05:00', '2025-01-26 10:10:00'])) == 1
+
+        # 別インスタンス（別ワーカー）からも追記分が読める
+        _, values = LocalSeriesStore(str(tmp_path)).query_arrays('pH', '2025-01-01', '2025-12-31')
+        assert values.tolist() == [1.0, 2.0, 2.0]
+        with pytest.raises(ValueError):
+            store.append_items('../pH', self._items(['2025-01-26 10:00:00']))
+
+    def test_replica_syncs_from_watermark(self, tmp_path):
+        """レプリカがローカルの最終時刻以降だけを同期し、最新値はプライマリから返すテスト"""
+        primary = Mock()
+        primary.iter_pages.side_effect = [
+            iter([self._items(['2025-01-26 10:00:00', '2025-01-26 10:05:00'])]),
+            iter([self._items(['2025-01-26 10:05:00', '2025-01-26 10:10:00'], start=2.0)]),
+        ]
+        primary.get_latest.return_value = {'insert_date': '2025-01-26 10:10:00', 'avg_value': 3.0}
+        replica = LocalReplica(primary, LocalSeriesStore(str(tmp_path)), sync_interval_seconds=3600)
+
+        assert len(replica.query_items('temperature', '2025-01-26 00:00:00', '2025-01-26 23:59:59')) == 2
+        assert replica.sync('temperature') == 0  # 同期間隔内
+        assert replica.sync('temperature', force=True) == 1
+        assert primary.iter_pages.call_args.args[1] == '2025-01-26 10:05:00'
+        assert replica.get_latest('temperature')['avg_value'] == 3.0
+
+
+class TestHotWindowStore:
+    """HotWindowStoreのテスト"""
+
+    def _source(self, tmp_path, minutes):
+        """現在から遡ってminutes分前まで1分ごとのデータを持つローカルストア"""
+        from datetime import datetime, timedelta
+
+        now = datetime.now().replace(second=0, microsecond=0)
+        dates = [(now - timedelta(minutes=m)).strftime('%Y-%m-%d %H:%M:%S') for m in range(minutes, 0, -1)]
+        store = LocalSeriesStore(str(tmp_path))
+        store.append_items('temperature', [{'insert_date': d, 'avg_value': float(i)} for i, d in enumerate(dates)])
+        return store, now
+
+    def test_serves_window_from_memory_and_appends_tail(self, tmp_path):
+        """ウィンドウ内の範囲はストレージに問い合わせず、更新では新着分だけを取り込むテスト"""
+        from datetime import timedelta
+        from app.services.hot_window import HotWindowStore
+
+        store, now = self._source(tmp_path, 120)
+        source = Mock(wraps=store)
+        hot = HotWindowStore(source, window_days=1, max_points=1000)
+        fmt = '%Y-%m-%d %H:%M:%S'
+        start, end = (now - timedelta(minutes=60)).strftime(fmt), now.strftime(fmt)
+
+        _, values = hot.query_arrays('temperature', start, end)
+        assert values.tolist() == [float(i) for i in range(60, 120)]
+        hot.query_arrays('temperature', start, end, limit=5)
+        assert source.query_arrays.call_count == 1
+
+        store.append_items('temperature', [{'insert_date': now.strftime(fmt), 'avg_value': 500.0}])
+        assert hot.refresh() == 1
+        assert hot.get_latest('temperature') == {'insert_date': now.strftime(fmt), 'avg_value': 500.0}
+        assert [len(page) for page in hot.iter_pages('temperature', start, end)] == [61]
+        assert hot.stats['hits'] == 4 and hot.stats['misses'] == 0
+
+        # ウィンドウより古い範囲はストレージに委ねる
+        hot.query_arrays('temperature', '2000-01-01 00:00:00', end)
+        assert source.query_arrays.call_count == 3 and hot.stats['misses'] == 1
+
+    def test_full_window_keeps_newest_points(self, tmp_path):
+        """容量を超えたら古い点を捨て、捨てた範囲のクエリはストレージに委ねるテスト"""
+        from datetime import timedelta
+        from app.services.hot_window import HotWindowStore
+
+        store, now = self._source(tmp_path, 100)
+        source = Mock(wraps=store)
+        hot = HotWindowStore(source, window_days=1, max_points=40)
+        fmt = '%Y-%m-%d %H:%M:%S'
+
+        _, values = hot.query_arrays('temperature', (now - timedelta(minutes=20)).strftime(fmt), now.strftime(fmt))
+        assert values.tolist() == [float(i) for i in range(80, 100)]
+        timestamps, _, covered_from = hot._windows['temperature'].snapshot
+        assert len(timestamps) == 30 and covered_from == timestamps[0]
+
+        _, values = hot.query_arrays('temperature', (now - timedelta(minutes=50)).strftime(fmt), now.strftime(fmt))
+        assert len(values) == 50 and source.query_arrays.call_count == 2
+
+    def test_unknown_series_do_not_take_window_slots(self, tmp_path):
+        """期間内にデータがない系列はウィンドウを作らず、保持中の系列を追い出さないテスト"""
+        from datetime import timedelta
+        from app.services.hot_window import HotWindowStore
+
+        store, now = self._source(tmp_path, 10)
+        source = Mock(wraps=store)
+        hot = HotWindowStore(source, window_days=1, max_points=100, max_series=2)
+        fmt = '%Y-%m-%d %H:%M:%S'
+        start, end = (now - timedelta(minutes=5)).strftime(fmt), now.strftime(fmt)
+
+        hot.get_latest('temperature')
+        for i in range(16):
+            assert hot.get_latest(f'fake{i}') is None
+            assert len(hot.query_arrays(f'fake{i}', start, end)[0]) == 0
+
+        assert list(hot._windows) == ['temperature']
+        # 読み込みはtemperatureの1回だけで、他はストレージにそのまま委ねる
+        assert source.query_arrays.call_count == 1 + 16
+        # データがないという判定は更新間隔の間保持する
+        calls = source.get_latest.call_count
+        hot.query_arrays('fake0', start, end)
+        assert source.get_latest.call_count == calls
+
+
+    def test_shared_window_is_refreshed_by_one_worker(self, tmp_path):
+        """共有ホットウィンドウを1つのワーカーだけが更新し、他のワーカーはmmapから読むテスト"""
+        from datetime import timedelta
+        from app.services.shared_window import SharedHotWindowStore
+
+        store, now = self._source(tmp_path / 'source', 100)
+        source = Mock(wraps=store)
+        shared = str(tmp_path / 'shared')
+        # 同じディレクトリを使う2つのワーカー
+        first = SharedHotWindowStore(source, shared, window_days=1, max_points=120)
+        second = SharedHotWindowStore(source, shared, window_days=1, max_points=120)
+        fmt = '%Y-%m-%d %H:%M:%S'
+        start, end = (now - timedelta(minutes=30)).strftime(fmt), now.strftime(fmt)
+
+        first.query_arrays('temperature', start, end)
+        timestamps, values = second.query_arrays('temperature', start, end)
+        assert isinstance(values, np.memmap) and not values.flags.writeable
+        assert values.tolist() == [float(i) for i in range(70, 100)]
+        assert source.query_arrays.call_count == 1
+
+        store.append_items('temperature', [
+            {'insert_date': (now + timedelta(minutes=m)).strftime(fmt), 'avg_value': 100.0 + m}
+            for m in range(30)
+        ])
+        assert first.refresh() == 30
+        assert second.refresh() == 0
+        # 容量を超えたため詰め直したセグメントに置き換わっても、もう一方のワーカーから読める
+        _, values = second.query_arrays('temperature', start, (now + timedelta(minutes=29)).strftime(fmt))
+        assert values[-1] == 129.0 and len(values) == 60
+        assert second.get_latest('temperature')['avg_value'] == 129.0
+        assert source.query_arrays.call_count == 2
+
+        first.close()
+        assert second.refresh() == 0 and second._leader_file is not None
+        second.close()
+
+    def test_shared_window_skips_unknown_series_and_evicts(self, tmp_path):
+        """存在しない系列のセグメントは作らず、上限時・未使用時は読まれていない系列を破棄するテスト"""
+        import os
+        from datetime import timedelta
+        from app.services.shared_window import SharedHotWindowStore
+
+        store, now = self._source(tmp_path / 'source', 10)
+        fmt = '%Y-%m-%d %H:%M:%S'
+        store.append_items('pH', [{'insert_date': (now - timedelta(minutes=1)).strftime(fmt), 'avg_value': 6.5}])
+        shared = tmp_path / 'shared'
+        worker = SharedHotWindowStore(store, str(shared), window_days=1, max_points=100, max_series=1)
+        start, end = (now - timedelta(minutes=30)).strftime(fmt), now.strftime(fmt)
+
+        def segments():
+            return sorted(name for name in os.listdir(shared) if name.endswith('.seg'))
+
+        worker.query_arrays('foo', start, end)
+        assert segments() == []
+
+        worker.query_arrays('temperature', start, end)
+        os.utime(shared / 'temperature.lock', (0, 0))
+        worker.query_arrays('pH', start, end)
+        assert segments() == ['pH.seg']
+
+        # 担当のワーカーが、idle_seconds以上読まれていないセグメントを削除する
+        leader = SharedHotWindowStore(store, str(shared), idle_seconds=60, window_days=1, max_points=100)
+        os.utime(shared / 'pH.lock', (0, 0))
+        assert leader.refresh() == 0 and segments() == []
+        # 削除されたセグメントは次の要求で作り直す
+        _, values = worker.query_arrays('pH', start, end)
+        assert values.tolist() == [6.5] and segments() == ['pH.seg']
+        leader.close()
+
+    def test_shared_window_reads_old_series_once(self, tmp_path):
+        """期間内にデータがない系列は、判定で取得した最新値を更新間隔の間使い回すテスト"""
+        import os
+        from app.services.shared_window import SharedHotWindowStore
+
+        store = LocalSeriesStore(str(tmp_path / 'source'))
+        store.append_items('humidity', [{'insert_date': '2020-01-01 00:00:00', 'avg_value': 55.0}])
+        source = Mock(wraps=store)
+        worker = SharedHotWindowStore(source, str(tmp_path / 'shared'), window_days=1, max_points=100)
+
+        for _ in range(3):
+            assert worker.get_latest('humidity') == {'insert_date': '2020-01-01 00:00:00', 'avg_value': 55.0}
+        assert worker.get_latest('humidity', projection=('insert_date',)) == {'insert_date': '2020-01-01 00:00:00'}
+
+        assert source.get_latest.call_count == 1
+        assert not any(name.endswith('.seg') for name in os.listdir(tmp_path / 'shared'))
+
+
+class TestAlertEngine:
+    """AlertEngineのテスト"""
+
+    def _items(self, values, hour=10):
+        return [
+            {'insert_date': f'2025-01-26 {hour:02d}:{i * 5:02d}:00', 'avg_value': value}
+            for i, value in enumerate(values)
+        ]
+
+    def _registry(self):
+        registry = Mock()
+        registry.list.return_value = ([{'id': 'plant-001'}], 1)
+        registry.thresholds.return_value = {'temperature': (18.0, 28.0)}
+        return registry
+
+    def test_evaluate_episodes_groups_breaches(self):
+        """範囲外が続いた区間が1つのエピソードにまとまることのテスト"""
+        episodes = evaluate_episodes(*items_to_arrays(self._items([20, 29, 30, 20, 17, 16])), 18, 28)
+
+        assert [(e['kind'], e['started_at'], e['ended_at'], e['peak_value']) for e in episodes] == [
+            ('high', '2025-01-26 10:05:00', '2025-01-26 10:15:00', 30.0),
+            ('low', '2025-01-26 10:20:00', None, 16.0),
+        ]
+
+    def test_incremental_evaluation(self):
+        """ウォーターマーク以降だけを評価し、継続中のエピソードを延長・終了するテスト"""
+        source = Mock()
+        source.query_arrays.side_effect = [
+            items_to_arrays(self._items([20, 29, 31])),
+            # BETWEENの境界（評価済みの10:10）も含めて返される
+            items_to_arrays([
+                {'insert_date': '2025-01-26 10:10:00', 'avg_value': 31.0},
+                {'insert_date': '2025-01-26 10:15:00', 'avg_value': 33.0},
+                {'insert_date': '2025-01-26 10:20:00', 'avg_value': 25.0},
+            ]),
+        ]
+        engine = AlertEngine(source, self._registry(), AlertStore(':memory:'))
+
+        assert engine.evaluate(force=True) == 3
+        active = engine.list(active_only=True)
+        assert [a['type'] for a in active] == ['temperature_high']
+        assert active[0]['resolved'] is False
+
+        assert engine.evaluate(force=True) == 2
+        assert source.query_arrays.call_args.args[1] == '2025-01-26 10:10:00'
+        alert = engine.get(active[0]['id'])
+        assert alert['resolved'] is True
+        assert alert['peak_value'] == 33.0
+        assert alert['ended_at'] == '2025-01-26 10:20:00Z'
+        assert engine.acknowledge(alert['id'])['acknowledged'] is True
+        assert engine.get('alert-999') is None
+
+
+class TestQueryCache:
+    """QueryCacheのテスト"""
+
+    async def test_hit_after_miss(self):
+        """2回目以降はキャッシュから返すテスト"""
+        cache = QueryCache(MemoryLRUCache())
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return [1, 2, 3]
+
+        assert await cache.get_or_load('k', loader, '2099-01-01 00:00:00') == [1, 2, 3]
+        assert await cache.get_or_load('k', loader, '2099-01-01 00:00:00') == [1, 2, 3]
+        assert len(calls) == 1
+        assert cache.stats['hits'] == 1
+        assert cache.stats['misses'] == 1
+
+    async def test_stale_value_is_served_and_refreshed(self):
+        """期限切れの値を返しつつ裏で再取得するテスト"""
+        import asyncio
+
+        cache = QueryCache(MemoryLRUCache(), recent_ttl_seconds=0)
+        values = iter(['old', 'new'])
+
+        async def loader():
+            return next(values)
+
+        assert await cache.get_or_load('k', loader, '2099-01-01 00:00:00') == 'old'
+        assert await cache.get_or_load('k', loader, '2099-01-01 00:00:00') == 'old'
+        await asyncio.gather(*cache._tasks)
+        assert cache.stats['stale_hits'] == 1
+        assert (await cache._backend.get('k'))['value'] == 'new'
+
+    def test_closed_window_uses_historical_ttl(self):
+        """確定済みの過去の範囲は長いTTLになることのテスト"""
+        cache = QueryCache(MemoryLRUCache(), recent_ttl_seconds=30, historical_ttl_seconds=86400)
+
+        assert cache._fresh_ttl('2020-01-01 00:00:00') == 86400
+        assert cache._fresh_ttl('2099-01-01 00:00:00') == 30
+
+    async def test_lru_eviction(self):
+        """上限を超えると古いエントリから削除されるテスト"""
+        backend = MemoryLRUCache(max_entries=2)
+        for key in ('a', 'b', 'c'):
+            await backend.set(key, {'value': key}, 60)
+
+        assert await backend.get('a') is None
+        assert (await backend.get('c'))['value'] == 'c'
+
+
+class TestColumnar:
+    """列指向シリアライズのテスト"""
+
+    def setup_method(self):
+        self.meta = {'data_type': 'temperature', 'device_id': 'sensor_001', 'location': '温室A'}
+        self.timestamps = np.array([1737887400000, 1737887700000], dtype=np.int64)
+        self.values = np.array([23.5, 24.0])
+
+    def test_columnar_json(self):
+        """メタデータを1回だけ含む列指向JSONのテスト"""
+        result = to_columnar_json(self.meta, self.timestamps, self.values)
+
+        assert result['location'] == '温室A'
+        assert result['count'] == 2
+        assert result['timestamps'] == [1737887400000, 1737887700000]
+        assert result['values'] == [23.5, 24.0]
+
+    def test_binary_round_trip(self):
+        """バイナリ形式のエンコード・デコードのテスト"""
+        data = encode_binary(self.meta, self.timestamps, self.values)
+        meta, timestamps, values = decode_binary(data)
+
+        assert meta == self.meta
+        assert timestamps.tolist() == self.timestamps.tolist()
+        assert values.tolist() == self.values.tolist()
+        assert (len(data) - 16 * len(self.values)) % 8 == 0
+
+
+class TestFastJSONResponse:
+    """FastJSONResponseのテスト"""
+
+    def test_render(self):
+        """numpy配列と日本語を含む値をエンコードできることのテスト"""
+        response = FastJSONResponse({'location': '温室A', 'values': np.array([1.5, 2.0])})
+
+        assert response.body.decode('utf-8') == '{"location":"温室A","values":[1.5,2.0]}'
+        assert response.media_type == 'application/json'
+
+
+class TestRequestLoggingMiddleware:
+    """RequestLoggingMiddlewareのテスト"""
+
+    def _client(self, **kwargs):
+        from fastapi import FastAPI
+        from fastapi.responses import StreamingResponse
+        from fastapi.testclient import TestClient
+
+        app = FastAPI()
+        app.add_middleware(RequestLoggingMiddleware, **kwargs)
+
+        @app.get('/poll')
+        async def poll():
+            return {'ok': True}
+
+        @app.get('/stream')
+        async def stream():
+            return StreamingResponse(iter([b'a', b'b']), media_type='text/plain')
+
+        @app.get('/fail')
+        async def fail():
+            raise RuntimeError('boom')
+
+        return TestClient(app, raise_server_exceptions=False)
+
+    def test_sampling_and_errors(self, caplog):
+        """サンプリング対象のパスは出力せず、エラーは必ず出力するテスト"""
+        client = self._client(sample_rates={'/poll': 0.0})
+
+        with caplog.at_level('INFO', logger='app.middleware.logging'):
+            assert client.get('/poll').status_code == 200
+            assert client.get('/stream?x=1').text == 'ab'
+            assert client.get('/fail').status_code == 500
+
+        messages = [r.getMessage() for r in caplog.records if r.name == 'app.middleware.logging']
+        assert not any('path=/poll' in m for m in messages)
+        assert any('path=/stream query=x=1 status=200' in m for m in messages)
+        assert any('path=/fail' in m and 'boom' in m for m in messages)
+
+
+class TestMetricsMiddleware:
+    """MetricsMiddlewareのテスト"""
+
+    def test_server_timing_and_route_histogram(self):
+        """Server-Timingヘッダーとルートごとのヒストグラムのテスト"""
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        metrics = MetricsRegistry()
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+        @app.get('/items/{item_id}')
+        async def item(item_id: str):
+            with timed('query'):
+                pass
+            return FastJSONResponse({'id': item_id})
+
+        response = TestClient(app).get('/items/42')
+
+        phases = [entry.split(';')[0] for entry in response.headers['server-timing'].split(', ')]
+        assert phases == ['query', 'serialize', 'total']
+        text = '\n'.join(metrics.render())
+        assert 'plant_monitor_http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 1' in text
+        assert 'plant_monitor_http_requests_in_flight{method="GET"} 0' in text
+
+
+class TestDataRoutes:
+    """/api/v1/data 系のルートのテスト（ストレージはスタブ）"""
+
+    @staticmethod
+    def _arrays(data_type):
+        """data_typeごとに1分間隔の50点"""
+        timestamps = np.datetime64('2025-01-26T10:00:00', 'ms').astype(np.int64) + np.arange(50) * 60000
+        values = {'temperature': 20.0, 'pH': 6.0}.get(data_type, 0.0) + np.sin(np.arange(50.0))
+        return timestamps, values
+
+    @pytest.fixture
+    def client(self):
+        from types import SimpleNamespace
+        from fastapi.testclient import TestClient
+        from app.dependencies import get_connected_services
+        from app.main import app
+
+        calls = []
+
+        async def get_arrays(data_type, start_time, end_time, limit=None):
+            calls.append((data_type, start_time, limit))
+            timestamps, values = self._arrays(data_type)
+            return timestamps[:limit], values[:limit]
+
+        async def iter_pages(data_type, start_time, end_time, limit=None):
+            yield [{'insert_date': '2025-01-26 10:00:00', 'avg_value': 20.0}]
+
+        services = SimpleNamespace(
+            data_service=SimpleNamespace(get_arrays=get_arrays),
+            async_dynamodb=SimpleNamespace(iter_pages=iter_pages),
+        )
+        app.dependency_overrides[get_connected_services] = lambda: services
+        yield TestClient(app), calls
+        app.dependency_overrides.clear()
+
+    def test_batch_keeps_request_order_and_series_overrides(self, client):
+        """系列ごとの指定がリクエスト全体の値より優先され、リクエスト順に返るテスト"""
+        client, calls = client
+        response = client.post('/api/v1/data/batch', json={
+            'series': [
+                {'data_type': 'pH', 'limit': 5},
+                {'data_type': 'temperature', 'start_time': '2025-01-26T10:00:00Z',
+                 'max_points': 10, 'method': 'minmax'},
+                {'data_type': 'humidity'},
+            ],
+            'start_time': '2025-01-20T00:00:00Z',
+            'end_time': '2025-01-27T00:00:00Z',
+            'limit': 20,
+            'method': 'lttb',
+        })
+
+        assert response.status_code == 200
+        series = response.json()['series']
+        assert [s['data_type'] for s in series] == ['pH', 'temperature', 'humidity']
+        assert [s['start_time'] for s in series] == [
+            '2025-01-20 00:00:00', '2025-01-26 10:00:00', '2025-01-20 00:00:00'
+        ]
+        assert [len(s['data']) for s in series] == [5, 10, 20]
+        # max_points指定の系列はlimitで打ち切らずに取得し、系列ごとの手法で間引く
+        assert sorted(calls) == [('humidity', '2025-01-20 00:00:00', 20), ('pH', '2025-01-20 00:00:00', 5),
+                                 ('temperature', '2025-01-26 10:00:00', None)]
+        _, expected = downsample(*self._arrays('temperature'), 10, 'minmax')
+        assert [point['value'] for point in series[1]['data']] == expected.tolist()
+
+    def test_batch_get_uses_request_defaults(self, client):
+        """GETの一括取得がdata_typesの順に共通の条件で返すテスト"""
+        client, calls = client
+        response = client.get('/api/v1/data/batch', params={
+            'data_types': 'temperature,pH', 'start_time': '2025-01-20T00:00:00Z', 'limit': 3
+        })
+
+        assert response.status_code == 200
+        series = response.json()['series']
+        assert [s['data_type'] for s in series] == ['temperature', 'pH']
+        assert [len(s['data']) for s in series] == [3, 3]
+        assert series[1]['data'][0]['value'] == self._arrays('pH')[1][0]
+
+    def test_batch_rejects_too_many_or_no_series(self, client):
+        """系列が21件以上、または空の場合は422を返すテスト"""
+        client, calls = client
+        many = [{'data_type': f'sensor{i}'} for i in range(21)]
+
+        assert client.post('/api/v1/data/batch', json={'series': many}).status_code == 422
+        assert client.post('/api/v1/data/batch', json={'series': []}).status_code == 422
+        response = client.get('/api/v1/data/batch', params={'data_types': ','.join(s['data_type'] for s in many)})
+        assert response.status_code == 422
+        assert calls == []
+
+    def test_every_format_varies_on_accept(self, client):
+        """形式をAcceptヘッダーで決めるため、どの形式でもVary: Acceptを返すテスト"""
+        from app.services.columnar import BINARY_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE
+
+        client, _ = client
+        url = '/api/v1/data'
+        responses = [client.get(url, params={'data_type': 'temperature', 'format': f})
+                     for f in ('json', 'ndjson', 'json-stream', 'columnar', 'binary')]
+        responses += [client.get(url, params={'data_type': 'temperature'}, headers={'Accept': accept})
+                      for accept in ('application/json', 'application/x-ndjson',
+                                     COLUMNAR_JSON_MEDIA_TYPE, BINARY_MEDIA_TYPE)]
+
+        assert [r.status_code for r in responses] == [200] * 9
+        # CORSMiddlewareがOriginを追加するため、トークンとして含まれることを確認する
+        assert all('Accept' in r.headers['vary'].split(', ') for r in responses)
+        assert responses[6].headers['content-type'] == 'application/x-ndjson'
+
+    @pytest.mark.parametrize('format', ['ndjson', 'json-stream', 'json'])
+    def test_invalid_time_is_rejected_before_streaming(self, client, format):
+        """解釈できない時刻はストリーミングを始める前に400で返すテスト"""
+        client, _ = client
+        response = client.get('/api/v1/data', params={
+            'data_type': 'temperature', 'format': format, 'start_time': 'bad', 'end_time': '2025-01-27T00:00:00Z'
+        })
+
+        assert response.status_code == 400
+        assert '時刻の形式が不正です' in response.json()['detail']
+
+    def test_ndjson_stream_lines(self, client):
+        """NDJSONが1行1点で、指定した範囲のページを送ることのテスト"""
+        client, _ = client
+        response = client.get('/api/v1/data', params={'data_type': 'temperature', 'format': 'ndjson'})
+
+        assert response.status_code == 200
+        assert response.text.splitlines() == [
+            '{"timestamp":"2025-01-26T10:00:00Z","value":20.0,"device_id":"sensor_001","location":"温室A"}'
+        ]
+
+
+class TestPlantRegistry:
+    """PlantRegistryのテスト"""
+
+    def _plant(self, plant_id, location, device_id):
+        return {
+            'id': plant_id, 'name': plant_id, 'species': 'x', 'location': location,
+            'device_id': device_id, 'created_at': '2025-01-01T00:00:00Z',
+            'thresholds': {'temperature': {'min': 18, 'max': 28}}
+        }
+
+    def test_index_and_filter(self, tmp_path):
+        """索引による検索・絞り込み・ページングのテスト"""
+        import json
+
+        path = tmp_path / 'plants.json'
+        path.write_text(json.dumps({'plants': [
+            self._plant('p1', '温室A', 'sensor_001'),
+            self._plant('p2', '温室A', 'sensor_002'),
+            self._plant('p3', '温室B', 'sensor_002'),
+        ]}), encoding='utf-8')
+        registry = PlantRegistry(str(path))
+
+        assert registry.get('p2')['device_id'] == 'sensor_002'
+        assert [p['id'] for p in registry.by_device('sensor_002')] == ['p2', 'p3']
+        plants, total = registry.list(location='温室A', offset=1, limit=1)
+        assert [p['id'] for p in plants] == ['p2']
+        assert total == 2
+        assert registry.thresholds('p1') == {'temperature': (18.0, 28.0)}
+
+    def test_reload_on_mtime_change(self, tmp_path):
+        """ファイル更新時のみ再読み込みするテスト"""
+        import json
+        import os
+
+        path = tmp_path / 'plant.json'
+        path.write_text(json.dumps(self._plant('p1', '温室A', 'sensor_001')), encoding='utf-8')
+        registry = PlantRegistry(str(path), check_interval_seconds=0)
+        assert registry.get('p1') is not None
+
+        path.write_text(json.dumps([self._plant('p9', '温室A', 'sensor_001')]), encoding='utf-8')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert registry.get('p1') is None
+        assert registry.get('p9') is not None
+
+    def test_fallback_when_file_missing(self, tmp_path):
+        """ファイルがない場合はデフォルトデータを返すテスト"""
+        registry = PlantRegistry(str(tmp_path / 'missing.json'))
+
+        plants, total = registry.list()
+        assert total == 1
+        assert plants[0]['id'] == 'plant-001'
+
 
 class TestGraphService:
     """GraphServiceのテスト"""
@@ -80,4 +1165,17 @@ class TestGraphService:
         
         assert isinstance(result, str)
         assert 'plotly' in result.lower()
-        assert len(result) > 100  # HTMLが生成されていることを確認
\ No newline at end of file
+        assert len(result) > 100  # HTMLが生成されていることを確認
+    
+    def test_create_time_series_plot_cache_and_webgl(self):
+        """plotly.jsを埋め込まず、描画結果のキャッシュと大量データのWebGL描画を行うテスト"""
+        service = GraphService(max_points=100, webgl_threshold=200)
+        test_data = [
+            {'insert_date': f'2025-01-26T{i // 60:02d}:{i % 60:02d}:00', 'avg_value': float(i % 7)}
+            for i in range(600)
+        ]
+        result = service.create_time_series_plot(test_data)
+        
+        assert 'scattergl' in result
+        assert len(result) < 100_000  # plotly.js本体を含まない
+        assert service.create_time_series_plot(list(test_data)) is result
@@ -0,0 +1,51 @@
+/**
+ * 列指向形式のセンサーデータのデコード
+ *
+ * バックエンドの `/api/v1/data` は `format=columnar`（JSON）または
+ * `format=binary`（型付き配列）で時刻と値を配列のまま返す。
+ */
+
+export const COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.plant-monitor.columnar+json";
+export const BINARY_MEDIA_TYPE = "application/vnd.plant-monitor.series";
+
+export interface ColumnarSeries {
+  data_type: string;
+  device_id: string;
+  location: string;
+  count: number;
+  timestamps: ArrayLike<number>; // エポックミリ秒
+  values: ArrayLike<number>;
+}
+
+const BINARY_MAGIC = "PMTS";
+const BINARY_VERSION = 1;
+const HEADER_SIZE = 16;
+
+/**
+ * バイナリ形式のレスポンスをデコードする
+ *
+ * 値の配列はレスポンスのバッファをコピーせずに参照する
+ */
+export function decodeBinarySeries(buffer: ArrayBuffer): ColumnarSeries {
+  const view = new DataView(buffer);
+  const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4));
+  const version = view.getUint16(4, true);
+  if (magic !== BINARY_MAGIC || version !== BINARY_VERSION) {
+    throw new Error("未対応のバイナリ形式です");
+  }
+
+  const count = view.getUint32(8, true);
+  const metaLength = view.getUint32(12, true);
+  const meta = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, HEADER_SIZE, metaLength)));
+
+  const metaEnd = HEADER_SIZE + metaLength;
+  const offset = metaEnd + ((8 - (metaEnd % 8)) % 8);
+  const epochMs = new BigInt64Array(buffer, offset, count);
+
+  return {
+    ...meta,
+    count,
+    timestamps: Float64Array.from(epochMs, Number),
+    values: new Float64Array(buffer, offset + 8 * count, count),
+  };
+}
@@ -21,6 +21,11 @@ export interface DataSummary {
   maximum: number;
   count: number;
   period: string;
+  std?: number;
+  p5?: number | null;
+  p50?: number | null;
+  p95?: number | null;
+  time_above_threshold_seconds?: number | null;
 }
 
 export interface GetDataParams {